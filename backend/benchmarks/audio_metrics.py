@@ -0,0 +1,46 @@
+import numpy as np
+
+
+def _frames(x: np.ndarray, n_fft: int, hop: int) -> np.ndarray:
+    if len(x) < n_fft:
+        x = np.pad(x, (0, n_fft - len(x)))
+    count = 1 + (len(x) - n_fft) // hop
+    idx = np.arange(n_fft)[None, :] + hop * np.arange(count)[:, None]
+    return x[idx] * np.hanning(n_fft)[None, :]
+
+
+def magnitude_spectrogram(x: np.ndarray, n_fft: int = 1024, hop: int = 256) -> np.ndarray:
+    """|STFT| as (frames, bins), mono float input."""
+    x = np.asarray(x, dtype=np.float32)
+    if x.ndim > 1:
+        x = x.mean(axis=-1 if x.shape[-1] <= 2 else 0)
+    return np.abs(np.fft.rfft(_frames(x, n_fft, hop), axis=1))
+
+
+def compare_audio(reference: np.ndarray, candidate: np.ndarray) -> dict:
+    """
+    Simple similarity of candidate vs reference (same sample rate):
+      - spectral_similarity: cosine similarity of log-magnitude spectrograms (1 = identical)
+      - spectral_convergence: ||S_ref - S_cand|| / ||S_ref|| (0 = identical)
+      - rms_diff_db: loudness difference
+    """
+    n = min(len(reference), len(candidate))
+    ref = magnitude_spectrogram(reference[:n])
+    cand = magnitude_spectrogram(candidate[:n])
+
+    log_ref = np.log1p(ref).ravel()
+    log_cand = np.log1p(cand).ravel()
+    denom = np.linalg.norm(log_ref) * np.linalg.norm(log_cand)
+    similarity = float(log_ref @ log_cand / denom) if denom > 0 else 0.0
+
+    ref_norm = np.linalg.norm(ref)
+    convergence = float(np.linalg.norm(ref - cand) / ref_norm) if ref_norm > 0 else 0.0
+
+    def rms_db(x):
+        return 20 * np.log10(np.sqrt(np.mean(np.square(x, dtype=np.float64))) + 1e-12)
+
+    return {
+        "spectral_similarity": round(similarity, 4),
+        "spectral_convergence": round(convergence, 4),
+        "rms_diff_db": round(float(rms_db(candidate[:n]) - rms_db(reference[:n])), 2),
+    }
@@ -0,0 +1,102 @@
+"""
+Benchmark: batched generation vs. the same clips as single requests
+
+Renders N clips one at a time, then the same N clips in one batched
+forward pass (engine paths of POST /api/generate/batch), and prints
+seconds per clip and the speedup.
+
+Usage (from backend/):
+    python -m benchmarks.bench_batch --mode sfx --clips 4
+    python -m benchmarks.bench_batch --mode music --model facebook/musicgen-small --duration 5
+"""
+
+import sys
+import json
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+PROMPT = "heavy rain on a tin roof with distant thunder"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched vs. single-request generation")
+    parser.add_argument("--mode", choices=("music", "sfx"), default="sfx")
+    parser.add_argument("--model", default=None, help="Default: audioldm2p / MUSIC_MODEL")
+    parser.add_argument("--clips", type=int, default=4)
+    parser.add_argument("--duration", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--profile", default="quality")
+    parser.add_argument("--quality", default="fast", help="SFX quality tier")
+    parser.add_argument("--out", default=None, help="Write results JSON here")
+    args = parser.parse_args()
+
+    from config import DEFAULT_DEVICE, DEFAULT_MODEL
+
+    work = Path(tempfile.mkdtemp(prefix="bench_batch_"))
+    dirs = [work / str(i) for i in range(args.clips)]
+    for d in dirs:
+        d.mkdir()
+    seeds = [args.seed + i for i in range(args.clips)]
+
+    if args.mode == "sfx":
+        from engine import sfx
+        model = args.model or "audioldm2p"
+        sfx.load_pipeline(sfx.resolve_model_key(model), args.profile)
+
+        def single(i):
+            sfx.generate_sfx(PROMPT, model, args.duration, seeds[i], args.profile, args.quality, out_dir=dirs[i])
+
+        def batch():
+            sfx.generate_sfx_batch([PROMPT] * args.clips, seeds, dirs, model, args.duration,
+                                   args.profile, args.quality)
+    else:
+        from engine.musicgen_engine import MusicEngine, GenParams
+        model = args.model or DEFAULT_MODEL
+        engine = MusicEngine(model, DEFAULT_DEVICE, work, args.profile)
+
+        def single(i):
+            engine.generate_text(PROMPT, args.duration, GenParams(1.0, 250, 0.95, seeds[i]))
+
+        def batch():
+            engine.generate_text_batch([PROMPT] * args.clips, args.duration,
+                                       GenParams(1.0, 250, 0.95, args.seed), dirs)
+
+    single(0)  # warm-up (first-call allocations, prompt caches)
+
+    t0 = time.perf_counter()
+    for i in range(args.clips):
+        single(i)
+    single_sec = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    batch()
+    batch_sec = time.perf_counter() - t0
+
+    result = {
+        "mode": args.mode,
+        "model": model,
+        "clips": args.clips,
+        "duration": args.duration,
+        "single_sec_per_clip": round(single_sec / args.clips, 2),
+        "batch_sec_per_clip": round(batch_sec / args.clips, 2),
+        "speedup": round(single_sec / batch_sec, 2),
+    }
+
+    print()
+    print(f"| mode | model | clips | s / clip (single) | s / clip (batch) | speedup |")
+    print("| :--- | :--- | ---: | ---: | ---: | ---: |")
+    print(f"| {result['mode']} | {result['model']} | {result['clips']} | {result['single_sec_per_clip']} | "
+          f"{result['batch_sec_per_clip']} | {result['speedup']}x |")
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(result, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Benchmark: every engine path, against a JSON baseline
+
+Cases (each in a fresh subprocess, so peak RSS is per case):
+    musicgen_text     MusicEngine.generate_text
+    musicgen_melody   MusicEngine.generate_with_reference
+    sfx               engine.sfx.generate_sfx
+    isolation         services.isolation.remove_noise
+    pitch_shift       engine.audio_utils.pitch_shift_file
+    wav_to_mp3        engine.audio_utils.wav_to_mp3
+
+Model cases run against tiny, randomly initialised stand-ins
+(benchmarks/tiny_models.py) and, with --models real|both, against the real
+models if they are already in the local cache (nothing is downloaded).
+Seeds are fixed. Records latency, throughput, real-time factor and peak
+RSS, and fails when a case is slower / larger than the baseline by more
+than the threshold.
+
+Usage (from backend/):
+    python -m benchmarks.bench_engines --save-baseline       # record benchmarks/baseline.json
+    python -m benchmarks.bench_engines                       # compare, exit 1 on regression
+    python -m benchmarks.bench_engines --cases sfx,isolation --models both --threshold 0.1
+
+Baselines are per host: record one on the machine that runs the comparison.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+DEFAULT_THRESHOLD = float(os.getenv("BENCH_REGRESSION_THRESHOLD", "0.25"))
+CASES = ("musicgen_text", "musicgen_melody", "sfx", "isolation", "pitch_shift", "wav_to_mp3")
+MODEL_CASES = {"musicgen_text", "musicgen_melody", "sfx", "isolation"}
+REAL_MODELS = {"music": "facebook/musicgen-small", "sfx": "audioldm-s-full-v2"}
+SEED = 1234
+
+
+# ---------------------------------------------------------------
+# CASES (run inside the child process)
+# ---------------------------------------------------------------
+def synthetic_audio(path: Path, seconds: float, sr: int, seed: int = SEED) -> Path:
+    """A chord plus noise: deterministic, non-trivial input audio."""
+    import numpy as np
+    import soundfile as sf
+
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    audio = sum(0.2 * np.sin(2 * np.pi * f * t) for f in (220.0, 277.2, 329.6))
+    audio = audio + 0.05 * rng.standard_normal(len(t))
+    sf.write(str(path), audio.astype(np.float32), sr)
+    return path
+
+
+def setup_case(case: str, variant: str, work: Path, duration: float):
+    """Load / register what a case needs; returns run() -> seconds of audio produced."""
+    from benchmarks import tiny_models
+
+    if case in ("musicgen_text", "musicgen_melody"):
+        from engine.musicgen_engine import MusicEngine, GenParams
+
+        params = GenParams(temperature=1.0, top_k=250, top_p=0.0, seed=SEED)
+        model_name = REAL_MODELS["music"] if variant == "real" else tiny_models.install_tiny_musicgen()
+        engine = MusicEngine(model_name, "cpu", work)
+        reference = synthetic_audio(work / "reference.wav", 10, 44100)
+
+        def run():
+            if case == "musicgen_text":
+                path = engine.generate_text("warm lofi beats, mellow chords", duration, params)
+            else:
+                path = engine.generate_with_reference("jazzy piano trio", reference, duration, params)
+            return _audio_seconds(path, unlink=True)
+        return run
+
+    if case == "sfx":
+        from engine import sfx
+
+        model_key = REAL_MODELS["sfx"]
+        if variant == "real":
+            sfx.load_pipeline(model_key)
+        else:
+            tiny_models.install_tiny_sfx(model_key)
+
+        def run():
+            rel = sfx.generate_sfx("heavy rain on a tin roof", model_key, 5, SEED)
+            return _audio_seconds(sfx.OUTPUT_DIR.parent / rel, unlink=True)
+        return run
+
+    if case == "isolation":
+        if variant == "tiny":
+            tiny_models.install_tiny_isolation()
+        from services import isolation
+
+        isolation.load_df_model()
+        noisy = synthetic_audio(work / "noisy.wav", duration, 48000)
+
+        def run():
+            out = work / "enhanced.wav"
+            isolation.remove_noise(str(noisy), str(out))
+            return _audio_seconds(out, unlink=True)
+        return run
+
+    if case == "pitch_shift":
+        from engine.audio_utils import pitch_shift_file
+
+        source = synthetic_audio(work / "source.wav", duration, 44100)
+
+        def run():
+            return _audio_seconds(pitch_shift_file(source, work / "shifted.wav", 3), unlink=True)
+        return run
+
+    if case == "wav_to_mp3":
+        from engine.audio_utils import wav_to_mp3
+
+        source = synthetic_audio(work / "source.wav", duration, 44100)
+
+        def run():
+            out = wav_to_mp3(source, work / "out.mp3")
+            seconds = duration if out.exists() else 0.0
+            out.unlink(missing_ok=True)
+            return seconds
+        return run
+
+    raise ValueError(f"Unknown case {case}")
+
+
+def _audio_seconds(path, unlink: bool = False) -> float:
+    import soundfile as sf
+
+    seconds = sf.info(str(path)).duration
+    if unlink:
+        Path(path).unlink(missing_ok=True)
+    return seconds
+
+
+def run_child(case: str, variant: str, runs: int, duration: float) -> dict:
+    import torch
+    from benchmarks.bench_profiles import peak_rss_mb
+
+    torch.manual_seed(SEED)
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        run = setup_case(case, variant, Path(tmp), duration)
+        setup_sec = time.perf_counter() - started
+
+        # First call pays lazy initialisation (thread pools, caches): not timed
+        run()
+
+        latencies, audio = [], 0.0
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            audio = run()
+            latencies.append(time.perf_counter() - t0)
+
+    latencies.sort()
+    mean = sum(latencies) / len(latencies)
+    return {
+        "setup_sec": round(setup_sec, 3),
+        "latency_sec": round(mean, 4),
+        "latency_p50_sec": round(latencies[len(latencies) // 2], 4),
+        "latency_min_sec": round(latencies[0], 4),
+        "throughput_per_min": round(60.0 / mean, 2) if mean else None,
+        "audio_sec": round(audio, 3),
+        "rtf": round(mean / audio, 4) if audio else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+# ---------------------------------------------------------------
+# DRIVER
+# ---------------------------------------------------------------
+def spawn(case: str, variant: str, args) -> dict:
+    cmd = [
+        sys.executable, "-m", "benchmarks.bench_engines", "--child",
+        "--cases", case, "--variant", variant,
+        "--runs", str(args.runs), "--duration", str(args.duration),
+    ]
+    # Offline, and no on-disk caches: stand-in embeddings must never be
+    # persisted under the real model names, and disk state must not skew runs
+    env = {**os.environ, "HF_HUB_OFFLINE": "1", "TRANSFORMERS_OFFLINE": "1", "PROMPT_CACHE_PERSIST": "0"}
+    proc = subprocess.run(cmd, cwd=BASE_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        reason = (proc.stderr.strip().splitlines() or [f"exit code {proc.returncode}"])[-1]
+        return {"skipped": reason}
+    # Engines print progress; the result is the last line
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("cases", {}).get(name)
+        if not base or "skipped" in result or "skipped" in base:
+            continue
+        for metric in ("latency_sec", "peak_rss_mb"):
+            old, new = base.get(metric), result.get(metric)
+            if old and new and new > old * (1 + threshold):
+                regressions.append(f"{name}: {metric} {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark engine paths against a baseline")
+    parser.add_argument("--cases", default=",".join(CASES))
+    parser.add_argument("--models", default="tiny", choices=("tiny", "real", "both"))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--duration", type=float, default=2.0, help="Seconds of audio per run")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help=f"Allowed slowdown / growth (default: baseline's, else {DEFAULT_THRESHOLD})")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--variant", default="tiny", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.cases, args.variant, args.runs, args.duration)))
+        return 0
+
+    variants = ["tiny", "real"] if args.models == "both" else [args.models]
+    results = {}
+    for case in [c.strip() for c in args.cases.split(",") if c.strip()]:
+        for variant in variants if case in MODEL_CASES else ["io"]:
+            name = f"{case}[{variant}]"
+            print(f"⏱ {name}...")
+            results[name] = spawn(case, variant, args)
+
+    print()
+    print("| case | latency s | p50 s | per min | RTF | peak RSS MB |")
+    print("| :--- | ---: | ---: | ---: | ---: | ---: |")
+    for name, r in results.items():
+        if "skipped" in r:
+            print(f"| {name} | skipped: {r['skipped'][:60]} | | | | |")
+            continue
+        print(f"| {name} | {r['latency_sec']} | {r['latency_p50_sec']} | {r['throughput_per_min']} | "
+              f"{r['rtf']} | {r['peak_rss_mb']} |")
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        threshold = args.threshold if args.threshold is not None else DEFAULT_THRESHOLD
+        baseline_path.write_text(json.dumps({
+            "recorded_at": time.time(),
+            "threshold": threshold,
+            "runs": args.runs,
+            "duration": args.duration,
+            "cases": results,
+        }, indent=2), encoding="utf-8")
+        print(f"\n💾 Baseline saved to {baseline_path}")
+        return 0
+
+    if not baseline_path.exists():
+        print(f"\nℹ️ No baseline at {baseline_path} (record one with --save-baseline)")
+        return 0
+
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    threshold = args.threshold if args.threshold is not None else baseline.get("threshold", DEFAULT_THRESHOLD)
+    regressions = compare(results, baseline, threshold)
+    if regressions:
+        print(f"\n❌ Regressions beyond {threshold:.0%}:")
+        for line in regressions:
+            print(f"   {line}")
+        return 1
+    print(f"\n✅ No regressions beyond {threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
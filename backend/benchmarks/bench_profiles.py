@@ -0,0 +1,160 @@
+"""
+Benchmark: inference profiles (quality = float32 vs fast = int8 / bf16)
+
+For each target model and profile a fresh subprocess loads the model and
+generates the same prompt with the same seed, recording load time,
+latency per clip, real-time factor and peak RSS. The fast output is then
+compared with the float32 output (spectral similarity / convergence).
+
+Usage (from backend/):
+    python -m benchmarks.bench_profiles
+    python -m benchmarks.bench_profiles --targets facebook/musicgen-small,audioldm-s-full-v2 --duration 5 --runs 3
+
+Note: MusicGen samples tokens, so int8 logits can pick different tokens
+from the same seed; its similarity is naturally lower than for diffusion.
+"""
+
+import sys
+import json
+import time
+import argparse
+import subprocess
+import tempfile
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+DEFAULT_TARGETS = "facebook/musicgen-small,audioldm2p,audioldmp,audioldm-s-full-v2"
+PROMPTS = {
+    "music": "warm lofi beats, vinyl crackle, mellow chords",
+    "sfx": "heavy rain on a tin roof with distant thunder",
+}
+
+
+def peak_rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:  # Windows: current RSS instead of the peak
+        from services.memory import process_memory, to_mb
+        return to_mb(process_memory()["rss"]) or 0.0
+    # ru_maxrss: KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_child(target: str, profile: str, duration: int, seed: int, runs: int, out_dir: Path) -> dict:
+    """Load one model with one profile and time `runs` generations."""
+    import soundfile as sf
+
+    rss_before = peak_rss_mb()
+    started = time.perf_counter()
+
+    if "musicgen" in target:
+        from engine.musicgen_engine import MusicEngine, GenParams
+
+        engine = MusicEngine(target, "cpu", out_dir, profile=profile)
+        load_sec = time.perf_counter() - started
+
+        def generate():
+            return engine.generate_text(PROMPTS["music"], duration, GenParams(1.0, 250, 0.95, seed))
+    else:
+        from engine import sfx
+
+        sfx.load_pipeline(target, profile)
+        load_sec = time.perf_counter() - started
+
+        def generate():
+            return sfx.OUTPUT_DIR.parent / sfx.generate_sfx(PROMPTS["sfx"], target, duration, seed, profile)
+
+    rss_loaded = peak_rss_mb()
+    latencies, wav_path = [], None
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        wav_path = generate()
+        latencies.append(time.perf_counter() - t0)
+
+    audio_sec = sf.info(str(wav_path)).duration
+    final = out_dir / f"{Path(target).name}_{profile}.wav"
+    Path(wav_path).replace(final)
+
+    mean = sum(latencies) / len(latencies)
+    return {
+        "target": target,
+        "profile": profile,
+        "load_sec": round(load_sec, 2),
+        "latency_sec": round(mean, 2),
+        "latency_min_sec": round(min(latencies), 2),
+        "rtf": round(mean / audio_sec, 3),
+        "model_rss_mb": round(rss_loaded - rss_before, 1),
+        "peak_rss_mb": peak_rss_mb(),
+        "wav": str(final),
+    }
+
+
+def spawn(target: str, profile: str, args, out_dir: Path) -> dict:
+    cmd = [
+        sys.executable, "-m", "benchmarks.bench_profiles", "--child",
+        "--targets", target, "--profile", profile,
+        "--duration", str(args.duration), "--seed", str(args.seed),
+        "--runs", str(args.runs), "--work-dir", str(out_dir),
+    ]
+    proc = subprocess.run(cmd, cwd=BASE_DIR, stdout=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        return {"target": target, "profile": profile, "error": f"exit code {proc.returncode}"}
+    # The engines print progress; the result is the last line
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark quality vs fast inference profiles")
+    parser.add_argument("--targets", default=DEFAULT_TARGETS)
+    parser.add_argument("--duration", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--runs", type=int, default=2)
+    parser.add_argument("--out", default=None, help="Write results JSON here")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--profile", default="quality", help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = run_child(args.targets, args.profile, args.duration, args.seed, args.runs, Path(args.work_dir))
+        print(json.dumps(result))
+        return
+
+    import soundfile as sf
+    from benchmarks.audio_metrics import compare_audio
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for target in [t.strip() for t in args.targets.split(",") if t.strip()]:
+            quality = spawn(target, "quality", args, Path(tmp))
+            fast = spawn(target, "fast", args, Path(tmp))
+            if "error" not in quality and "error" not in fast:
+                ref, _ = sf.read(quality["wav"])
+                cand, _ = sf.read(fast["wav"])
+                fast["vs_float32"] = compare_audio(ref, cand)
+                fast["speedup"] = round(quality["latency_sec"] / fast["latency_sec"], 2)
+            results.extend([quality, fast])
+
+    print()
+    print("| model | profile | load s | latency s | RTF | model RSS MB | speedup | spectral sim |")
+    print("| :--- | :--- | ---: | ---: | ---: | ---: | ---: | ---: |")
+    for r in results:
+        if "error" in r:
+            print(f"| {r['target']} | {r['profile']} | error: {r['error']} | | | | | |")
+            continue
+        sim = r.get("vs_float32", {}).get("spectral_similarity", "—")
+        print(f"| {r['target']} | {r['profile']} | {r['load_sec']} | {r['latency_sec']} | {r['rtf']} | "
+              f"{r['model_rss_mb']} | {r.get('speedup', '—')} | {sim} |")
+
+    if args.out:
+        for r in results:
+            r.pop("wav", None)
+        Path(args.out).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark: SFX quality tiers (scheduler + step count) per AudioLDM model
+
+Loads each model once, then renders the same prompts at every tier and
+prints a seconds-per-clip table. Outputs of faster tiers are compared
+with the `standard` tier (same seed) for a rough quality indication.
+
+Usage (from backend/):
+    python -m benchmarks.bench_sfx_tiers
+    python -m benchmarks.bench_sfx_tiers --models audioldm-s-full-v2 --duration 5 --clips 3
+"""
+
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+DEFAULT_MODELS = "audioldm2p,audioldmp,audioldm-s-full-v2"
+PROMPTS = [
+    "heavy rain on a tin roof with distant thunder",
+    "wooden door creaking open slowly",
+    "crowd cheering in a stadium",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seconds per SFX clip at each quality tier")
+    parser.add_argument("--models", default=DEFAULT_MODELS)
+    parser.add_argument("--tiers", default=None, help="Comma-separated tiers (default: all)")
+    parser.add_argument("--duration", type=int, default=5)
+    parser.add_argument("--clips", type=int, default=2, help="Clips per model and tier")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--profile", default="quality")
+    parser.add_argument("--out", default=None, help="Write results JSON here")
+    args = parser.parse_args()
+
+    import soundfile as sf
+    from engine import sfx
+    from engine.profiles import SFX_QUALITY_TIERS
+    from benchmarks.audio_metrics import compare_audio
+
+    tiers = args.tiers.split(",") if args.tiers else list(SFX_QUALITY_TIERS)
+    # Reference first so every other tier can be compared with it
+    tiers = sorted(tiers, key=lambda t: t != "standard")
+
+    results = []
+    for model in [m.strip() for m in args.models.split(",") if m.strip()]:
+        t0 = time.perf_counter()
+        sfx.load_pipeline(model, args.profile)
+        print(f"📦 {model} loaded in {time.perf_counter() - t0:.1f}s")
+
+        reference = {}
+        for tier in tiers:
+            settings = sfx.resolve_quality(model, tier)
+            seconds, sims = [], []
+            for i in range(args.clips):
+                prompt = PROMPTS[i % len(PROMPTS)]
+                t0 = time.perf_counter()
+                rel = sfx.generate_sfx(prompt, model, args.duration, args.seed + i, args.profile, tier)
+                seconds.append(time.perf_counter() - t0)
+
+                path = sfx.OUTPUT_DIR.parent / rel
+                audio, _ = sf.read(str(path))
+                path.unlink(missing_ok=True)
+                if tier == "standard":
+                    reference[i] = audio
+                elif i in reference:
+                    sims.append(compare_audio(reference[i], audio)["spectral_similarity"])
+
+            results.append({
+                "model": model,
+                "tier": tier,
+                "scheduler": settings["scheduler"],
+                "steps": settings["steps"],
+                "sec_per_clip": round(sum(seconds) / len(seconds), 2),
+                "rtf": round(sum(seconds) / len(seconds) / args.duration, 3),
+                "similarity_vs_standard": round(sum(sims) / len(sims), 4) if sims else None,
+            })
+
+    print()
+    print(f"| model | tier | scheduler | steps | s / {args.duration}s clip | RTF | similarity vs standard |")
+    print("| :--- | :--- | :--- | ---: | ---: | ---: | ---: |")
+    for r in results:
+        sim = "—" if r["similarity_vs_standard"] is None else r["similarity_vs_standard"]
+        print(f"| {r['model']} | {r['tier']} | {r['scheduler']} | {r['steps']} | "
+              f"{r['sec_per_clip']} | {r['rtf']} | {sim} |")
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+"""
+Load test: the real FastAPI app under concurrent users, with fake engines
+
+Starts main.app in-process (uvicorn on a background thread, outputs and
+history in a temporary directory) with MusicEngine replaced by a fake that
+sleeps for a realistic, log-normally distributed render time and writes
+synthetic audio. Virtual users then drive a scripted mix of traffic:
+
+    generate (music / sfx) -> poll /api/result until done -> download mp3 (and wav)
+    + /api/history and /api/health reads, with think time in between
+
+Each user connects from its own loopback address (127.0.0.x), so the
+per-IP rate limits apply per user as they would in production.
+
+Reports per endpoint: requests, p50 / p95 / p99 latency, errors,
+rate-limited (429) responses, and event-loop lag observed while requests
+to that endpoint were in flight (sampled every 10 ms inside the server).
+
+Usage (from backend/):
+    python -m benchmarks.loadtest --users 20 --duration 60
+    python -m benchmarks.loadtest --users 50 --engine sleep --time-scale 0.02 --out loadtest.json
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+# Median real-time factor (render seconds per audio second) of the real
+# engines on a CPU box, and the log-normal spread around it.
+FAKE_TIMINGS = {
+    "music": {"rtf": 3.0, "sigma": 0.35},
+    "melody": {"rtf": 4.0, "sigma": 0.35},
+    "sfx": {"rtf": 2.0, "sigma": 0.25},
+}
+
+TRAFFIC_MIX = {"music": 0.6, "sfx": 0.4}
+PROMPTS = {
+    "music": ["warm lofi beats, vinyl crackle", "epic orchestral drums, choir", "smooth jazz saxophone"],
+    "sfx": ["heavy rain on a tin roof", "wooden door creaking open", "crowd cheering in a stadium"],
+}
+
+
+def endpoint_label(method: str, path: str) -> str:
+    path = re.sub(r"^/api/(result|task)/[^/]+$", r"/api/\1/{id}", path)
+    path = re.sub(r"^/api/download/[^/]+/[^/]+$", "/api/download/{id}/{file}", path)
+    return f"{method} {path}"
+
+
+def percentile(values: list[float], q: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+# ---------------------------------------------------------------
+# FAKE ENGINE (replaces engine.musicgen_engine.MusicEngine)
+# ---------------------------------------------------------------
+class FakeEngineFactory:
+    """
+    engine="sleep": sleep, then write a short silent WAV (cheap I/O)
+    engine="synth": sleep, then write full-length synthetic audio (realistic I/O + MP3 encode)
+    """
+
+    def __init__(self, engine: str, time_scale: float, seed: int):
+        self.engine = engine
+        self.time_scale = time_scale
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def render_seconds(self, kind: str, duration: float) -> float:
+        timing = FAKE_TIMINGS[kind]
+        with self.lock:
+            factor = self.rng.lognormvariate(0.0, timing["sigma"])
+        return duration * timing["rtf"] * factor * self.time_scale
+
+    def write_audio(self, path: Path, duration: float, sr: int) -> Path:
+        import numpy as np
+        import soundfile as sf
+
+        seconds = duration if self.engine == "synth" else 0.1
+        t = np.arange(int(seconds * sr)) / sr
+        sf.write(str(path), (0.2 * np.sin(2 * np.pi * 440.0 * t)).astype(np.float32), sr)
+        return path
+
+    def __call__(self, model_name, device, output_dir, profile="quality"):
+        factory = self
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        class FakeMusicEngine:
+            def _render(self, kind: str, duration: float, sr: int, name: str) -> Path:
+                time.sleep(factory.render_seconds(kind, float(duration)))
+                return factory.write_audio(output_dir / f"{name}_{os.urandom(4).hex()}.wav", float(duration), sr)
+
+            def generate_text(self, prompt, duration, params):
+                return self._render("music", duration, 32000, "musicgen")
+
+            def generate_with_reference(self, prompt, ref_audio_path, duration, params):
+                return self._render("melody", duration, 32000, "melody")
+
+            def generate_sfx(self, prompt, duration, model_name="audioldm2p", seed=None, quality="standard"):
+                return self._render("sfx", duration, 16000, "sfx")
+
+            # Batches: one forward pass, output written into each clip's folder
+            def generate_text_batch(self, prompts, duration, params, out_dirs):
+                return self._render_batch("music", duration, 32000, "musicgen", out_dirs)
+
+            def generate_sfx_batch(self, prompts, seeds, out_dirs, duration, model_name="audioldm2p",
+                                   quality="standard"):
+                return self._render_batch("sfx", duration, 16000, "sfx", out_dirs)
+
+            def _render_batch(self, kind: str, duration: float, sr: int, name: str, out_dirs) -> list[Path]:
+                time.sleep(factory.render_seconds(kind, float(duration)))
+                return [
+                    factory.write_audio(Path(d) / f"{name}_{os.urandom(4).hex()}.wav", float(duration), sr)
+                    for d in out_dirs
+                ]
+
+        return FakeMusicEngine()
+
+
+# ---------------------------------------------------------------
+# SERVER (in-process, instrumented)
+# ---------------------------------------------------------------
+class Instrumentation:
+    def __init__(self):
+        self.lag_samples: list[tuple[float, float]] = []   # (time, lag seconds)
+        self.requests: list[tuple[str, float, float]] = []  # (endpoint, start, end)
+
+    async def monitor_loop(self, interval: float = 0.01):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            self.lag_samples.append((started, max(0.0, time.perf_counter() - started - interval)))
+
+    def lag_during(self, endpoint: str) -> list[float]:
+        """Lag samples taken while at least one request to endpoint was in flight."""
+        merged = []
+        for start, end in sorted((s, e) for ep, s, e in self.requests if ep == endpoint):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+
+        lags, i = [], 0
+        for t, lag in sorted(self.lag_samples):
+            while i < len(merged) and merged[i][1] < t:
+                i += 1
+            if i == len(merged):
+                break
+            if merged[i][0] <= t:
+                lags.append(lag)
+        return lags
+
+
+def start_server(port: int, engine: str, time_scale: float, seed: int) -> Instrumentation:
+    # Must be set before config / main are imported
+    os.environ["MUSIC_OUTPUT_ROOT"] = tempfile.mkdtemp(prefix="loadtest_")
+    os.environ["WARMUP_SUBSYSTEMS"] = ""
+    os.environ["SFX_LIBRARY_ENABLED"] = "0"
+
+    import uvicorn
+    from engine import musicgen_engine
+    import main
+
+    musicgen_engine.MusicEngine = FakeEngineFactory(engine, time_scale, seed)
+    instrumentation = Instrumentation()
+
+    @main.app.middleware("http")
+    async def record_request(request, call_next):
+        started = time.perf_counter()
+        try:
+            return await call_next(request)
+        finally:
+            label = endpoint_label(request.method, request.url.path)
+            instrumentation.requests.append((label, started, time.perf_counter()))
+
+    async def start_monitor():
+        asyncio.get_running_loop().create_task(instrumentation.monitor_loop())
+
+    main.app.router.on_startup.append(start_monitor)
+
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.time() + 30
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("server did not start")
+        time.sleep(0.05)
+    print(f"🚀 App running on port {port} (outputs in {os.environ['MUSIC_OUTPUT_ROOT']})")
+    return instrumentation
+
+
+# ---------------------------------------------------------------
+# VIRTUAL USERS
+# ---------------------------------------------------------------
+class Stats:
+    def __init__(self):
+        self.latency: dict[str, list[float]] = {}
+        self.status: dict[str, dict[str, int]] = {}
+        self.jobs: list[float] = []
+        self.job_failures = 0
+
+    def record(self, endpoint: str, seconds: float, status):
+        self.latency.setdefault(endpoint, []).append(seconds)
+        counts = self.status.setdefault(endpoint, {"ok": 0, "rate_limited": 0, "error": 0})
+        if status == 429:
+            counts["rate_limited"] += 1
+        elif isinstance(status, int) and status < 400:
+            counts["ok"] += 1
+        else:
+            counts["error"] += 1
+
+
+async def request(client, stats: Stats, method: str, path: str, **kwargs):
+    import httpx
+
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, path, **kwargs)
+        status = response.status_code
+    except httpx.HTTPError as e:
+        response, status = None, type(e).__name__
+    stats.record(endpoint_label(method, path), time.perf_counter() - started, status)
+    return response
+
+
+async def virtual_user(index: int, args, stats: Stats, stop_at: float, api_key: str):
+    import httpx
+
+    rng = random.Random(args.seed + index)
+    local_address = f"127.0.0.{2 + index % 250}" if sys.platform.startswith("linux") else None
+    transport = httpx.AsyncHTTPTransport(local_address=local_address)
+    headers = {"x-api-key": api_key}
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", transport=transport,
+                                 headers=headers, timeout=30.0) as client:
+        while time.time() < stop_at:
+            mode = rng.choices(list(TRAFFIC_MIX), weights=list(TRAFFIC_MIX.values()))[0]
+            form = {
+                "prompt": rng.choice(PROMPTS[mode]),
+                "mode": mode,
+                "duration_sec": str(rng.choice([5, 10]) if mode == "sfx" else rng.choice([8, 15, 30])),
+                "model_name": "audioldm2p" if mode == "sfx" else "facebook/musicgen-small",
+            }
+            job_started = time.perf_counter()
+            response = await request(client, stats, "POST", "/api/generate", data=form)
+
+            if response is not None and response.status_code == 200:
+                task_id = response.json()["task_id"]
+                while time.time() < stop_at + args.drain:
+                    await asyncio.sleep(args.poll_interval)
+                    result = await request(client, stats, "GET", f"/api/result/{task_id}")
+                    if result is None or result.status_code != 200:
+                        continue
+                    task = result.json()
+                    if task["status"] == "done":
+                        stats.jobs.append(time.perf_counter() - job_started)
+                        await request(client, stats, "GET", task["files"]["mp3"])
+                        if rng.random() < 0.3:
+                            await request(client, stats, "GET", task["files"]["wav"])
+                        break
+                    if task["status"] in ("error", "cancelled"):
+                        stats.job_failures += 1
+                        break
+
+            if rng.random() < 0.5:
+                await request(client, stats, "GET", "/api/history")
+            if rng.random() < 0.2:
+                await request(client, stats, "GET", "/api/health")
+            await asyncio.sleep(rng.uniform(*args.think))
+
+
+# ---------------------------------------------------------------
+# REPORT
+# ---------------------------------------------------------------
+def build_report(stats: Stats, instrumentation: Instrumentation, elapsed: float) -> dict:
+    endpoints = {}
+    for endpoint, latencies in sorted(stats.latency.items()):
+        counts = stats.status[endpoint]
+        lags = instrumentation.lag_during(endpoint)
+        endpoints[endpoint] = {
+            "requests": len(latencies),
+            "rps": round(len(latencies) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+            "error_rate": round(counts["error"] / len(latencies), 4),
+            "rate_limited": counts["rate_limited"],
+            "loop_lag_p95_ms": round(percentile(lags, 0.95) * 1000, 1) if lags else None,
+            "loop_lag_max_ms": round(max(lags) * 1000, 1) if lags else None,
+        }
+    all_lags = [lag for _, lag in instrumentation.lag_samples]
+    return {
+        "elapsed_sec": round(elapsed, 1),
+        "endpoints": endpoints,
+        "jobs": {
+            "completed": len(stats.jobs),
+            "failed": stats.job_failures,
+            "p50_sec": round(percentile(stats.jobs, 0.50), 2) if stats.jobs else None,
+            "p95_sec": round(percentile(stats.jobs, 0.95), 2) if stats.jobs else None,
+        },
+        "event_loop_lag": {
+            "p95_ms": round(percentile(all_lags, 0.95) * 1000, 1) if all_lags else None,
+            "max_ms": round(max(all_lags) * 1000, 1) if all_lags else None,
+        },
+    }
+
+
+def print_report(report: dict):
+    print()
+    print("| endpoint | requests | rps | p50 ms | p95 ms | p99 ms | errors | 429s | loop lag p95 / max ms |")
+    print("| :--- | ---: | ---: | ---: | ---: | ---: | ---: | ---: | ---: |")
+    for endpoint, r in report["endpoints"].items():
+        print(f"| {endpoint} | {r['requests']} | {r['rps']} | {r['p50_ms']} | {r['p95_ms']} | {r['p99_ms']} | "
+              f"{r['error_rate']:.2%} | {r['rate_limited']} | {r['loop_lag_p95_ms']} / {r['loop_lag_max_ms']} |")
+    jobs, lag = report["jobs"], report["event_loop_lag"]
+    print(f"\nJobs: {jobs['completed']} completed, {jobs['failed']} failed, "
+          f"end-to-end p50 {jobs['p50_sec']}s / p95 {jobs['p95_sec']}s")
+    print(f"Event loop lag: p95 {lag['p95_ms']} ms, max {lag['max_ms']} ms")
+
+
+async def drive(args, api_key: str) -> Stats:
+    stats = Stats()
+    stop_at = time.time() + args.duration
+    users = []
+    for i in range(args.users):
+        users.append(asyncio.create_task(virtual_user(i, args, stats, stop_at, api_key)))
+        await asyncio.sleep(args.ramp / max(1, args.users))
+    await asyncio.gather(*users)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP load test of main.py with fake engines")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds of traffic")
+    parser.add_argument("--ramp", type=float, default=5.0, help="Seconds to start all users")
+    parser.add_argument("--drain", type=float, default=30.0, help="Extra seconds to finish polling")
+    parser.add_argument("--engine", choices=("sleep", "synth"), default="synth")
+    parser.add_argument("--time-scale", type=float, default=0.05,
+                        help="Multiplier on realistic render times (1.0 = real CPU speed)")
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--think", type=float, nargs=2, default=(0.5, 2.0), metavar=("MIN", "MAX"))
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--out", default=None, help="Write the report JSON here")
+    args = parser.parse_args()
+
+    instrumentation = start_server(args.port, args.engine, args.time_scale, args.seed)
+    from config import API_KEY
+
+    started = time.perf_counter()
+    stats = asyncio.run(drive(args, API_KEY))
+    report = build_report(stats, instrumentation, time.perf_counter() - started)
+    print_report(report)
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,334 @@
+"""
+Tiny, randomly initialised stand-ins for the production models.
+
+They expose exactly the interface the engines use (MusicGen's
+set_generation_params / generate / generate_with_chroma, a diffusers-style
+SFX pipeline with a real scheduler, DeepFilterNet's enhance()) and do the
+same kind of work at a fraction of the size: an autoregressive transformer
+over 4 codebooks, a denoising loop, an STFT mask. Weights come from a
+fixed seed and nothing is downloaded, so benchmarks run offline on CPU.
+
+install_tiny_*() put a stand-in into the engine's model registry under
+the key the engine looks up, so the real code paths run unchanged
+(MusicGen stand-ins go through the engine's own loader).
+"""
+
+import sys
+import types
+from math import log
+
+import numpy as np
+import torch
+from torch import nn
+
+
+TINY_MUSICGEN = "tiny/musicgen-tiny"
+SEED = 1234
+
+
+def _seeded(seed: int = SEED):
+    torch.manual_seed(seed)
+    np.random.seed(seed)
+
+
+def _timestep_embedding(t: torch.Tensor, dim: int) -> torch.Tensor:
+    half = dim // 2
+    freqs = torch.exp(-log(10000.0) * torch.arange(half, dtype=torch.float32) / half)
+    args = t.float().reshape(-1, 1) * freqs[None]
+    return torch.cat([torch.sin(args), torch.cos(args)], dim=-1)
+
+
+def _text_ids(texts: list[str], length: int = 32) -> torch.Tensor:
+    """Byte-level 'tokenizer': no vocabulary files needed."""
+    ids = torch.zeros(len(texts), length, dtype=torch.long)
+    for i, text in enumerate(texts):
+        raw = list((text or "").encode("utf-8")[:length])
+        if raw:
+            ids[i, : len(raw)] = torch.tensor(raw)
+    return ids
+
+
+# ---------------------------------------------------------------
+# MUSICGEN STAND-IN (audiocraft interface)
+# ---------------------------------------------------------------
+class _TinyDecoder(nn.Module):
+    """Codes [B, n_q, S] -> waveform [B, 1, S * 640] (50 Hz frames at 32 kHz)."""
+
+    def __init__(self, n_q: int, card: int, dim: int):
+        super().__init__()
+        self.emb = nn.ModuleList(nn.Embedding(card, dim) for _ in range(n_q))
+        self.up = nn.Sequential(
+            nn.ConvTranspose1d(dim, 32, kernel_size=8, stride=8),
+            nn.ELU(),
+            nn.ConvTranspose1d(32, 1, kernel_size=80, stride=80),
+        )
+
+    def decode(self, codes: torch.Tensor) -> torch.Tensor:
+        x = sum(emb(codes[:, k]) for k, emb in enumerate(self.emb))  # [B, S, dim]
+        return torch.tanh(self.up(x.transpose(1, 2)))
+
+
+class _TinyTextConditioner(nn.Module):
+    """
+    Stands in for audiocraft's T5Conditioner: tokenize() then forward() ->
+    (embeds, mask), with t5_tokenizer / output_proj so the engine's text
+    conditioning cache wraps it as it wraps the real one.
+    """
+
+    def __init__(self, dim: int):
+        super().__init__()
+        self.t5_tokenizer = _text_ids
+        self.emb = nn.Embedding(256, dim)
+        self.output_proj = nn.Linear(dim, dim)
+
+    def tokenize(self, texts: list[str]) -> dict:
+        ids = _text_ids(list(texts))
+        return {"input_ids": ids, "attention_mask": (ids > 0).long()}
+
+    def forward(self, inputs: dict):
+        mask = inputs["attention_mask"]
+        return self.output_proj(self.emb(inputs["input_ids"])) * mask[..., None], mask
+
+
+class _TinyLM(nn.Module):
+    def __init__(self, n_q: int, card: int, dim: int, layers: int):
+        super().__init__()
+        self.n_q, self.card = n_q, card
+        self.description = _TinyTextConditioner(dim)
+        self.condition_provider = types.SimpleNamespace(conditioners={"description": self.description})
+        self.chroma_proj = nn.Linear(12, dim)
+        self.emb = nn.ModuleList(nn.Embedding(card + 1, dim) for _ in range(n_q))
+        layer = nn.TransformerEncoderLayer(dim, nhead=4, dim_feedforward=dim * 4, batch_first=True)
+        self.transformer = nn.TransformerEncoder(layer, num_layers=layers)
+        self.linears = nn.ModuleList(nn.Linear(dim, card) for _ in range(n_q))
+
+
+class TinyMusicGen:
+    sample_rate = 32000
+    frame_rate = 50
+
+    def __init__(self, n_q: int = 4, card: int = 256, dim: int = 64, layers: int = 2):
+        _seeded()
+        self.lm = _TinyLM(n_q, card, dim, layers).eval()
+        self.compression_model = _TinyDecoder(n_q, card, dim).eval()
+        self._progress_callback = None
+        self.set_generation_params()
+
+    def set_custom_progress_callback(self, callback=None):
+        self._progress_callback = callback
+
+    def set_generation_params(self, duration: float = 8.0, temperature: float = 1.0,
+                              top_k: int = 250, top_p: float = 0.0, **_):
+        self.duration, self.temperature, self.top_k, self.top_p = duration, temperature, top_k, top_p
+
+    def _sample(self, logits: torch.Tensor) -> torch.Tensor:
+        probs = torch.softmax(logits / max(self.temperature, 1e-5), dim=-1)
+        if self.top_p > 0:
+            sorted_probs, idx = probs.sort(dim=-1, descending=True)
+            keep = sorted_probs.cumsum(-1) - sorted_probs <= self.top_p
+            probs = torch.zeros_like(probs).scatter(-1, idx, sorted_probs * keep)
+        elif self.top_k > 0:
+            top, idx = probs.topk(min(self.top_k, probs.shape[-1]), dim=-1)
+            probs = torch.zeros_like(probs).scatter(-1, idx, top)
+        probs = probs / probs.sum(-1, keepdim=True)
+        flat = torch.multinomial(probs.reshape(-1, probs.shape[-1]), 1)
+        return flat.reshape(probs.shape[:-1])
+
+    def _generate(self, prefix: torch.Tensor, progress: bool = False) -> torch.Tensor:
+        lm = self.lm
+        batch = prefix.shape[0]
+        steps = max(1, int(self.duration * self.frame_rate))
+        codes = torch.full((batch, lm.n_q, 0), lm.card, dtype=torch.long)
+        for step in range(steps):
+            # As in audiocraft: the progress callback only runs for progress=True
+            if progress and self._progress_callback is not None:
+                self._progress_callback(step + 1, steps)
+            shifted = torch.cat([torch.full((batch, lm.n_q, 1), lm.card, dtype=torch.long), codes], dim=2)
+            x = torch.cat([prefix, sum(emb(shifted[:, k]) for k, emb in enumerate(lm.emb))], dim=1)
+            mask = nn.Transformer.generate_square_subsequent_mask(x.shape[1])
+            h = lm.transformer(x, mask=mask)[:, -1]
+            logits = torch.stack([head(h) for head in lm.linears], dim=1)  # [B, n_q, card]
+            codes = torch.cat([codes, self._sample(logits)[..., None]], dim=2)
+        return self.compression_model.decode(codes)
+
+    def _text_prefix(self, descriptions: list[str]) -> torch.Tensor:
+        conditioner = self.lm.condition_provider.conditioners["description"]
+        embeds, mask = conditioner(conditioner.tokenize(descriptions))
+        return embeds * mask[..., None]  # [B, <=32, dim]
+
+    def generate(self, descriptions: list[str], progress: bool = False) -> torch.Tensor:
+        return self._generate(self._text_prefix(descriptions), progress)
+
+    def generate_with_chroma(self, descriptions: list[str], melody_wavs, melody_sample_rate: int,
+                             progress: bool = False) -> torch.Tensor:
+        if isinstance(melody_wavs, torch.Tensor):
+            melody_wavs = list(melody_wavs if melody_wavs.dim() == 3 else melody_wavs[None])
+        prefixes = []
+        for wav in melody_wavs:
+            wav = wav.reshape(-1).float()
+            spec = torch.stft(wav, n_fft=2048, hop_length=melody_sample_rate // self.frame_rate,
+                              window=torch.hann_window(2048), return_complex=True).abs()
+            bins = torch.arange(spec.shape[0]) % 12
+            chroma = torch.zeros(12, spec.shape[1]).index_add_(0, bins, spec)
+            chroma = chroma / (chroma.sum(0, keepdim=True) + 1e-6)
+            prefixes.append(self.lm.chroma_proj(chroma.T[:32]))  # [<=32, dim]
+        chroma_prefix = nn.utils.rnn.pad_sequence(prefixes, batch_first=True)
+        return self._generate(torch.cat([self._text_prefix(descriptions), chroma_prefix], dim=1), progress)
+
+
+# ---------------------------------------------------------------
+# AUDIOLDM STAND-IN (diffusers-style pipeline, real scheduler)
+# ---------------------------------------------------------------
+class _TinyTextEncoder(nn.Module):
+    def __init__(self, dim: int = 64):
+        super().__init__()
+        self.emb = nn.Embedding(256, dim)
+        self.proj = nn.Linear(dim, dim)
+
+    def forward(self, ids: torch.Tensor) -> torch.Tensor:
+        return nn.functional.normalize(self.proj(self.emb(ids).mean(1)), dim=-1)
+
+
+class _TinyUNet(nn.Module):
+    def __init__(self, channels: int = 4, hidden: int = 32, cond_dim: int = 64):
+        super().__init__()
+        self.inp = nn.Conv2d(channels, hidden, 3, padding=1)
+        self.cond = nn.Linear(cond_dim * 2, hidden)
+        self.mid = nn.Sequential(
+            nn.SiLU(), nn.Conv2d(hidden, hidden, 3, padding=1),
+            nn.SiLU(), nn.Conv2d(hidden, hidden, 3, padding=1),
+        )
+        self.out = nn.Conv2d(hidden, channels, 3, padding=1)
+
+    def forward(self, x: torch.Tensor, t: torch.Tensor, cond: torch.Tensor) -> torch.Tensor:
+        film = self.cond(torch.cat([cond, _timestep_embedding(t, cond.shape[-1]).expand_as(cond)], -1))
+        h = self.inp(x) + film[:, :, None, None]
+        return self.out(self.mid(h) + h)
+
+
+class _TinyVocoder(nn.Module):
+    """Latents [B, 4, F, 8] at 25 fps -> waveform at 16 kHz (640 samples per frame)."""
+
+    def __init__(self):
+        super().__init__()
+        self.frame = nn.Linear(4 * 8, 640)
+
+    def decode(self, latents: torch.Tensor) -> torch.Tensor:
+        b, c, f, w = latents.shape
+        frames = self.frame(latents.permute(0, 2, 1, 3).reshape(b, f, c * w))
+        return torch.tanh(frames.reshape(b, -1))
+
+
+class TinySfxPipeline:
+    """Same call surface sfx.py uses on AudioLDMPipeline."""
+
+    def __init__(self, unet=None, vae=None, text_encoder=None, scheduler=None):
+        if unet is None:
+            from diffusers import DDIMScheduler
+
+            _seeded()
+            unet, vae, text_encoder = _TinyUNet().eval(), _TinyVocoder().eval(), _TinyTextEncoder().eval()
+            scheduler = DDIMScheduler(num_train_timesteps=1000, beta_schedule="scaled_linear")
+        self.unet, self.vae, self.text_encoder, self.scheduler = unet, vae, text_encoder, scheduler
+
+    @property
+    def components(self) -> dict:
+        return {"unet": self.unet, "vae": self.vae, "text_encoder": self.text_encoder, "scheduler": self.scheduler}
+
+    def _encode_prompt(self, prompt, device, num_waveforms_per_prompt, do_classifier_free_guidance,
+                       negative_prompt=None):
+        texts = [negative_prompt or "", prompt] if do_classifier_free_guidance else [prompt]
+        return self.text_encoder(_text_ids(texts))
+
+    def __call__(self, prompt_embeds, negative_prompt_embeds, num_inference_steps: int = 30,
+                 audio_length_in_s: float = 5.0, generator=None, guidance_scale: float = 2.5,
+                 callback=None, callback_steps: int = 1):
+        frames = int(audio_length_in_s * 25)
+        if isinstance(generator, list):  # one generator per batch item, as in diffusers
+            latents = torch.cat([torch.randn((1, 4, frames, 8), generator=g) for g in generator])
+        else:
+            latents = torch.randn((prompt_embeds.shape[0], 4, frames, 8), generator=generator)
+        cond = torch.cat([negative_prompt_embeds, prompt_embeds])
+
+        self.scheduler.set_timesteps(num_inference_steps)
+        latents = latents * self.scheduler.init_noise_sigma
+        for i, t in enumerate(self.scheduler.timesteps):
+            model_in = self.scheduler.scale_model_input(torch.cat([latents] * 2), t)
+            noise_uncond, noise_text = self.unet(model_in, t, cond).chunk(2)
+            noise = noise_uncond + guidance_scale * (noise_text - noise_uncond)
+            latents = self.scheduler.step(noise, t, latents).prev_sample
+            if callback is not None and i % callback_steps == 0:
+                callback(i, t, latents)
+
+        audio = self.vae.decode(latents)[:, : int(audio_length_in_s * 16000)]
+        return types.SimpleNamespace(audios=audio.numpy())
+
+
+# ---------------------------------------------------------------
+# DEEPFILTERNET STAND-IN (df.enhance interface)
+# ---------------------------------------------------------------
+class _TinyDfState:
+    def sr(self) -> int:
+        return 48000
+
+
+class _TinyMask(nn.Module):
+    def __init__(self, bins: int = 481, hidden: int = 64):
+        super().__init__()
+        self.net = nn.Sequential(
+            nn.Conv1d(bins, hidden, 3, padding=1), nn.ReLU(),
+            nn.Conv1d(hidden, bins, 3, padding=1), nn.Sigmoid(),
+        )
+
+    def forward(self, magnitude: torch.Tensor) -> torch.Tensor:
+        return self.net(magnitude)
+
+
+def tiny_enhance(model, df_state, audio: torch.Tensor, pad: bool = True) -> torch.Tensor:
+    """STFT -> learned magnitude mask -> ISTFT (960-point frames, 480 hop, like DeepFilterNet)."""
+    window = torch.hann_window(960)
+    with torch.inference_mode():
+        spec = torch.stft(audio, n_fft=960, hop_length=480, window=window, return_complex=True)
+        spec = spec * model(spec.abs())
+        return torch.istft(spec, n_fft=960, hop_length=480, window=window, length=audio.shape[-1])
+
+
+# ---------------------------------------------------------------
+# REGISTRATION
+# ---------------------------------------------------------------
+def install_tiny_musicgen(device: str = "cpu", profile: str = "quality") -> str:
+    """
+    Load stand-ins for TINY_MUSICGEN and the melody model through the
+    engine's own loader (profile, progress callback, conditioning caches);
+    returns the model name.
+    """
+    from engine import musicgen_engine as mg
+
+    for name in (TINY_MUSICGEN, mg.MELODY_MODEL):
+        mg.load_music_model(name, device, profile, pretrained=lambda name, device: TinyMusicGen())
+    return TINY_MUSICGEN
+
+
+def install_tiny_sfx(model_key: str = "audioldm-s-full-v2", profile: str = "quality") -> str:
+    from engine import sfx
+
+    sfx.PIPELINES.get(sfx._pipeline_key(model_key, profile), TinySfxPipeline)
+    return model_key
+
+
+def install_tiny_isolation():
+    """Works without DeepFilterNet installed: df.enhance is provided if missing."""
+    try:
+        import df.enhance  # noqa: F401
+    except ImportError:
+        stand_in = types.ModuleType("df.enhance")
+        stand_in.enhance = tiny_enhance
+        stand_in.init_df = lambda *a, **k: (_TinyMask(), _TinyDfState(), "", 0)
+        sys.modules.setdefault("df", types.ModuleType("df"))
+        sys.modules["df.enhance"] = stand_in
+
+    from services import isolation
+
+    _seeded()
+    isolation.enhance = tiny_enhance
+    isolation.DF_MODELS.get("deepfilternet", lambda: (_TinyMask().eval(), _TinyDfState()))
@@ -15,13 +15,17 @@ API_KEY = os.getenv("MUSIC_API_KEY", "PTG2025")   # Change before production
 # Allowed frontend origins for CORS
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "*").split(",")
 
+# Admin key (header x-admin-key) for diagnostics such as per-request
+# profiling. Unset = admin features disabled.
+ADMIN_API_KEY = os.getenv("MUSIC_ADMIN_KEY", "")
+
 
 # ============================
 # ✅ PATHS & DIRECTORIES
 # ============================
 
 BASE_DIR = Path(__file__).resolve().parent
-OUTPUT_ROOT = BASE_DIR / "outputs"
+OUTPUT_ROOT = Path(os.getenv("MUSIC_OUTPUT_ROOT", str(BASE_DIR / "outputs")))
 OUTPUT_ROOT.mkdir(parents=True, exist_ok=True)
 
 HISTORY_FILE = OUTPUT_ROOT / "history.json"
@@ -44,3 +48,247 @@ DEFAULT_MODEL = os.getenv("MUSIC_MODEL", "facebook/musicgen-small")
 
 # Max file upload size = 30 MB
 MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", str(30 * 1024 * 1024)))
+
+
+# ============================
+# ✅ STARTUP
+# ============================
+
+# Heavy subsystems to load in the background right after the server binds.
+# Anything not listed loads on first use.
+# Options: musicgen, sfx, isolation, chat   (empty = fully lazy)
+WARMUP_SUBSYSTEMS = [
+    s.strip() for s in os.getenv("WARMUP_SUBSYSTEMS", "musicgen,sfx").split(",") if s.strip()
+]
+
+# Budget for `import main` (checked by startup_report.py in CI)
+IMPORT_BUDGET_SEC = float(os.getenv("IMPORT_BUDGET_SEC", "1.0"))
+
+
+# ============================
+# ✅ WORKER PROCESSES (serve.py)
+# ============================
+
+# Inference worker processes forked from one preloaded parent.
+# Model weights are loaded once and shared copy-on-write.
+WORKERS = int(os.getenv("MUSIC_WORKERS", "1"))
+
+# Subsystems loaded in the parent before forking (chat is never preloaded:
+# its gRPC client is not fork-safe)
+PRELOAD_SUBSYSTEMS = [
+    s.strip() for s in os.getenv("PRELOAD_SUBSYSTEMS", "musicgen,sfx,isolation").split(",") if s.strip()
+]
+
+WORKERS_STATUS_FILE = OUTPUT_ROOT / "workers.json"
+
+
+# ============================
+# ✅ CPU EXECUTION PROFILE
+# ============================
+
+# Concurrent inference workers per process ("auto" = calibrated or heuristic).
+# Cores are split evenly between workers and torch threads set to match.
+INFERENCE_WORKERS = os.getenv("INFERENCE_WORKERS", "auto")
+
+# Pin each inference worker to its core set (Linux only)
+INFERENCE_PIN_CORES = os.getenv("INFERENCE_PIN_CORES", "0") == "1"
+
+# Written by: python -m services.executor --calibrate
+EXECUTION_PROFILE_FILE = OUTPUT_ROOT / "execution_profile.json"
+
+
+# ============================
+# ✅ DRAFT-THEN-REFINE PREVIEWS
+# ============================
+
+# /api/generate with preview=true first publishes a quick draft:
+# music → the first N seconds from MusicGen, sfx → a few diffusion steps
+PREVIEW_MUSIC_SEC = int(os.getenv("PREVIEW_MUSIC_SEC", "3"))
+PREVIEW_SFX_QUALITY = os.getenv("PREVIEW_SFX_QUALITY", "draft")
+
+
+# ============================
+# ✅ INFERENCE CACHES
+# ============================
+
+# Reused intermediate results (prompt embeddings, conditioning, decoded
+# references). Persisted caches live here and survive restarts.
+CACHE_DIR = OUTPUT_ROOT / "cache"
+
+# AudioLDM / AudioLDM2 prompt embeddings keyed by (model, prompt, negative)
+PROMPT_CACHE_SIZE = int(os.getenv("PROMPT_CACHE_SIZE", "256"))
+PROMPT_CACHE_PERSIST = os.getenv("PROMPT_CACHE_PERSIST", "1") == "1"
+
+# MusicGen T5 text conditioning keyed by (model, prompt text)
+MUSICGEN_TEXT_CACHE_SIZE = int(os.getenv("MUSICGEN_TEXT_CACHE_SIZE", "512"))
+
+# Melody references: decoded 32 kHz audio + chroma features, keyed by content hash
+REFERENCE_CACHE_SIZE = int(os.getenv("REFERENCE_CACHE_SIZE", "16"))
+
+
+# ============================
+# ✅ PRE-RENDERED SFX LIBRARY
+# ============================
+
+# Written by: python render_sfx_library.py
+# Catalogue prompts (SOUND_PROMPTS) found here are served without inference
+SFX_LIBRARY_DIR = OUTPUT_ROOT / "sfx_library"
+SFX_LIBRARY_ENABLED = os.getenv("SFX_LIBRARY_ENABLED", "1") == "1"
+
+
+# ============================
+# ✅ TRACING
+# ============================
+
+# Per-task span trees (upload → queue → model → encode → inference → ...)
+# are kept in task meta / history; every finished span is also appended as
+# one JSON line to TRACE_LOG_FILE through a background log queue.
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1") == "1"
+TRACE_LOG_FILE = OUTPUT_ROOT / "traces.jsonl"
+
+
+# ============================
+# ✅ PROFILER
+# ============================
+
+# Inference of a task runs under torch.profiler when an admin asks for it
+# (torch_profile=true + x-admin-key) or for this fraction of local jobs.
+# Writes profile.json (Chrome trace: chrome://tracing / Perfetto) and
+# profile.txt (top operators by CPU time and memory) into the task dir.
+PROFILER_SAMPLE_RATE = float(os.getenv("PROFILER_SAMPLE_RATE", "0"))
+PROFILER_RECORD_SHAPES = os.getenv("PROFILER_RECORD_SHAPES", "1") == "1"
+
+
+# ============================
+# ✅ MEMORY WATCHDOG
+# ============================
+
+# Background check of this process's RSS and the system's available memory.
+# Above the high watermarks: idle models are unloaded (least recently used
+# first), then in-memory caches are dropped, and new heavy jobs get 503
+# until memory is back under the low watermarks. 0 disables a watermark.
+MEMORY_WATCHDOG_ENABLED = os.getenv("MEMORY_WATCHDOG_ENABLED", "1") == "1"
+MEMORY_CHECK_INTERVAL_SEC = float(os.getenv("MEMORY_CHECK_INTERVAL_SEC", "5"))
+MEMORY_RSS_HIGH_MB = int(os.getenv("MEMORY_RSS_HIGH_MB", "0"))
+MEMORY_RSS_LOW_MB = int(os.getenv("MEMORY_RSS_LOW_MB", "0"))
+MEMORY_AVAILABLE_LOW_MB = int(os.getenv("MEMORY_AVAILABLE_LOW_MB", "1024"))
+MEMORY_AVAILABLE_RECOVER_MB = int(os.getenv("MEMORY_AVAILABLE_RECOVER_MB", "2048"))
+# Only models unused for this long are unloaded
+MEMORY_EVICT_IDLE_SEC = float(os.getenv("MEMORY_EVICT_IDLE_SEC", "30"))
+
+
+# ============================
+# ✅ RETENTION (outputs on disk)
+# ============================
+
+# Finished task folders are deleted once not downloaded for
+# RETENTION_MAX_AGE_DAYS, or least recently used first while the total
+# exceeds RETENTION_MAX_GB (0 = no quota). Runs in the background in small
+# batches; history.json entries of deleted tasks are removed too.
+RETENTION_ENABLED = os.getenv("RETENTION_ENABLED", "1") == "1"
+RETENTION_MAX_AGE_DAYS = float(os.getenv("RETENTION_MAX_AGE_DAYS", "7"))
+RETENTION_MAX_GB = float(os.getenv("RETENTION_MAX_GB", "0"))
+RETENTION_INTERVAL_SEC = float(os.getenv("RETENTION_INTERVAL_SEC", "60"))
+RETENTION_BATCH = int(os.getenv("RETENTION_BATCH", "25"))
+# Engine scratch files (engine/outputs/sfx) older than this are removed
+RETENTION_SCRATCH_MAX_AGE_SEC = float(os.getenv("RETENTION_SCRATCH_MAX_AGE_SEC", "3600"))
+RETENTION_INDEX_FILE = OUTPUT_ROOT / "retention.json"
+
+
+# ============================
+# ✅ ARTEFACT STORE
+# ============================
+
+# Finished outputs are stored once by content hash; task folders hold
+# hard links to them (see services/blobstore.py)
+BLOB_STORE_DIR = OUTPUT_ROOT / "blobs"
+BLOB_STORE_ENABLED = os.getenv("BLOB_STORE_ENABLED", "1") == "1"
+
+
+# ============================
+# ✅ STORAGE ENCODING & COLD TIER
+# ============================
+
+# Sample format of the WAVs engines write: PCM_16 | PCM_24 | FLOAT
+OUTPUT_WAV_SUBTYPE = os.getenv("OUTPUT_WAV_SUBTYPE", "PCM_16").upper()
+# Task folders not downloaded for this many days are compacted: WAVs are
+# transcoded to STORAGE_COLD_FORMAT (flac = lossless, opus = lossy, much
+# smaller) and MP3s dropped. Downloads re-create them on demand.
+# 0 = compact as soon as a task is idle (FLAC at rest); negative = off.
+STORAGE_COLD_AFTER_DAYS = float(os.getenv("STORAGE_COLD_AFTER_DAYS", "2"))
+STORAGE_COLD_FORMAT = os.getenv("STORAGE_COLD_FORMAT", "flac").lower()
+STORAGE_OPUS_BITRATE = os.getenv("STORAGE_OPUS_BITRATE", "96k")
+
+
+# ============================
+# ✅ DEADLINES & TIMEOUTS
+# ============================
+
+# Each job's deadline = JOB_DEADLINE_SLACK x its estimated cost, clamped to
+# [MIN, MAX] and shortened by the client's timeout_sec hint. Costs start
+# from these seconds-per-audio-second defaults and are then learned from
+# finished jobs (see services/deadlines.py).
+JOB_DEADLINE_SLACK = float(os.getenv("JOB_DEADLINE_SLACK", "3"))
+JOB_DEADLINE_MIN_SEC = float(os.getenv("JOB_DEADLINE_MIN_SEC", "120"))
+JOB_DEADLINE_MAX_SEC = float(os.getenv("JOB_DEADLINE_MAX_SEC", "1800"))
+JOB_COST_OVERHEAD_SEC = float(os.getenv("JOB_COST_OVERHEAD_SEC", "30"))
+JOB_COST_DEFAULTS = {
+    "music": 6.0, "sfx": 3.0, "isolation": 0.5, "transpose": 0.5,
+    "sfx_paid": 1.0, "isolation_paid": 0.5, "mixdown": 0.1, "video": 1.0,
+}
+# A worker still busy this long after its job's deadline is replaced
+JOB_DEADLINE_GRACE_SEC = float(os.getenv("JOB_DEADLINE_GRACE_SEC", "30"))
+# Upper bounds below the job deadline
+FFMPEG_TIMEOUT_SEC = float(os.getenv("FFMPEG_TIMEOUT_SEC", "300"))
+HTTP_CONNECT_TIMEOUT_SEC = float(os.getenv("HTTP_CONNECT_TIMEOUT_SEC", "10"))
+ELEVENLABS_TIMEOUT_SEC = float(os.getenv("ELEVENLABS_TIMEOUT_SEC", "180"))
+URL_FETCH_TIMEOUT_SEC = float(os.getenv("URL_FETCH_TIMEOUT_SEC", "8"))
+
+
+# ============================
+# ✅ BATCH GENERATION
+# ============================
+
+# POST /api/generate/batch: clips per request, and clips per forward pass
+# (larger batches use more memory; the rest are queued as further passes)
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "8"))
+BATCH_MAX_FORWARD = max(1, int(os.getenv("BATCH_MAX_FORWARD", "4")))
+
+
+# ============================
+# ✅ TIMELINE MIXDOWN
+# ============================
+
+# POST /api/mixdown renders studio projects in blocks of this many frames.
+# Decoded clip sources and rendered blocks are cached, so re-exports after
+# an edit only re-render the blocks it touches (a 44.1 kHz stereo block of
+# 65536 frames is 512 KB).
+MIXDOWN_BLOCK_FRAMES = int(os.getenv("MIXDOWN_BLOCK_FRAMES", "65536"))
+MIXDOWN_SOURCE_CACHE_SIZE = int(os.getenv("MIXDOWN_SOURCE_CACHE_SIZE", "32"))
+MIXDOWN_BLOCK_CACHE_SIZE = int(os.getenv("MIXDOWN_BLOCK_CACHE_SIZE", "256"))
+MIXDOWN_MAX_SEC = float(os.getenv("MIXDOWN_MAX_SEC", "1800"))
+
+
+# ============================
+# ✅ WAVEFORM VIDEO EXPORT
+# ============================
+
+# POST /api/video/waveform: frames computed per batch and piped raw into FFmpeg
+VIDEO_MAX_SEC = float(os.getenv("VIDEO_MAX_SEC", "900"))
+VIDEO_MAX_WIDTH = int(os.getenv("VIDEO_MAX_WIDTH", "1920"))
+VIDEO_MAX_HEIGHT = int(os.getenv("VIDEO_MAX_HEIGHT", "1080"))
+VIDEO_FRAME_BATCH = int(os.getenv("VIDEO_FRAME_BATCH", "16"))
+
+
+# ============================
+# ✅ LOUDNESS
+# ============================
+
+# Every output WAV is measured (integrated LUFS, true peak, RMS) and the
+# analysis stored in task meta. Generated music / SFX are normalised to
+# the target, with the true peak kept under the ceiling; other outputs
+# are only turned down if they would clip.
+LOUDNESS_ANALYSIS = os.getenv("LOUDNESS_ANALYSIS", "1") == "1"
+LOUDNESS_NORMALISE = os.getenv("LOUDNESS_NORMALISE", "1") == "1"
+LOUDNESS_TARGET_LUFS = float(os.getenv("LOUDNESS_TARGET_LUFS", "-14"))
+LOUDNESS_TRUE_PEAK_DBTP = float(os.getenv("LOUDNESS_TRUE_PEAK_DBTP", "-1"))
@@ -1,3 +1,6 @@
+import os
+import time
+import tempfile
 import subprocess
 from pathlib import Path
 import soundfile as sf
@@ -5,6 +8,10 @@ import numpy as np
 from pydub import AudioSegment
 from pydub.utils import which
 
+from config import FFMPEG_TIMEOUT_SEC, LOUDNESS_ANALYSIS, LOUDNESS_NORMALISE, OUTPUT_WAV_SUBTYPE
+from services.deadlines import DeadlineExceeded, capped_timeout
+from services.metrics import timed_stage
+
 
 # -----------------------------------------------------------
 # ✅ INTERNAL: Run FFmpeg command safely
@@ -14,13 +21,21 @@ def run_ffmpeg(args: list[str]):
     Run FFmpeg with given args.
     Example:
         run_ffmpeg(["-i", "input.wav", "output.mp3"])
+
+    Killed after FFMPEG_TIMEOUT_SEC, or sooner if the job's deadline is
+    closer (raises DeadlineExceeded).
     """
-    process = subprocess.run(
-        ["ffmpeg", "-y", *args],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True
-    )
+    timeout = capped_timeout(FFMPEG_TIMEOUT_SEC)
+    try:
+        process = subprocess.run(
+            ["ffmpeg", "-y", *args],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        raise DeadlineExceeded(f"FFmpeg killed after {timeout:.0f}s") from None
 
     if process.returncode != 0:
         # Instead of crashing, log the error and continue
@@ -29,22 +44,74 @@ def run_ffmpeg(args: list[str]):
 
 
 # -----------------------------------------------------------
-# ✅ Convert reference audio to mono 32kHz WAV
-# Required for MusicGen melody mode
+# ✅ Write an output WAV in the configured sample format
 # -----------------------------------------------------------
-def ensure_wav_32k_mono(src_path: Path, dst_path: Path) -> Path:
+def write_wav(path, audio: np.ndarray, sr: int, subtype: str | None = None, normalise: bool = False):
     """
-    Convert any audio file (mp3, wav, m4a) → mono 32kHz WAV
+    Every engine output goes through here so the at-rest encoding is set
+    in one place (OUTPUT_WAV_SUBTYPE: PCM_16 / PCM_24 / FLOAT), and so is
+    the loudness stage (engine/loudness.py): the clip is measured, turned
+    down rather than clipped, and normalised if asked (generated clips).
+    Returns the loudness analysis (None when LOUDNESS_ANALYSIS=0).
     """
-    dst_path.parent.mkdir(parents=True, exist_ok=True)
-    args = [
-        "-i", str(src_path),
-        "-ac", "1",          # mono
-        "-ar", "32000",      # 32k sample rate
-        str(dst_path)
-    ]
-    run_ffmpeg(args)
-    return dst_path
+    analysis = None
+    if LOUDNESS_ANALYSIS:
+        from engine.loudness import finalise, remember
+        with timed_stage("loudness"):
+            audio, analysis = finalise(audio, sr, normalise and LOUDNESS_NORMALISE)
+    sf.write(str(path), audio, sr, subtype=subtype or OUTPUT_WAV_SUBTYPE)
+    if analysis is not None:
+        remember(path, analysis)
+    return analysis
+
+
+# -----------------------------------------------------------
+# ✅ Decode any audio file → mono float32 at a target rate (in-process)
+# -----------------------------------------------------------
+def decode_with_ffmpeg(src_path: Path, target_sr: int, channels: int = 1) -> np.ndarray:
+    """Decode any format FFmpeg reads straight to memory: float32 (frames, channels)."""
+    timeout = capped_timeout(FFMPEG_TIMEOUT_SEC)
+    try:
+        process = subprocess.run(
+            ["ffmpeg", "-v", "error", "-i", str(src_path),
+             "-ac", str(channels), "-ar", str(target_sr), "-f", "f32le", "-"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        raise DeadlineExceeded(f"FFmpeg killed after {timeout:.0f}s") from None
+    if process.returncode != 0:
+        raise RuntimeError(f"FFmpeg could not decode {src_path}: {process.stderr.decode(errors='replace')}")
+    return np.frombuffer(process.stdout, dtype=np.float32).reshape(-1, channels).copy()
+
+
+def resample(audio: np.ndarray, sr: int, target_sr: int) -> np.ndarray:
+    """Polyphase resampling along the first (time) axis."""
+    if sr == target_sr:
+        return np.ascontiguousarray(audio, dtype=np.float32)
+    from math import gcd
+    from scipy.signal import resample_poly
+
+    g = gcd(int(sr), int(target_sr))
+    audio = resample_poly(audio, target_sr // g, int(sr) // g, axis=0)
+    return np.ascontiguousarray(audio, dtype=np.float32)
+
+
+def load_mono_resampled(src_path: Path, target_sr: int = 32000) -> np.ndarray:
+    """
+    Decode with libsndfile (wav / flac / ogg / mp3) and resample with a
+    polyphase filter, without spawning ffmpeg. Formats libsndfile cannot
+    read (m4a, aac, ...) are decoded by ffmpeg straight to memory.
+    """
+    try:
+        audio, sr = sf.read(str(src_path), dtype="float32", always_2d=True)
+        audio = audio.mean(axis=1)
+    except (RuntimeError, sf.LibsndfileError) as e:
+        print(f"⚠️ soundfile could not decode {Path(src_path).name} ({e}), using FFmpeg")
+        return decode_with_ffmpeg(src_path, target_sr)[:, 0].copy()
+
+    return resample(audio, sr, target_sr)
 
 
 # -----------------------------------------------------------
@@ -55,6 +122,7 @@ def ensure_wav_32k_mono(src_path: Path, dst_path: Path) -> Path:
 AudioSegment.converter = which("ffmpeg") or "ffmpeg"
 
 
+@timed_stage("mp3_encode")
 def wav_to_mp3(wav_path: Path, mp3_path: Path, bitrate: str = "192k") -> Path:
     """
     Converts a WAV file to MP3 safely using PyDub first,
@@ -94,6 +162,175 @@ def wav_to_mp3(wav_path: Path, mp3_path: Path, bitrate: str = "192k") -> Path:
 # -----------------------------------------------------------
 # ✅ Create Animated Waveform MP4 (handles mono safely)
 # -----------------------------------------------------------
+# Frames are computed in batches with NumPy (no per-pixel Python loops)
+# and piped as raw RGB into one FFmpeg process, which muxes them with the
+# original audio. No intermediate images touch the disk.
+
+VIDEO_STYLES = ("waveform", "spectrum")
+SPECTRUM_FFT = 2048
+SPECTRUM_BARS = 64
+SPECTRUM_FLOOR_DB = -60.0
+
+
+def _hex_rgb(color: str) -> np.ndarray:
+    value = color.lstrip("#")
+    if len(value) != 6:
+        raise ValueError(f"Colour must be #rrggbb, got '{color}'")
+    return np.array([int(value[i:i + 2], 16) for i in (0, 2, 4)], dtype=np.uint8)
+
+
+def _pad(audio: np.ndarray, size: int) -> np.ndarray:
+    """Zero-pad audio once per render so that every window of size fits (see _windows)."""
+    return np.pad(audio, (size // 2, size - size // 2))
+
+
+def _windows(padded: np.ndarray, centers: np.ndarray, size: int) -> np.ndarray:
+    """(frames, size) windows centred on the given sample positions of _pad(audio, size)."""
+    return padded[centers[:, None] + np.arange(size)[None, :]]
+
+
+def _waveform_masks(padded, centers, width, height, per_column) -> np.ndarray:
+    columns = _windows(padded, centers, width * per_column).reshape(len(centers), width, per_column)
+    half = (height - 1) / 2
+    top = np.floor(half - columns.max(axis=2) * half)
+    bottom = np.ceil(half - columns.min(axis=2) * half)
+    rows = np.arange(height)[None, :, None]
+    return (rows >= top[:, None, :]) & (rows <= bottom[:, None, :])
+
+
+def _spectrum_masks(padded, centers, width, height) -> np.ndarray:
+    window = np.hanning(SPECTRUM_FFT).astype(np.float32)
+    magnitude = np.abs(np.fft.rfft(_windows(padded, centers, SPECTRUM_FFT) * window, axis=1))
+    magnitude /= window.sum() / 2  # full-scale sine = 0 dB
+
+    # Log-spaced bands (skipping DC), loudest bin per band
+    edges = np.unique(np.geomspace(1, magnitude.shape[1] - 1, SPECTRUM_BARS + 1).astype(int))
+    bands = np.maximum.reduceat(magnitude, edges[:-1], axis=1)
+    level = np.clip(1 - 20 * np.log10(bands + 1e-9) / SPECTRUM_FLOOR_DB, 0, 1)
+
+    bar_of_column = np.arange(width) * bands.shape[1] // width
+    bar_width = max(1, width // bands.shape[1])
+    gap = (np.arange(width) % bar_width) == bar_width - 1 if bar_width > 2 else np.zeros(width, bool)
+    heights = np.where(gap[None, :], 0, np.round(level[:, bar_of_column] * height))
+    rows = np.arange(height)[None, :, None]
+    return rows >= height - heights[:, None, :]
+
+
+def waveform_frames(
+    audio: np.ndarray,
+    sr: int,
+    fps: int,
+    width: int,
+    height: int,
+    style: str = "waveform",
+    batch: int = 16,
+    window_sec: float = 2.0,
+):
+    """
+    Yield (first_frame, masks) with masks a (batch, height, width) bool
+    array per batch of frames. waveform: min / max envelope of the
+    window_sec around each frame; spectrum: log-frequency bars.
+    """
+    peak = float(np.abs(audio).max()) if len(audio) else 0.0
+    shape = audio / peak if style == "waveform" and peak > 0 else audio
+    total = int(np.ceil(len(audio) / sr * fps))
+    per_column = max(1, int(round(window_sec * sr / width)))
+    padded = _pad(shape, width * per_column if style == "waveform" else SPECTRUM_FFT)
+    for first in range(0, total, batch):
+        centers = (np.arange(first, min(total, first + batch)) * sr / fps).astype(np.int64)
+        if style == "waveform":
+            yield first, _waveform_masks(padded, centers, width, height, per_column)
+        else:
+            yield first, _spectrum_masks(padded, centers, width, height)
+
+
+def render_waveform_video(
+    audio_path: Path,
+    out_path: Path,
+    width: int = 1280,
+    height: int = 720,
+    fps: int = 30,
+    style: str = "waveform",
+    color: str = "#22d3ee",
+    background: str = "#0b0b10",
+    batch: int = 16,
+    on_progress=None,
+) -> dict:
+    """
+    Render an animated waveform / spectrum MP4 (H.264 + AAC) of audio_path.
+    on_progress(frames_done, frames_total) is called after every batch;
+    cancellation / the job deadline are checked between batches.
+    Returns frame count and render speed.
+    """
+    from services.tasks import checkpoint
+
+    if style not in VIDEO_STYLES:
+        raise ValueError(f"Unknown video style '{style}'. Available: {list(VIDEO_STYLES)}")
+    if width % 2 or height % 2:
+        raise ValueError("Video width and height must be even")
+    fg, bg = _hex_rgb(color), _hex_rgb(background)
+
+    try:
+        audio, sr = sf.read(str(audio_path), dtype="float32", always_2d=True)
+        audio = audio.mean(axis=1)
+    except (RuntimeError, sf.LibsndfileError):
+        sr = 44100
+        audio = decode_with_ffmpeg(audio_path, sr)[:, 0]
+    total = int(np.ceil(len(audio) / sr * fps))
+    if total == 0:
+        raise ValueError("Audio is empty")
+
+    out_path = Path(out_path)
+    tmp = out_path.with_name(f".{out_path.stem}.tmp{out_path.suffix}")
+    cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+        "-i", str(audio_path),
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", "192k", "-shortest", "-movflags", "+faststart",
+        str(tmp),
+    ]
+
+    started = time.perf_counter()
+    with tempfile.TemporaryFile() as stderr, timed_stage("video_encode"):
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=stderr)
+        try:
+            for first, masks in waveform_frames(audio, sr, fps, width, height, style, batch):
+                checkpoint()
+                process.stdin.write(np.where(masks[..., None], fg, bg).tobytes())
+                if on_progress:
+                    on_progress(first + len(masks), total)
+            process.stdin.close()
+            process.wait(timeout=capped_timeout(FFMPEG_TIMEOUT_SEC))
+        except BrokenPipeError:
+            process.wait()
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            tmp.unlink(missing_ok=True)
+            raise DeadlineExceeded("FFmpeg video encode did not finish in time") from None
+        except BaseException:
+            process.kill()
+            process.wait()
+            tmp.unlink(missing_ok=True)
+            raise
+
+        if process.returncode != 0:
+            stderr.seek(0)
+            tmp.unlink(missing_ok=True)
+            raise RuntimeError(f"FFmpeg video encode failed: {stderr.read().decode(errors='replace')[-2000:]}")
+
+    os.replace(tmp, out_path)
+    seconds = time.perf_counter() - started
+    return {
+        "style": style,
+        "frames": total,
+        "fps": fps,
+        "size": f"{width}x{height}",
+        "render_seconds": round(seconds, 2),
+        "render_fps": round(total / seconds, 1) if seconds > 0 else None,
+    }
 
 
 # -----------------------------------------------------------
@@ -115,7 +352,7 @@ def pitch_shift_file(input_path: Path, output_path: Path, semitones: float) -> P
     
     # Save
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    sf.write(str(output_path), y_shifted, sr)
+    write_wav(output_path, y_shifted, sr)
     
     return output_path
 
@@ -123,6 +360,7 @@ def pitch_shift_file(input_path: Path, output_path: Path, semitones: float) -> P
 # -----------------------------------------------------------
 # ✅ Convert MP3 → WAV (helper for ElevenLabs output)
 # -----------------------------------------------------------
+@timed_stage("mp3_decode")
 def mp3_to_wav(mp3_path: Path, wav_path: Path) -> Path:
     """
     Converts MP3 to WAV.
@@ -0,0 +1,157 @@
+import os
+import time
+import pickle
+import hashlib
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+# ---------------------------------------------------------------
+# LRU CACHE (embeddings / conditioning / decoded references)
+# ---------------------------------------------------------------
+class LRUCache:
+    """
+    Thread-safe LRU cache for expensive, deterministic intermediate results.
+
+    - get_or_compute(key, compute): returns the cached value or computes it
+    - each entry remembers how long it took to compute, so every hit adds
+      that time to `saved_seconds`
+    - persist_dir: entries are also pickled to disk (one file per key) and
+      reloaded on a memory miss, so the cache survives restarts and is
+      shared by worker processes
+    """
+
+    def __init__(self, name: str, max_items: int = 256, persist_dir: Optional[Path] = None):
+        self.name = name
+        self.max_items = max(1, max_items)
+        self.persist_dir = Path(persist_dir) if persist_dir else None
+        self._entries: "OrderedDict[str, tuple[Any, float]]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.compute_seconds = 0.0
+
+        if self.persist_dir:
+            self.persist_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts: Hashable) -> str:
+        return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key: str) -> Path:
+        return self.persist_dir / f"{key}.pkl"
+
+    def _load_from_disk(self, key: str):
+        if not self.persist_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"⚠️ Cache {self.name}: dropping unreadable entry {key[:12]}: {e}")
+            self._disk_path(key).unlink(missing_ok=True)
+            return None
+
+    def _save_to_disk(self, key: str, value: Any, cost: float):
+        if not self.persist_dir:
+            return
+        path = self._disk_path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                pickle.dump((value, cost), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except Exception as e:
+            tmp.unlink(missing_ok=True)
+            print(f"⚠️ Cache {self.name}: could not persist entry: {e}")
+
+    def _store(self, key: str, value: Any, cost: float):
+        """Insert (caller holds the lock) and evict the least recently used."""
+        self._entries[key] = (value, cost)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_items:
+            old_key, _ = self._entries.popitem(last=False)
+            if self.persist_dir:
+                self._disk_path(old_key).unlink(missing_ok=True)
+
+    def get(self, key: str) -> Any:
+        """Cached value or None (counts as a hit / miss)."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                value, cost = self._entries[key]
+                self.hits += 1
+                self.saved_seconds += cost
+                return value
+
+        stored = self._load_from_disk(key)
+        with self._lock:
+            if stored is None:
+                self.misses += 1
+                return None
+            value, cost = stored
+            self._store(key, value, cost)
+            self.hits += 1
+            self.disk_hits += 1
+            self.saved_seconds += cost
+            return value
+
+    def put(self, key: str, value: Any, cost: float = 0.0):
+        with self._lock:
+            self._store(key, value, cost)
+            self.compute_seconds += cost
+        self._save_to_disk(key, value, cost)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        value = self.get(key)
+        if value is not None:
+            return value
+        started = time.perf_counter()
+        value = compute()
+        self.put(key, value, time.perf_counter() - started)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_items": self.max_items,
+                "persistent": self.persist_dir is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "saved_seconds": round(self.saved_seconds, 3),
+                "compute_seconds": round(self.compute_seconds, 3),
+            }
+
+
+# ---------------------------------------------------------------
+# GLOBAL CACHES (reported at /api/health/caches)
+# ---------------------------------------------------------------
+_CACHES: Dict[str, LRUCache] = {}
+_CACHES_LOCK = Lock()
+
+
+def get_cache(name: str, max_items: int = 256, persist_dir: Optional[Path] = None) -> LRUCache:
+    """Named caches are created once; later calls return the same instance."""
+    with _CACHES_LOCK:
+        if name not in _CACHES:
+            _CACHES[name] = LRUCache(name, max_items, persist_dir)
+        return _CACHES[name]
+
+
+def all_caches() -> Dict[str, LRUCache]:
+    with _CACHES_LOCK:
+        return dict(_CACHES)
@@ -0,0 +1,287 @@
+"""
+Loudness analysis and normalisation, shared by every engine output.
+
+ITU-R BS.1770-4 / EBU R128 measurements in one streaming pass:
+  - integrated loudness (LUFS): K-weighting (high-shelf + high-pass
+    biquads, derived for any sample rate), 400 ms blocks with 75 %
+    overlap, absolute (-70 LUFS) and relative (-10 LU) gates
+  - true peak (dBTP): 4x polyphase oversampling
+  - sample peak and RMS (dBFS)
+
+write_wav() sends every output through finalise(): generated clips are
+gained to LOUDNESS_TARGET_LUFS (capped so the true peak stays under
+LOUDNESS_TRUE_PEAK_DBTP); anything else is only turned down if it would
+clip. Nothing is hard-clipped. A gain shifts every measurement by exactly
+its dB value, so the analysis is adjusted instead of measured again, and
+kept for loudness_for() to put in task meta.
+"""
+
+import math
+import time
+from pathlib import Path
+
+import numpy as np
+
+from config import LOUDNESS_TARGET_LUFS, LOUDNESS_TRUE_PEAK_DBTP
+from engine.caches import get_cache
+
+BLOCK_SEC = 0.4          # gating block
+HOPS_PER_BLOCK = 4       # 75 % overlap = 100 ms hops
+ABSOLUTE_GATE = -70.0
+RELATIVE_GATE = -10.0
+OVERSAMPLE = 4
+TRUE_PEAK_CONTEXT = 64   # samples of filter context either side of a chunk boundary
+CHUNK = 1 << 16
+
+ANALYSES = get_cache("loudness", max_items=1024)
+
+
+def k_weighting(sr: int) -> np.ndarray:
+    """BS.1770 K-weighting as second-order sections for sr (libebur128 derivation)."""
+    # Stage 1: high shelf (head acoustics)
+    f0, gain_db, q = 1681.974450955533, 3.999843853973347, 0.7071752369554196
+    k = math.tan(math.pi * f0 / sr)
+    vh = 10 ** (gain_db / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf = [
+        (vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0,
+        1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0,
+    ]
+
+    # Stage 2: high-pass (RLB)
+    f0, q = 38.13547087602444, 0.5003270373238773
+    k = math.tan(math.pi * f0 / sr)
+    a0 = 1 + k / q + k * k
+    highpass = [1.0, -2.0, 1.0, 1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+    return np.array([shelf, highpass])
+
+
+def _db(value: float, scale: float = 20.0) -> float | None:
+    return round(scale * math.log10(value), 2) if value > 0 else None
+
+
+class LoudnessMeter:
+    """Feed (frames,) or (frames, channels) chunks to process(), then read result()."""
+
+    def __init__(self, sr: int, channels: int = 1):
+        self.sr = sr
+        self.channels = channels
+        self.hop = max(1, int(round(sr * BLOCK_SEC / HOPS_PER_BLOCK)))
+        self._sos = k_weighting(sr)
+        self._zi = np.zeros((len(self._sos), 2, channels))
+        self._pending = np.zeros((0, channels))
+        self._hops = []
+        self._context = np.zeros((0, channels))  # held back for the true-peak filter
+        self._measured = 0                        # leading samples of it already measured
+        self._frames = 0
+        self._sum_sq = 0.0
+        self._peak = 0.0
+        self._true_peak = 0.0
+
+    def process(self, chunk: np.ndarray):
+        from scipy.signal import resample_poly, sosfilt
+
+        chunk = np.asarray(chunk, dtype=np.float64)
+        if chunk.ndim == 1:
+            chunk = chunk[:, None]
+        if not len(chunk):
+            return
+        self._frames += len(chunk)
+        self._sum_sq += float(np.einsum("ij,ij->", chunk, chunk))
+        self._peak = max(self._peak, float(np.abs(chunk).max()))
+
+        # True peak: the interpolation filter needs context on both sides, so
+        # the last TRUE_PEAK_CONTEXT samples are held back until the next chunk
+        # (or result()) and measured with what follows them
+        context = np.concatenate([self._context, chunk])
+        end = len(context) - TRUE_PEAK_CONTEXT
+        if end > self._measured:
+            upsampled = resample_poly(context, OVERSAMPLE, 1, axis=0)
+            self._true_peak = max(self._true_peak, float(
+                np.abs(upsampled[self._measured * OVERSAMPLE:end * OVERSAMPLE]).max()))
+            start = max(0, end - TRUE_PEAK_CONTEXT)
+            context, self._measured = context[start:], end - start
+        self._context = context
+
+        # Mean square of the K-weighted signal per 100 ms hop (channel weights 1.0)
+        weighted, self._zi = sosfilt(self._sos, chunk, axis=0, zi=self._zi)
+        pending = np.concatenate([self._pending, weighted])
+        full = len(pending) // self.hop * self.hop
+        if full:
+            hops = pending[:full].reshape(-1, self.hop, self.channels)
+            self._hops.append(np.mean(hops * hops, axis=1).sum(axis=1))
+        self._pending = pending[full:]
+
+    def integrated(self) -> float | None:
+        hops = np.concatenate(self._hops) if self._hops else np.zeros(0)
+        if len(hops) >= HOPS_PER_BLOCK:
+            blocks = np.lib.stride_tricks.sliding_window_view(hops, HOPS_PER_BLOCK).mean(axis=1)
+        elif len(hops) or len(self._pending):
+            # Shorter than one gating block: measure what there is
+            tail = (self._pending * self._pending).mean(axis=0).sum() if len(self._pending) else 0.0
+            blocks = np.array([(hops.sum() * self.hop + tail * len(self._pending))
+                               / (len(hops) * self.hop + len(self._pending))])
+        else:
+            return None
+
+        with np.errstate(divide="ignore"):
+            loudness = -0.691 + 10 * np.log10(blocks)
+        gated = blocks[loudness > ABSOLUTE_GATE]
+        if not len(gated):
+            return None
+        threshold = -0.691 + 10 * math.log10(gated.mean()) + RELATIVE_GATE
+        gated = gated[loudness[loudness > ABSOLUTE_GATE] > threshold]
+        return round(-0.691 + 10 * math.log10(gated.mean()), 2)
+
+    def true_peak(self) -> float:
+        """Linear true peak, including the samples still held back (the stream ends here)."""
+        from scipy.signal import resample_poly
+
+        if len(self._context) <= self._measured:
+            return self._true_peak
+        upsampled = resample_poly(self._context, OVERSAMPLE, 1, axis=0)
+        return max(self._true_peak, float(np.abs(upsampled[self._measured * OVERSAMPLE:]).max()))
+
+    def result(self) -> dict:
+        samples = self._frames * self.channels
+        return {
+            "integrated_lufs": self.integrated(),
+            "true_peak_dbtp": _db(self.true_peak()),
+            "sample_peak_dbfs": _db(self._peak),
+            "rms_dbfs": _db(math.sqrt(self._sum_sq / samples)) if samples else None,
+            "duration_sec": round(self._frames / self.sr, 3),
+        }
+
+
+# ---------------------------------------------------------------
+# ANALYSE / NORMALISE
+# ---------------------------------------------------------------
+def analyse(audio: np.ndarray, sr: int) -> dict:
+    """Measure an in-memory clip ((frames,) or (frames, channels))."""
+    audio = np.asarray(audio)
+    meter = LoudnessMeter(sr, 1 if audio.ndim == 1 else audio.shape[1])
+    for start in range(0, len(audio), CHUNK):
+        meter.process(audio[start:start + CHUNK])
+    return meter.result()
+
+
+def analyse_file(path: Path) -> dict:
+    """Measure an audio file, streamed in chunks."""
+    import soundfile as sf
+
+    with sf.SoundFile(str(path)) as f:
+        meter = LoudnessMeter(f.samplerate, f.channels)
+        for chunk in f.blocks(blocksize=CHUNK, dtype="float32", always_2d=True):
+            meter.process(chunk)
+    return meter.result()
+
+
+def shift(analysis: dict, gain_db: float) -> dict:
+    """The analysis after a linear gain of gain_db."""
+    shifted = {
+        key: (round(value + gain_db, 2) + 0.0 if value is not None and key != "duration_sec" else value)
+        for key, value in analysis.items()
+    }
+    shifted["gain_db"] = round(analysis.get("gain_db", 0.0) + gain_db, 2)
+    return shifted
+
+
+def finalise(audio: np.ndarray, sr: int, normalise: bool = False) -> tuple[np.ndarray, dict]:
+    """
+    Measure a clip and apply the output gain: to the loudness target when
+    normalise is set, otherwise only as much attenuation as keeps the
+    sample peak at full scale (instead of hard-clipping it).
+    """
+    analysis = analyse(audio, sr)
+    integrated, true_peak = analysis["integrated_lufs"], analysis["true_peak_dbtp"]
+    peak = float(np.abs(audio).max()) if len(audio) else 0.0
+    gain_db = 0.0
+    if normalise and integrated is not None:
+        gain_db = LOUDNESS_TARGET_LUFS - integrated
+        if true_peak is not None:
+            gain_db = min(gain_db, LOUDNESS_TRUE_PEAK_DBTP - true_peak)
+    elif peak > 1.0:
+        gain_db = -20 * math.log10(peak)
+
+    if gain_db:
+        audio = (np.asarray(audio) * 10 ** (gain_db / 20)).astype(np.float32)
+        if peak * 10 ** (gain_db / 20) > 1.0:  # rounding of float32
+            np.clip(audio, -1.0, 1.0, out=audio)
+    analysis = shift(analysis, gain_db)
+    if normalise:
+        analysis["target_lufs"] = LOUDNESS_TARGET_LUFS
+    return audio, analysis
+
+
+# ---------------------------------------------------------------
+# ANALYSIS OF WRITTEN FILES (for task meta)
+# ---------------------------------------------------------------
+def _keys(path: Path) -> list[str]:
+    """Cache keys of a file: by path (as written), and by blob once adopted into the store."""
+    from services.blobstore import read_manifest
+
+    path = Path(path)
+    keys = [ANALYSES.make_key("loudness", str(path.resolve()), path.stat().st_size)]
+    entry = read_manifest(path.parent).get(path.name)
+    if entry:
+        keys.append(ANALYSES.make_key("loudness_blob", entry["blob"]))
+    return keys
+
+
+def remember(path: Path, analysis: dict):
+    """Keep the analysis of a file just written (see loudness_for)."""
+    ANALYSES.put(_keys(path)[0], analysis)
+
+
+def loudness_for(path: Path) -> dict | None:
+    """Analysis of an output file: the one made while writing it, else measured now."""
+    try:
+        keys = _keys(path)
+        for key in reversed(keys):
+            analysis = ANALYSES.get(key)
+            if analysis is not None:
+                break
+        else:
+            started = time.perf_counter()
+            analysis = analyse_file(path)
+            ANALYSES.put(keys[-1], analysis, time.perf_counter() - started)
+            return analysis
+        # Identical content served again (library hits, re-renders) is found by blob
+        if key != keys[-1]:
+            ANALYSES.put(keys[-1], analysis)
+        return analysis
+    except Exception as e:
+        print(f"⚠️ Loudness analysis failed for {Path(path).name}: {e}")
+        return None
+
+
+# ---------------------------------------------------------------
+# SELF-CHECK: streamed chunks must measure like one pass
+#   python -m engine.loudness
+# ---------------------------------------------------------------
+if __name__ == "__main__":
+    import sys
+    from scipy.signal import resample_poly
+
+    sr = 48000
+    t = np.arange(10 * sr) / sr
+    fade = np.minimum(1.0, np.minimum(t, t[-1] - t) / 1.0)
+    failed = False
+    for label, audio in (
+        ("mono sine, faded", 0.1 * np.sin(2 * np.pi * 997 * t) * fade),
+        ("stereo noise", np.random.default_rng(0).uniform(-0.5, 0.5, (len(t), 2))),
+    ):
+        single = LoudnessMeter(sr, 1 if audio.ndim == 1 else 2)
+        single.process(audio)
+        expected = single.result()
+        reference = _db(float(np.abs(resample_poly(audio, OVERSAMPLE, 1, axis=0)).max()))
+        for chunk in (CHUNK, 4096, 1000, 37):
+            meter = LoudnessMeter(sr, single.channels)
+            for start in range(0, len(audio), chunk):
+                meter.process(audio[start:start + chunk])
+            ok = meter.result() == expected and expected["true_peak_dbtp"] == reference
+            failed |= not ok
+            print(f"{'✅' if ok else '❌'} {label}, chunks of {chunk}: "
+                  f"{meter.result()['true_peak_dbtp']} dBTP (one pass {reference})")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,306 @@
+"""
+Server-side timeline mixdown (POST /api/mixdown).
+
+Renders a studio project (tracks of clips placed on a timeline) the way
+audioExport.ts does in the browser: S-curve clip fades, track volume x
+gain, stereo panning as in a Web Audio StereoPannerNode, transpose as a
+playback-rate change (Web Audio detune), solo / mute, clamped to [-1, 1].
+
+Clip sources are task artefacts (/api/download/<task_id>/<file>). Each
+source is decoded to stereo at the project rate once and cached by
+content. The mix is written in blocks of MIXDOWN_BLOCK_FRAMES; a block
+is cached under a key made of everything audible in it, so re-exporting
+after an edit only re-renders the blocks the edited clips touch.
+"""
+
+import time
+import hashlib
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+from config import (
+    LOUDNESS_ANALYSIS,
+    MIXDOWN_BLOCK_CACHE_SIZE,
+    MIXDOWN_BLOCK_FRAMES,
+    MIXDOWN_MAX_SEC,
+    MIXDOWN_SOURCE_CACHE_SIZE,
+    OUTPUT_ROOT,
+    OUTPUT_WAV_SUBTYPE,
+)
+from engine.audio_utils import decode_with_ffmpeg, resample
+from engine.caches import get_cache
+from engine.loudness import LoudnessMeter, remember
+from services.blobstore import read_manifest
+from services.metrics import timed_stage
+from services.tasks import checkpoint
+
+SAMPLE_RATES = (22050, 32000, 44100, 48000)
+MIN_FADE_SEC = 0.005  # as audioExport.ts: always a short fade against clicks
+DOWNLOAD_PREFIX = "/api/download/"
+
+SOURCES = get_cache("mixdown_sources", max_items=MIXDOWN_SOURCE_CACHE_SIZE)
+BLOCKS = get_cache("mixdown_blocks", max_items=MIXDOWN_BLOCK_CACHE_SIZE)
+
+
+class MixdownError(ValueError):
+    """The project cannot be rendered (unknown source, bad clip, too long)."""
+
+
+# ---------------------------------------------------------------
+# SOURCES
+# ---------------------------------------------------------------
+def resolve_source(source: str, output_root: Path = OUTPUT_ROOT) -> tuple[str, Path]:
+    """
+    (task_id, path) of a clip source: a download URL (absolute or not) or
+    "<task_id>/<file>". Compacted files are re-created from the cold tier.
+    """
+    path = source.split("?", 1)[0]
+    if DOWNLOAD_PREFIX in path:
+        path = path.split(DOWNLOAD_PREFIX, 1)[1]
+    parts = [p for p in path.strip("/").split("/") if p]
+    if len(parts) != 2 or any(p in (".", "..") or "\\" in p for p in parts):
+        raise MixdownError(f"Clip source is not a task artefact: {source}")
+
+    task_id, name = parts
+    file_path = output_root / task_id / name
+    if not file_path.is_file():
+        from services.storage_tiers import COLD_TIER
+        file_path = COLD_TIER.materialise(output_root / task_id, name)
+        if file_path is None:
+            raise MixdownError(f"Clip source not found: {source}")
+    return task_id, file_path
+
+
+def source_identity(path: Path) -> tuple:
+    """Content identity without hashing: the blob a task file links to, else its stat."""
+    entry = read_manifest(path.parent).get(path.name)
+    if entry:
+        return ("blob", entry["blob"])
+    st = path.stat()
+    return ("file", str(path), st.st_mtime_ns, st.st_size)
+
+
+def _decode_stereo(path: Path, sr: int) -> np.ndarray:
+    try:
+        audio, file_sr = sf.read(str(path), dtype="float32", always_2d=True)
+    except (RuntimeError, sf.LibsndfileError) as e:
+        print(f"⚠️ soundfile could not decode {path.name} ({e}), using FFmpeg")
+        return decode_with_ffmpeg(path, sr, channels=2)
+
+    if audio.shape[1] == 1:
+        audio = np.repeat(audio, 2, axis=1)
+    elif audio.shape[1] > 2:
+        audio = audio[:, :2]
+    return resample(audio, file_sr, sr)
+
+
+def load_source(path: Path, sr: int) -> np.ndarray:
+    """Stereo float32 (frames, 2) at sr, decoded once per distinct content."""
+    key = SOURCES.make_key("mixdown_source", sr, source_identity(path))
+    return SOURCES.get_or_compute(key, lambda: _decode_stereo(path, sr))
+
+
+# ---------------------------------------------------------------
+# CLIP PLACEMENT
+# ---------------------------------------------------------------
+@dataclass
+class Placement:
+    """One audible clip, in frames of the project rate."""
+    path: Path
+    identity: tuple
+    start: int          # first source frame
+    end: int            # source frame after the last one
+    offset: int         # timeline position
+    length: int         # timeline frames (source frames / rate)
+    rate: float         # playback rate (clip rate x transpose)
+    fade_in: int
+    fade_out: int
+    gain: float
+    pan: float
+    key: str = field(default="", init=False)
+
+    def __post_init__(self):
+        self.key = hashlib.sha256(repr((
+            self.identity, self.start, self.end, self.offset, self.length, self.rate,
+            self.fade_in, self.fade_out, self.gain, self.pan,
+        )).encode("utf-8")).hexdigest()
+
+    @property
+    def stop(self) -> int:
+        return self.offset + self.length
+
+
+def _s_curve(n: int) -> np.ndarray:
+    t = np.arange(1, n + 1, dtype=np.float32) / n
+    return 0.5 - 0.5 * np.cos(t * np.pi)
+
+
+def _pan(audio: np.ndarray, pan: float) -> np.ndarray:
+    """Web Audio StereoPannerNode on a stereo input (equal-power)."""
+    if pan == 0:
+        return audio
+    left, right = audio[:, 0], audio[:, 1]
+    if pan < 0:
+        x = (pan + 1) * np.pi / 2
+        return np.stack([left + right * np.cos(x), right * np.sin(x)], axis=1)
+    x = pan * np.pi / 2
+    return np.stack([left * np.cos(x), right + left * np.sin(x)], axis=1)
+
+
+def render_clip(p: Placement, sr: int) -> np.ndarray:
+    """The clip as it sounds on the timeline: (length, 2) float32."""
+    source = load_source(p.path, sr)
+    segment = source[p.start:min(p.end, len(source))]
+    if p.rate != 1.0 and len(segment) > 1:
+        # Linear interpolation, as browsers resample for detune / playbackRate
+        positions = np.arange(p.length, dtype=np.float64) * p.rate
+        index = np.arange(len(segment))
+        audio = np.stack([np.interp(positions, index, segment[:, c], right=0.0) for c in range(2)], axis=1)
+    else:
+        audio = np.zeros((p.length, 2), dtype=np.float32)
+        audio[:min(p.length, len(segment))] = segment[:p.length]
+    audio = audio.astype(np.float32) * p.gain
+
+    envelope = np.ones(p.length, dtype=np.float32)
+    if p.fade_in:
+        envelope[:p.fade_in] *= _s_curve(p.fade_in)
+    if p.fade_out:
+        envelope[-p.fade_out:] *= _s_curve(p.fade_out)[::-1]
+    return _pan(audio * envelope[:, None], p.pan)
+
+
+def plan_project(project: dict, sr: int, output_root: Path = OUTPUT_ROOT) -> tuple[list[Placement], set]:
+    """Audible clips of a project (mute / solo applied) and the tasks they come from."""
+    assets = {a["id"]: a["url"] for a in project.get("assets") or []}
+    tracks = project.get("tracks") or []
+    soloed = any(t.get("solo") for t in tracks)
+
+    placements, task_ids = [], set()
+    for track in tracks:
+        if track.get("muted") or (soloed and not track.get("solo")):
+            continue
+        gain = float(track.get("volume", 1.0)) * float(track.get("gain", 1.0))
+        pan = min(1.0, max(-1.0, float(track.get("pan") or 0.0)))
+        transpose = float(track.get("transpose") or 0.0)
+
+        for clip in track.get("clips") or []:
+            source = clip.get("source") or assets.get(clip.get("assetId"))
+            if not source:
+                raise MixdownError(f"Clip {clip.get('id')} has no source")
+            seconds = float(clip["endTime"]) - float(clip.get("startTime", 0.0))
+            rate = float(clip.get("playbackRate") or 1.0) * 2 ** (transpose / 12)
+            if seconds <= 0 or rate <= 0 or float(clip.get("offset", 0.0)) < 0:
+                raise MixdownError(f"Clip {clip.get('id')} has an invalid range")
+            if gain == 0:
+                continue
+
+            task_id, path = resolve_source(source, output_root)
+            task_ids.add(task_id)
+            start = int(round(float(clip.get("startTime", 0.0)) * sr))
+            end = start + int(round(seconds * sr))
+            length = max(1, int(round((end - start) / rate)))
+            placements.append(Placement(
+                path=path,
+                identity=source_identity(path),
+                start=start,
+                end=end,
+                offset=int(round(float(clip.get("offset", 0.0)) * sr)),
+                length=length,
+                rate=rate,
+                fade_in=min(length, int(round(max(MIN_FADE_SEC, float(clip.get("fadeIn") or 0)) * sr))),
+                fade_out=min(length, int(round(max(MIN_FADE_SEC, float(clip.get("fadeOut") or 0)) * sr))),
+                gain=gain,
+                pan=pan,
+            ))
+    return placements, task_ids
+
+
+# ---------------------------------------------------------------
+# RENDER
+# ---------------------------------------------------------------
+def render_project(
+    project: dict,
+    out_path: Path,
+    sr: int = 44100,
+    block_frames: int = MIXDOWN_BLOCK_FRAMES,
+    output_root: Path = OUTPUT_ROOT,
+) -> dict:
+    """
+    Mix a project into a stereo WAV at out_path, block by block.
+    project["duration"] (seconds, 0 = end of the last clip) sets the length.
+    Returns render stats, including the source task ids.
+    """
+    if sr not in SAMPLE_RATES:
+        raise MixdownError(f"Unsupported sample rate {sr}. Available: {list(SAMPLE_RATES)}")
+
+    with timed_stage("mixdown_plan"):
+        placements, task_ids = plan_project(project, sr, output_root)
+    duration = float(project.get("duration") or 0.0)
+    total = int(round(duration * sr)) if duration > 0 else max((p.stop for p in placements), default=0)
+    if total <= 0:
+        raise MixdownError("Nothing to render: the project has no audible clips")
+    if total > MIXDOWN_MAX_SEC * sr:
+        raise MixdownError(f"Projects longer than {MIXDOWN_MAX_SEC:.0f}s cannot be rendered")
+
+    placements.sort(key=lambda p: p.offset)
+    rendered = {}  # clip key -> timeline audio, only for clips in blocks that miss the cache
+    stats = {"blocks": 0, "blocks_cached": 0, "clips_rendered": 0}
+
+    def clip_audio(p: Placement) -> np.ndarray:
+        if p.key not in rendered:
+            rendered[p.key] = render_clip(p, sr)
+            stats["clips_rendered"] += 1
+        return rendered[p.key]
+
+    def mix_block(b0: int, b1: int, active: list[Placement]) -> np.ndarray:
+        block = np.zeros((b1 - b0, 2), dtype=np.float32)
+        for p in active:
+            lo, hi = max(b0, p.offset), min(b1, p.stop)
+            block[lo - b0:hi - b0] += clip_audio(p)[lo - p.offset:hi - p.offset]
+        return np.clip(block, -1.0, 1.0, out=block)
+
+    # Loudness of the mix is measured on the blocks as they are written
+    meter = LoudnessMeter(sr, 2) if LOUDNESS_ANALYSIS else None
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with timed_stage("mixdown_render"), sf.SoundFile(
+        str(out_path), "w", sr, 2, subtype=OUTPUT_WAV_SUBTYPE, format="WAV"
+    ) as out:
+        for b0 in range(0, total, block_frames):
+            checkpoint()
+            b1 = min(total, b0 + block_frames)
+            active = [p for p in placements if p.offset < b1 and p.stop > b0]
+            stats["blocks"] += 1
+            if not active:
+                block = np.zeros((b1 - b0, 2), dtype=np.float32)
+                out.write(block)
+                if meter:
+                    meter.process(block)
+                continue
+
+            key = BLOCKS.make_key("mixdown_block", sr, b0, b1, tuple(p.key for p in active))
+            block = BLOCKS.get(key)
+            if block is None:
+                started = time.perf_counter()
+                block = mix_block(b0, b1, active)
+                BLOCKS.put(key, block, time.perf_counter() - started)
+            else:
+                stats["blocks_cached"] += 1
+            out.write(block)
+            if meter:
+                meter.process(block)
+
+    if meter:
+        stats["loudness"] = meter.result()
+        remember(out_path, stats["loudness"])
+
+    return {
+        **stats,
+        "duration_sec": round(total / sr, 3),
+        "sample_rate": sr,
+        "clips": len(placements),
+        "sources": sorted(task_ids),
+    }
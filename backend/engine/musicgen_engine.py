@@ -1,13 +1,203 @@
+import time
+import hashlib
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
 
 import torch
-import soundfile as sf
 import numpy as np
-from audiocraft.models import MusicGen
 
-from .audio_utils import ensure_wav_32k_mono
-from .sfx import generate_sfx as generate_sfx_diffusers
+from .audio_utils import load_mono_resampled, write_wav
+from .profiles import DEFAULT_PROFILE, apply_musicgen_profile
+from .registry import get_registry
+from .caches import get_cache
+from services.metrics import timed_stage
+from services.tracing import span, traced
+from services.profiler import profiled
+from services.tasks import checkpoint
+from config import CACHE_DIR, MUSICGEN_TEXT_CACHE_SIZE, PROMPT_CACHE_PERSIST, REFERENCE_CACHE_SIZE
+
+
+MUSIC_MODELS = get_registry("musicgen")
+MELODY_MODEL = "facebook/musicgen-melody"
+
+
+# ---------------------------------------------------------------
+# MODEL LOADING (cached, loaded on first use)
+# ---------------------------------------------------------------
+def _model_key(model_name: str, device: str, profile: str) -> str:
+    return f"{model_name}@{device}:{profile}"
+
+
+def load_music_model(model_name: str, device: str, profile: str = DEFAULT_PROFILE, pretrained=None):
+    """
+    Return a cached MusicGen model, loading it on first use.
+    audiocraft is imported here so that importing this module stays cheap.
+    Each inference profile (quality / fast) is a separately cached model.
+    pretrained(model_name, device) replaces MusicGen.get_pretrained
+    (benchmark stand-ins get the same hooks as the real model).
+    """
+    def loader():
+        print(f"🎧 Loading MusicGen model: {model_name} on {device} ({profile})")
+        if pretrained is None:
+            from audiocraft.models import MusicGen
+            model = MusicGen.get_pretrained(model_name, device=device)
+        else:
+            model = pretrained(model_name, device)
+        model = apply_musicgen_profile(model, profile)
+        install_chroma_cache(model, _model_key(model_name, device, profile))
+        model.compression_model.decode = traced(model.compression_model.decode, "decode")
+        # Called after every generated token: a cancelled or overdue job stops
+        # there. audiocraft only calls it for generate(..., progress=True).
+        model.set_custom_progress_callback(lambda generated, total: checkpoint())
+        return install_text_cache(model, _model_key(model_name, device, profile))
+
+    return MUSIC_MODELS.get(_model_key(model_name, device, profile), loader)
+
+
+@contextmanager
+def model_lock(model_name: str, device: str, profile: str = DEFAULT_PROFILE):
+    """
+    Generation params and streaming state live on the model: one job at a
+    time. Jobs waiting for the lock already count as using the model.
+    """
+    key = _model_key(model_name, device, profile)
+    with MUSIC_MODELS.in_use(key), MUSIC_MODELS.inference_lock(key):
+        yield
+
+
+# ---------------------------------------------------------------
+# TEXT CONDITIONING CACHE (T5)
+# ---------------------------------------------------------------
+# Every generate() runs the T5 conditioner on the prompt (and on the empty
+# CFG prompt). The encoder output for a text does not depend on the rest of
+# the batch (padding is masked), so the unpadded per-text embeddings are
+# cached and re-assembled into the padded (embeds, mask) batch.
+
+TEXT_CONDITIONING = get_cache(
+    "musicgen_text",
+    max_items=MUSICGEN_TEXT_CACHE_SIZE,
+    persist_dir=CACHE_DIR / "musicgen_text" if PROMPT_CACHE_PERSIST else None,
+)
+
+
+def install_text_cache(model, model_key: str):
+    """
+    Wrap the T5 conditioner of a loaded model: tokenize() only records the
+    texts, forward() serves cached texts and encodes the rest in one batch.
+    """
+    conditioner = model.lm.condition_provider.conditioners.get("description")
+    if conditioner is None or not hasattr(conditioner, "t5_tokenizer"):
+        return model
+
+    tokenize, forward = conditioner.tokenize, conditioner.forward
+
+    def cached_tokenize(x):
+        return {"_texts": list(x)}
+
+    def cached_forward(inputs):
+        texts = inputs.get("_texts") if isinstance(inputs, dict) else None
+        if texts is None:
+            return forward(inputs)
+
+        keys = [TEXT_CONDITIONING.make_key(model_key, t) if t else None for t in texts]
+        per_text, missing = {}, {}
+        for text, key in zip(texts, keys):
+            if key is None or key in per_text or key in missing:
+                continue
+            cached = TEXT_CONDITIONING.get(key)
+            if cached is None:
+                missing[key] = text
+            else:
+                per_text[key] = cached
+
+        if missing:
+            started = time.perf_counter()
+            with span("text_encode", texts=len(missing)):
+                embeds, mask = forward(tokenize(list(missing.values())))
+            cost = (time.perf_counter() - started) / len(missing)
+            for i, key in enumerate(missing):
+                value = embeds[i, : int(mask[i].sum())].detach().cpu().clone()
+                TEXT_CONDITIONING.put(key, value, cost)
+                per_text[key] = value
+
+        # Empty texts (the CFG null condition) stay fully masked, as in audiocraft
+        length = max([per_text[k].shape[0] for k in keys if k is not None] + [1])
+        dim = conditioner.output_proj.out_features
+        dtype = next(iter(per_text.values())).dtype if per_text else torch.float32
+        device = getattr(conditioner, "device", "cpu")
+        embeds = torch.zeros(len(texts), length, dim, dtype=dtype, device=device)
+        mask = torch.zeros(len(texts), length, dtype=torch.long, device=device)
+        for i, key in enumerate(keys):
+            if key is not None:
+                value = per_text[key]
+                embeds[i, : value.shape[0]] = value
+                mask[i, : value.shape[0]] = 1
+        return embeds, mask
+
+    conditioner.tokenize = cached_tokenize
+    conditioner.forward = cached_forward
+    return model
+
+
+def pre_encode_texts(model_name: str, device: str, texts: list[str], profile: str = DEFAULT_PROFILE) -> int:
+    """Fill the conditioning cache (e.g. style presets at warm-up)."""
+    model = load_music_model(model_name, device, profile)
+    conditioner = model.lm.condition_provider.conditioners.get("description")
+    if conditioner is None:
+        return 0
+    with torch.inference_mode():
+        for i in range(0, len(texts), 8):
+            conditioner(conditioner.tokenize(texts[i:i + 8]))
+    return len(texts)
+
+
+# ---------------------------------------------------------------
+# MELODY REFERENCE CACHE (decoded audio + chroma)
+# ---------------------------------------------------------------
+# Users iterate on prompts with the same reference track. The decoded
+# 32 kHz mono audio is cached by file content hash, and the chroma
+# conditioner's embedding (Demucs stem removal + chroma extraction) by a
+# hash of the waveform it receives.
+
+REFERENCE_SR = 32000
+REFERENCE_AUDIO = get_cache("musicgen_reference", max_items=REFERENCE_CACHE_SIZE)
+REFERENCE_CHROMA = get_cache("musicgen_chroma", max_items=REFERENCE_CACHE_SIZE)
+
+
+def file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_reference(path: Path) -> np.ndarray:
+    """Mono 32 kHz float32 reference, decoded once per distinct file content."""
+    key = REFERENCE_AUDIO.make_key("reference", REFERENCE_SR, file_hash(path))
+    return REFERENCE_AUDIO.get_or_compute(key, lambda: load_mono_resampled(path, REFERENCE_SR))
+
+
+def install_chroma_cache(model, model_key: str):
+    """Wrap the melody conditioner's _get_wav_embedding with a content-hash cache."""
+    conditioner = model.lm.condition_provider.conditioners.get("self_wav")
+    if conditioner is None or not hasattr(conditioner, "_get_wav_embedding"):
+        return model
+
+    get_wav_embedding = conditioner._get_wav_embedding
+
+    def cached_get_wav_embedding(x):
+        wav = x.wav.detach().cpu().contiguous()
+        digest = hashlib.sha256(wav.numpy().tobytes()).hexdigest()
+        key = REFERENCE_CHROMA.make_key(
+            model_key, digest, tuple(wav.shape), tuple(int(v) for v in x.length), tuple(int(v) for v in x.sample_rate)
+        )
+        cached = REFERENCE_CHROMA.get_or_compute(key, lambda: get_wav_embedding(x).detach().cpu().clone())
+        return cached.to(x.wav.device)
+
+    conditioner._get_wav_embedding = cached_get_wav_embedding
+    return model
 
 
 # ---------------------------------------------------------------
@@ -25,7 +215,7 @@ class GenParams:
 # MUSIC ENGINE (MusicGen only)
 # ---------------------------------------------------------------
 class MusicEngine:
-    def __init__(self, model_name: str, device: str, output_dir: Path):
+    def __init__(self, model_name: str, device: str, output_dir: Path, profile: str = DEFAULT_PROFILE):
         """
         Handles:
         - Text → Music (MusicGen)
@@ -33,19 +223,18 @@ class MusicEngine:
         - Delegates SFX to sfx.py (AudioLDM / AudioLDM2)
 
         SFX models are NOT loaded here.
+
+        profile: "quality" (float32) or "fast" (int8 / bf16), see profiles.py
         """
         self.model_name = model_name
         self.device = device
+        self.profile = profile
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
-        # Load MusicGen only if requested
+        # Load MusicGen only if requested (shared across requests)
         if "musicgen" in model_name:
-            print(f"🎧 Loading MusicGen model: {model_name} on {device}")
-            self.music_model = MusicGen.get_pretrained(
-                model_name,
-                device=self.device
-            )
+            self.music_model = load_music_model(model_name, self.device, profile)
         else:
             self.music_model = None
 
@@ -61,36 +250,84 @@ class MusicEngine:
         if self.music_model is None:
             raise RuntimeError("MusicGen model not loaded.")
 
-        if params.seed > 0:
-            torch.manual_seed(params.seed)
+        print(f"🎶 Generating music from text: {prompt}")
 
-        self.music_model.set_generation_params(
-            duration=duration,
-            temperature=params.temperature,
-            top_k=params.top_k,
-            top_p=params.top_p,
-        )
+        with model_lock(self.model_name, self.device, self.profile):
+            if params.seed > 0:
+                torch.manual_seed(params.seed)
 
-        print(f"🎶 Generating music from text: {prompt}")
+            self.music_model.set_generation_params(
+                duration=duration,
+                temperature=params.temperature,
+                top_k=params.top_k,
+                top_p=params.top_p,
+            )
 
-        with torch.inference_mode():
-            wavs = self.music_model.generate([prompt])
+            with torch.inference_mode(), timed_stage("inference"), profiled():
+                wavs = self.music_model.generate([prompt], progress=True)
 
         wav = wavs[0].cpu().numpy()
 
         if wav.ndim > 1:
             wav = np.mean(wav, axis=0)
 
-        wav = np.clip(wav, -1.0, 1.0)
-
         filename = f"musicgen_{datetime.now().strftime('%Y%m%d_%H%M%S')}.wav"
         out_path = self.output_dir / filename
 
-        sf.write(out_path, wav, self.music_model.sample_rate)
+        with timed_stage("wav_write"):
+            write_wav(out_path, wav, self.music_model.sample_rate, normalise=True)
 
         print(f"✅ Music saved: {out_path}")
         return out_path
 
+    # -----------------------------------------------------------
+    # TEXT → MUSIC, BATCHED (POST /api/generate/batch)
+    # -----------------------------------------------------------
+    def generate_text_batch(
+        self,
+        prompts: list[str],
+        duration: int,
+        params: GenParams,
+        out_dirs: list[Path],
+    ) -> list[Path]:
+        """
+        One generate() call for several prompts (or copies of one prompt
+        for variations). Sampling shares the RNG seeded with params.seed,
+        so an item is reproducible with the same batch, not on its own.
+        """
+        if self.music_model is None:
+            raise RuntimeError("MusicGen model not loaded.")
+
+        print(f"🎶 Generating {len(prompts)} music clips in one batch")
+
+        with model_lock(self.model_name, self.device, self.profile):
+            if params.seed > 0:
+                torch.manual_seed(params.seed)
+
+            self.music_model.set_generation_params(
+                duration=duration,
+                temperature=params.temperature,
+                top_k=params.top_k,
+                top_p=params.top_p,
+            )
+
+            with torch.inference_mode(), timed_stage("inference"), profiled():
+                wavs = self.music_model.generate(list(prompts), progress=True)
+
+        paths = []
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        with timed_stage("wav_write"):
+            for i, (wav, out_dir) in enumerate(zip(wavs, out_dirs)):
+                wav = wav.cpu().numpy()
+                if wav.ndim > 1:
+                    wav = np.mean(wav, axis=0)
+                out_path = Path(out_dir) / f"musicgen_{stamp}_{i}.wav"
+                write_wav(out_path, wav, self.music_model.sample_rate, normalise=True)
+                paths.append(out_path)
+
+        print(f"✅ Music batch saved ({len(paths)} clips)")
+        return paths
+
     # -----------------------------------------------------------
     # TEXT + REFERENCE → MUSIC (MusicGen Melody)
     # -----------------------------------------------------------
@@ -101,47 +338,42 @@ class MusicEngine:
         duration: int,
         params: GenParams
     ) -> Path:
-        print("🎼 Loading MusicGen Melody model: facebook/musicgen-melody")
-
-        if params.seed > 0:
-            torch.manual_seed(params.seed)
+        model = load_music_model(MELODY_MODEL, self.device, self.profile)
 
-        model = MusicGen.get_pretrained(
-            "facebook/musicgen-melody",
-            device=self.device
-        )
-
-        model.set_generation_params(
-            duration=duration,
-            temperature=params.temperature,
-            top_k=params.top_k,
-            top_p=params.top_p,
-        )
-
-        # Ensure reference audio is mono + 32kHz
-        ref_mono = self.output_dir / "reference_32k.wav"
-        ensure_wav_32k_mono(ref_audio_path, ref_mono)
+        # Mono 32 kHz reference (decoded in-process, cached by content hash)
+        ref_mono = torch.from_numpy(load_reference(Path(ref_audio_path)))[None, None]
 
         print(f"🎵 Generating melody-based music using reference audio")
 
-        with torch.inference_mode():
-            wavs = model.generate_with_chroma(
-                descriptions=[prompt],
-                melody_wavs=[str(ref_mono)],
-                melody_sample_rate=32000,
+        with model_lock(MELODY_MODEL, self.device, self.profile):
+            if params.seed > 0:
+                torch.manual_seed(params.seed)
+
+            model.set_generation_params(
+                duration=duration,
+                temperature=params.temperature,
+                top_k=params.top_k,
+                top_p=params.top_p,
             )
 
+            with torch.inference_mode(), timed_stage("inference"), profiled():
+                wavs = model.generate_with_chroma(
+                    descriptions=[prompt],
+                    melody_wavs=ref_mono,
+                    melody_sample_rate=REFERENCE_SR,
+                    progress=True,
+                )
+
         wav = wavs[0].cpu().numpy()
 
         if wav.ndim > 1:
             wav = np.mean(wav, axis=0)
 
-        wav = np.clip(wav, -1.0, 1.0)
-
         filename = f"melody_{datetime.now().strftime('%Y%m%d_%H%M%S')}.wav"
         out_path = self.output_dir / filename
 
-        sf.write(out_path, wav, model.sample_rate)
+        with timed_stage("wav_write"):
+            write_wav(out_path, wav, model.sample_rate, normalise=True)
 
         print(f"✅ Melody music saved: {out_path}")
         return out_path
@@ -153,7 +385,9 @@ class MusicEngine:
         self,
         prompt: str,
         duration: int,
-        model_name: str = "audioldm2p"
+        model_name: str = "audioldm2p",
+        seed: int | None = None,
+        quality: str = "standard",
     ) -> Path:
         """
         Delegates SFX generation to sfx.py (Diffusers AudioLDM).
@@ -164,20 +398,46 @@ class MusicEngine:
         - audioldm-s-full-v2
 
         Duration: 5 / 10 / 15 / 20 seconds
+        Quality:  draft / fast / balanced / standard (scheduler + steps)
         """
 
+        from .sfx import generate_sfx as generate_sfx_diffusers
+
         print("🔊 Delegating SFX generation to sfx.py")
         print(f"🧠 Model: {model_name}")
         print(f"⏱ Duration: {duration}s")
 
-        relative_path = generate_sfx_diffusers(
+        out_path = Path(generate_sfx_diffusers(
             prompt=prompt,
             model_name=model_name,
-            duration=duration
-        )
-
-        # Convert returned relative path to absolute Path
-        out_path = Path(__file__).parent / "outputs" / relative_path
+            duration=duration,
+            seed=seed,
+            profile=self.profile,
+            quality=quality,
+            out_dir=self.output_dir,  # straight into the task folder
+        ))
 
         print(f"✅ SFX generated: {out_path}")
         return out_path
+
+    def generate_sfx_batch(
+        self,
+        prompts: list[str],
+        seeds: list[int],
+        out_dirs: list[Path],
+        duration: int,
+        model_name: str = "audioldm2p",
+        quality: str = "standard",
+    ) -> list[Path]:
+        """Batched SFX (POST /api/generate/batch), delegated to sfx.py."""
+        from .sfx import generate_sfx_batch
+
+        return generate_sfx_batch(
+            prompts=prompts,
+            seeds=seeds,
+            out_dirs=out_dirs,
+            model_name=model_name,
+            duration=duration,
+            profile=self.profile,
+            quality=quality,
+        )
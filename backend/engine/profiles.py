@@ -0,0 +1,142 @@
+from functools import lru_cache
+
+
+# ---------------------------------------------------------------
+# INFERENCE PROFILES
+# ---------------------------------------------------------------
+# quality: float32 everywhere (previous behaviour)
+# fast:    dynamic int8 quantisation of Linear layers (transformers /
+#          text encoders) + bfloat16 autocast for conv-heavy parts when
+#          the CPU has native bf16 support
+# torch is imported inside the helpers so validate_profile() stays cheap
+# for request handlers.
+INFERENCE_PROFILES = ("quality", "fast")
+DEFAULT_PROFILE = "quality"
+
+
+def validate_profile(profile: str) -> str:
+    profile = (profile or DEFAULT_PROFILE).lower().strip()
+    if profile not in INFERENCE_PROFILES:
+        raise ValueError(f"Unknown inference profile '{profile}'. Available: {list(INFERENCE_PROFILES)}")
+    return profile
+
+
+# ---------------------------------------------------------------
+# SFX QUALITY TIERS (scheduler + denoising steps)
+# ---------------------------------------------------------------
+# scheduler None / steps None = the pipeline's own scheduler and the
+# original CPU-safe step counts (40 for audioldm-s-full-v2, 30 otherwise).
+SFX_QUALITY_TIERS = {
+    "draft":    {"scheduler": "dpmsolver++", "steps": 8},
+    "fast":     {"scheduler": "unipc", "steps": 12},
+    "balanced": {"scheduler": "dpmsolver++", "steps": 20},
+    "standard": {"scheduler": None, "steps": None},
+}
+DEFAULT_SFX_QUALITY = "standard"
+
+
+def validate_sfx_quality(tier: str) -> str:
+    tier = (tier or DEFAULT_SFX_QUALITY).lower().strip()
+    if tier not in SFX_QUALITY_TIERS:
+        raise ValueError(f"Unknown SFX quality '{tier}'. Available: {list(SFX_QUALITY_TIERS)}")
+    return tier
+
+
+@lru_cache(maxsize=1)
+def bf16_supported() -> bool:
+    """True if this CPU runs bf16 natively (AVX512-BF16 / AMX), not emulated."""
+    import torch
+
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def quantize_linear(module):
+    """Dynamic int8 quantisation of every nn.Linear in module (in place)."""
+    import torch
+    from torch import nn
+
+    module.eval()
+    return torch.ao.quantization.quantize_dynamic(
+        module, {nn.Linear}, dtype=torch.qint8, inplace=True
+    )
+
+
+def _to_float32(out):
+    import torch
+
+    if torch.is_tensor(out):
+        return out.float() if out.is_floating_point() else out
+    if isinstance(out, (tuple, list)):
+        return type(out)(_to_float32(o) for o in out)
+    if hasattr(out, "keys"):  # diffusers BaseOutput / transformers ModelOutput
+        for key in list(out.keys()):
+            out[key] = _to_float32(out[key])
+        return out
+    return out
+
+
+def run_in_bf16(module, method: str = "forward"):
+    """
+    Wrap module.<method> in CPU bf16 autocast; outputs are cast back to
+    float32 so neighbouring (possibly int8-quantised) modules see float32.
+    """
+    import torch
+
+    original = getattr(module, method)
+
+    def wrapped(*args, **kwargs):
+        with torch.autocast("cpu", dtype=torch.bfloat16):
+            out = original(*args, **kwargs)
+        return _to_float32(out)
+
+    setattr(module, method, wrapped)
+    return module
+
+
+# ---------------------------------------------------------------
+# MODEL-SPECIFIC APPLICATION
+# ---------------------------------------------------------------
+def apply_musicgen_profile(model, profile: str):
+    """
+    fast: int8 LM transformer, output heads and T5 text encoder; bf16
+    EnCodec decoder when supported. The conditioners' output_proj stays
+    float32: audiocraft casts to output_proj.weight, which quantised
+    Linear layers expose as a method.
+    """
+    if profile != "fast":
+        return model
+    quantize_linear(model.lm.transformer)
+    quantize_linear(model.lm.linears)
+    for conditioner in model.lm.condition_provider.conditioners.values():
+        if getattr(conditioner, "t5", None) is not None:
+            quantize_linear(conditioner.t5)
+    if bf16_supported():
+        run_in_bf16(model.compression_model, "decode")
+    return model
+
+
+def apply_pipeline_profile(pipe, profile: str):
+    """
+    fast: int8 text encoders (CLAP / T5 / GPT-2 language model).
+    The UNet gets bf16 autocast where the CPU supports it, otherwise its
+    Linear layers (attention / projections) are quantised to int8.
+    """
+    from torch import nn
+
+    if profile != "fast":
+        return pipe
+
+    for name in ("text_encoder", "text_encoder_2", "language_model", "projection_model"):
+        component = getattr(pipe, name, None)
+        if isinstance(component, nn.Module):
+            quantize_linear(component)
+
+    if bf16_supported():
+        run_in_bf16(pipe.unet)
+        run_in_bf16(pipe.vae, "decode")
+    else:
+        quantize_linear(pipe.unet)
+    return pipe
@@ -0,0 +1,144 @@
+import time
+from contextlib import contextmanager
+from threading import Lock
+from typing import Any, Callable, Dict
+
+
+# ---------------------------------------------------------------
+# MODEL REGISTRY
+# ---------------------------------------------------------------
+class ModelRegistry:
+    """
+    Thread-safe, load-once cache for heavy model objects.
+
+    - get(key, loader): returns the cached model, loading it on first use
+    - concurrent callers for the same key wait for a single load
+    - tracks load time and last use so idle models can be unloaded
+    - in_use(key) marks a model busy for a whole job, so it is never unloaded mid-inference
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._models: Dict[str, Any] = {}
+        self._key_locks: Dict[str, Lock] = {}
+        self._loading: set[str] = set()
+        self._load_seconds: Dict[str, float] = {}
+        self._last_used: Dict[str, float] = {}
+        self._inference_locks: Dict[str, Lock] = {}
+        self._in_use: Dict[str, int] = {}
+        self._lock = Lock()
+
+    def get(self, key: str, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._models:
+                self._last_used[key] = time.time()
+                return self._models[key]
+            key_lock = self._key_locks.setdefault(key, Lock())
+
+        with key_lock:
+            with self._lock:
+                if key in self._models:
+                    self._last_used[key] = time.time()
+                    return self._models[key]
+                self._loading.add(key)
+
+            started = time.perf_counter()
+            try:
+                model = loader()
+            finally:
+                with self._lock:
+                    self._loading.discard(key)
+
+            with self._lock:
+                self._models[key] = model
+                self._load_seconds[key] = time.perf_counter() - started
+                self._last_used[key] = time.time()
+            return model
+
+    def inference_lock(self, key: str) -> Lock:
+        """
+        Per-model lock for models whose inference mutates shared state
+        (generation params, streaming caches, schedulers). Different
+        models still run concurrently on separate inference workers.
+        """
+        with self._lock:
+            return self._inference_locks.setdefault(key, Lock())
+
+    @contextmanager
+    def in_use(self, key: str):
+        """
+        Hold around every inference with a model (including jobs that never
+        take its inference_lock, and waits between chunks): idle_keys()
+        skips models in use, and unload(key, if_idle=True) leaves them loaded.
+        """
+        with self._lock:
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_use[key] -= 1
+                if not self._in_use[key]:
+                    del self._in_use[key]
+                self._last_used[key] = time.time()
+
+    def is_loaded(self, key: str) -> bool:
+        with self._lock:
+            return key in self._models
+
+    def unload(self, key: str, if_idle: bool = False) -> bool:
+        """Drop a cached model. Returns True if something was removed."""
+        with self._lock:
+            if if_idle and key in self._in_use:
+                return False
+            self._last_used.pop(key, None)
+            self._load_seconds.pop(key, None)
+            return self._models.pop(key, None) is not None
+
+    def idle_keys(self, min_idle_sec: float = 0.0) -> list[str]:
+        """
+        Loaded models unused for min_idle_sec and not mid-inference,
+        least recently used first (eviction candidates).
+        """
+        now = time.time()
+        with self._lock:
+            idle = [
+                key for key in self._models
+                if now - self._last_used.get(key, 0.0) >= min_idle_sec
+                and key not in self._in_use
+                and not (key in self._inference_locks and self._inference_locks[key].locked())
+            ]
+            return sorted(idle, key=lambda k: self._last_used.get(k, 0.0))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "loaded": sorted(self._models),
+                "loading": sorted(self._loading),
+                "in_use": dict(self._in_use),
+                "load_seconds": {k: round(v, 3) for k, v in self._load_seconds.items()},
+                "last_used": dict(self._last_used),
+            }
+
+
+# ---------------------------------------------------------------
+# GLOBAL REGISTRIES (one per engine family)
+# ---------------------------------------------------------------
+_REGISTRIES: Dict[str, ModelRegistry] = {}
+_REGISTRIES_LOCK = Lock()
+
+
+def get_registry(name: str) -> ModelRegistry:
+    """
+    Named registries live here (not in the engine modules) so that
+    health/readiness code can inspect them without importing torch.
+    """
+    with _REGISTRIES_LOCK:
+        if name not in _REGISTRIES:
+            _REGISTRIES[name] = ModelRegistry(name)
+        return _REGISTRIES[name]
+
+
+def all_registries() -> Dict[str, ModelRegistry]:
+    with _REGISTRIES_LOCK:
+        return dict(_REGISTRIES)
@@ -2,9 +2,24 @@ import uuid
 from pathlib import Path
 
 import torch
-import soundfile as sf
 
 from diffusers import AudioLDM2Pipeline, AudioLDMPipeline
+
+from .profiles import (
+    DEFAULT_PROFILE,
+    DEFAULT_SFX_QUALITY,
+    SFX_QUALITY_TIERS,
+    apply_pipeline_profile,
+    validate_sfx_quality,
+)
+from .audio_utils import write_wav
+from .registry import get_registry
+from .caches import get_cache
+from services.metrics import timed_stage
+from services.tracing import span, traced
+from services.profiler import profiled
+from services.tasks import checkpoint
+from config import CACHE_DIR, PROMPT_CACHE_SIZE, PROMPT_CACHE_PERSIST
 try:
     from transformers.models.gpt2.modeling_gpt2 import GPT2Model
 except ImportError:
@@ -47,32 +62,156 @@ OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
 
 # -------------------------------------------------
-# LOAD MODELS ONCE (SERVER STARTUP)
+# MODELS (loaded on first use, then cached)
 # -------------------------------------------------
 
-print("🔄 Loading SFX models (AudioLDM / AudioLDM2)...")
-
-MODELS = {
+MODEL_SOURCES = {
     # AudioLDM2 (best quality)
-    "audioldm2p": AudioLDM2Pipeline.from_pretrained(
-        "cvssp/audioldm2",
-        torch_dtype=DTYPE
-    ).to(DEVICE),
+    "audioldm2p": (AudioLDM2Pipeline, "cvssp/audioldm2"),
 
     # AudioLDM v1
-    "audioldmp": AudioLDMPipeline.from_pretrained(
-        "cvssp/audioldm",
-        torch_dtype=DTYPE
-    ).to(DEVICE),
+    "audioldmp": (AudioLDMPipeline, "cvssp/audioldm"),
 
     # Lightweight AudioLDM
-    "audioldm-s-full-v2": AudioLDMPipeline.from_pretrained(
-        "cvssp/audioldm-s-full-v2",
-        torch_dtype=DTYPE
-    ).to(DEVICE),
+    "audioldm-s-full-v2": (AudioLDMPipeline, "cvssp/audioldm-s-full-v2"),
 }
 
-print("✅ SFX models loaded successfully")
+PIPELINES = get_registry("sfx")
+
+
+def _pipeline_key(model_key: str, profile: str) -> str:
+    return f"{model_key}:{profile}"
+
+
+def load_pipeline(model_key: str, profile: str = DEFAULT_PROFILE):
+    """
+    Return the cached pipeline for model_key, loading it on first use.
+    Each inference profile (quality / fast) is a separately cached pipeline.
+    """
+    pipeline_cls, repo_id = MODEL_SOURCES[model_key]
+
+    def loader():
+        print(f"🔄 Loading SFX model: {model_key} ({repo_id}, {profile})")
+        pipe = pipeline_cls.from_pretrained(repo_id, torch_dtype=DTYPE).to(DEVICE)
+        pipe = apply_pipeline_profile(pipe, profile)
+        install_decode_span(pipe)
+        print(f"✅ SFX model loaded: {model_key}")
+        return pipe
+
+    return PIPELINES.get(_pipeline_key(model_key, profile), loader)
+
+
+def install_decode_span(pipe):
+    """Trace latent → mel → waveform decoding inside pipe() (shared by job pipelines)."""
+    if getattr(pipe, "vae", None) is not None:
+        pipe.vae.decode = traced(pipe.vae.decode, "decode")
+    if getattr(pipe, "vocoder", None) is not None:
+        pipe.vocoder.forward = traced(pipe.vocoder.forward, "vocode")
+    return pipe
+
+
+# -------------------------------------------------
+# QUALITY TIERS (scheduler + steps)
+# -------------------------------------------------
+
+def resolve_model_key(model_name: str) -> str:
+    model_key = model_name.lower().strip()
+
+    # Alias handling
+    if model_key == "audioldm-s-full":
+        model_key = "audioldm-s-full-v2"
+
+    if model_key not in MODEL_SOURCES:
+        raise ValueError(
+            f"Unsupported SFX model '{model_name}'. "
+            f"Available models: {list(MODEL_SOURCES.keys())}"
+        )
+    return model_key
+
+
+def resolve_quality(model_key: str, tier: str = DEFAULT_SFX_QUALITY) -> dict:
+    """Scheduler name + step count used for a model at a quality tier."""
+    tier = validate_sfx_quality(tier)
+    preset = SFX_QUALITY_TIERS[tier]
+
+    # CPU-safe inference steps (original defaults)
+    default_steps = 40 if model_key == "audioldm-s-full-v2" else 30
+
+    return {
+        "tier": tier,
+        "scheduler": preset["scheduler"] or "default",
+        "steps": preset["steps"] or default_steps,
+    }
+
+
+def make_scheduler(pipe, name: str):
+    """A FRESH scheduler per job (schedulers keep per-run timestep state)."""
+    from diffusers import DPMSolverMultistepScheduler, UniPCMultistepScheduler
+
+    config = pipe.scheduler.config
+    if name == "dpmsolver++":
+        return DPMSolverMultistepScheduler.from_config(config, algorithm_type="dpmsolver++", solver_order=2)
+    if name == "unipc":
+        return UniPCMultistepScheduler.from_config(config)
+    return type(pipe.scheduler).from_config(config)
+
+
+def pipeline_for_job(pipe, scheduler_name: str):
+    """
+    Lightweight pipeline view sharing the cached weights but with its own
+    scheduler, so concurrent jobs on one model do not share scheduler state.
+    """
+    components = dict(pipe.components)
+    components["scheduler"] = make_scheduler(pipe, scheduler_name)
+    return type(pipe)(**components)
+
+
+# -------------------------------------------------
+# PROMPT EMBEDDING CACHE
+# -------------------------------------------------
+# AudioLDM2 runs CLAP + T5 + the GPT-2 language model on every prompt before
+# denoising; AudioLDM runs CLAP. Both are deterministic, so the encoder
+# outputs are cached per (model, profile, prompt, negative prompt) and fed
+# back through the pipelines' *_embeds inputs.
+
+PROMPT_EMBEDS = get_cache(
+    "sfx_prompt_embeds",
+    max_items=PROMPT_CACHE_SIZE,
+    persist_dir=CACHE_DIR / "sfx_prompt_embeds" if PROMPT_CACHE_PERSIST else None,
+)
+
+
+def _encode(pipe, prompt: str, negative_prompt: str | None) -> dict:
+    """Run the text encoders once; returns the pipeline call kwargs."""
+    if isinstance(pipe, AudioLDM2Pipeline):
+        embeds, mask, generated = pipe.encode_prompt(
+            prompt,
+            DEVICE,
+            num_waveforms_per_prompt=1,
+            do_classifier_free_guidance=True,
+            negative_prompt=negative_prompt,
+        )
+        # With classifier-free guidance each output is [negative, positive]
+        neg_embeds, pos_embeds = embeds.chunk(2)
+        neg_mask, pos_mask = mask.chunk(2)
+        neg_generated, pos_generated = generated.chunk(2)
+        return {
+            "prompt_embeds": pos_embeds,
+            "negative_prompt_embeds": neg_embeds,
+            "generated_prompt_embeds": pos_generated,
+            "negative_generated_prompt_embeds": neg_generated,
+            "attention_mask": pos_mask,
+            "negative_attention_mask": neg_mask,
+        }
+
+    embeds = pipe._encode_prompt(prompt, DEVICE, 1, True, negative_prompt=negative_prompt)
+    neg_embeds, pos_embeds = embeds.chunk(2)
+    return {"prompt_embeds": pos_embeds, "negative_prompt_embeds": neg_embeds}
+
+
+def prompt_embeddings(pipe, model_key: str, profile: str, prompt: str, negative_prompt: str | None = None) -> dict:
+    key = PROMPT_EMBEDS.make_key(model_key, profile, prompt, negative_prompt or "")
+    return PROMPT_EMBEDS.get_or_compute(key, lambda: _encode(pipe, prompt, negative_prompt))
 
 
 # -------------------------------------------------
@@ -82,7 +221,12 @@ print("✅ SFX models loaded successfully")
 def generate_sfx(
     prompt: str,
     model_name: str = "audioldm2p",
-    duration: int = 10
+    duration: int = 10,
+    seed: int | None = None,
+    profile: str = DEFAULT_PROFILE,
+    quality: str = DEFAULT_SFX_QUALITY,
+    negative_prompt: str | None = None,
+    out_dir: Path | None = None,
 ) -> str:
     """
     Generate sound effects using AudioLDM / AudioLDM2.
@@ -91,22 +235,17 @@ def generate_sfx(
         prompt (str): Text prompt (e.g. "rain and thunder")
         model_name (str): audioldm2p | audioldmp | audioldm-s-full-v2
         duration (int): 5, 10, 15, or 20 seconds
+        seed (int): optional, makes the output reproducible
+        profile (str): quality | fast (see profiles.py)
+        quality (str): draft | fast | balanced | standard (scheduler + steps)
+        negative_prompt (str): optional, what the audio should not contain
+        out_dir (Path): write the WAV here (e.g. the task folder) instead of OUTPUT_DIR
 
     Returns:
-        str: Relative path (e.g. "sfx/abc123.wav")
+        str: Relative path (e.g. "sfx/abc123.wav"), absolute when out_dir is set
     """
 
-    model_key = model_name.lower().strip()
-
-    # Alias handling
-    if model_key == "audioldm-s-full":
-        model_key = "audioldm-s-full-v2"
-
-    if model_key not in MODELS:
-        raise ValueError(
-            f"Unsupported SFX model '{model_name}'. "
-            f"Available models: {list(MODELS.keys())}"
-        )
+    model_key = resolve_model_key(model_name)
 
     # Validate duration
     try:
@@ -117,31 +256,115 @@ def generate_sfx(
     if duration not in (5, 10, 15, 20):
         raise ValueError("SFX duration must be 5, 10, 15, or 20 seconds")
 
-    pipe = MODELS[model_key]
-
-    # CPU-safe inference steps
-    steps = 40 if model_key == "audioldm-s-full-v2" else 30
+    settings = resolve_quality(model_key, quality)
+    generator = torch.Generator(DEVICE).manual_seed(seed) if seed else None
 
     print("🔊 Generating SFX")
     print("🧠 Model:", model_key)
     print("📝 Prompt:", prompt)
     print("⏱ Duration:", duration, "seconds")
 
-    with torch.inference_mode():
-        audio = pipe(
-            prompt=prompt,
-            num_inference_steps=steps,
-            audio_length_in_s=float(duration)
-        ).audios[0]
+    # Job pipelines never take the model's inference lock: mark it in use
+    # so the memory watchdog does not unload it mid-render
+    with PIPELINES.in_use(_pipeline_key(model_key, profile)):
+        with timed_stage("model_load"):
+            pipe = pipeline_for_job(load_pipeline(model_key, profile), settings["scheduler"])
+        print(f"🎚 Quality: {settings['tier']} ({type(pipe.scheduler).__name__}, {settings['steps']} steps)")
+
+        with torch.inference_mode(), timed_stage("inference"), profiled():
+            with span("text_encode"):
+                embeds = prompt_embeddings(pipe, model_key, profile, prompt, negative_prompt)
+            audio = pipe(
+                **embeds,
+                num_inference_steps=settings["steps"],
+                audio_length_in_s=float(duration),
+                generator=generator,
+                # Stop a cancelled or overdue job at the next denoising step
+                callback=lambda step, timestep, latents: checkpoint(),
+                callback_steps=1,
+            ).audios[0]
 
     # Save output
     filename = f"{uuid.uuid4().hex}.wav"
-    out_path = OUTPUT_DIR / filename
+    out_path = Path(out_dir) / filename if out_dir else OUTPUT_DIR / filename
 
-    sf.write(out_path, audio, 16000)
+    with timed_stage("wav_write"):
+        write_wav(out_path, audio, 16000, normalise=True)
 
     final_duration = len(audio) / 16000
     print(f"✅ SFX generated ({final_duration:.2f}s): {out_path}")
 
     # IMPORTANT: return relative path for API
-    return f"sfx/{filename}"
+    return str(out_path) if out_dir else f"sfx/{filename}"
+
+
+# -------------------------------------------------
+# BATCHED GENERATION (POST /api/generate/batch)
+# -------------------------------------------------
+
+def _stack_embeds(items: list[dict]) -> dict:
+    """
+    Concatenate per-prompt pipeline kwargs into one batch. Sequence
+    embeddings of different lengths (AudioLDM2 T5 / CLAP) are zero-padded
+    and their attention masks padded with 0, as the pipeline's own batched
+    tokenization would do.
+    """
+    stacked = {}
+    for key in items[0]:
+        tensors = [item[key] for item in items]
+        if tensors[0].dim() > 1 and len({t.shape[1] for t in tensors}) > 1:
+            length = max(t.shape[1] for t in tensors)
+            tensors = [
+                torch.nn.functional.pad(t, (0, 0) * (t.dim() - 2) + (0, length - t.shape[1]))
+                for t in tensors
+            ]
+        stacked[key] = torch.cat(tensors)
+    return stacked
+
+
+def generate_sfx_batch(
+    prompts: list[str],
+    seeds: list[int],
+    out_dirs: list[Path],
+    model_name: str = "audioldm2p",
+    duration: int = 10,
+    profile: str = DEFAULT_PROFILE,
+    quality: str = DEFAULT_SFX_QUALITY,
+) -> list[Path]:
+    """
+    Render several prompts (or seeds of one prompt) in one batched
+    denoising loop. Each item gets its own generator, so item i matches a
+    single generate_sfx(prompts[i], seed=seeds[i]) render.
+    """
+    model_key = resolve_model_key(model_name)
+    duration = int(duration)
+    if duration not in (5, 10, 15, 20):
+        raise ValueError("SFX duration must be 5, 10, 15, or 20 seconds")
+
+    settings = resolve_quality(model_key, quality)
+    print(f"🔊 Generating {len(prompts)} SFX in one batch ({model_key}, {settings['tier']})")
+
+    generators = [torch.Generator(DEVICE).manual_seed(seed) for seed in seeds]
+    with PIPELINES.in_use(_pipeline_key(model_key, profile)):
+        with timed_stage("model_load"):
+            pipe = pipeline_for_job(load_pipeline(model_key, profile), settings["scheduler"])
+        with torch.inference_mode(), timed_stage("inference"), profiled():
+            with span("text_encode", texts=len(prompts)):
+                embeds = _stack_embeds([prompt_embeddings(pipe, model_key, profile, p) for p in prompts])
+            audios = pipe(
+                **embeds,
+                num_inference_steps=settings["steps"],
+                audio_length_in_s=float(duration),
+                generator=generators,
+                callback=lambda step, timestep, latents: checkpoint(),
+                callback_steps=1,
+            ).audios
+
+    paths = []
+    with timed_stage("wav_write"):
+        for audio, out_dir in zip(audios, out_dirs):
+            out_path = Path(out_dir) / f"{uuid.uuid4().hex}.wav"
+            write_wav(out_path, audio, 16000, normalise=True)
+            paths.append(out_path)
+    print(f"✅ SFX batch generated ({len(paths)} clips)")
+    return paths
@@ -1,5 +1,10 @@
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 import os
+import re
 import json
+import asyncio
 import uuid
 import random
 import traceback
@@ -13,7 +18,7 @@ from fastapi import (
     BackgroundTasks, Request, UploadFile, File
 )
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
@@ -22,17 +27,58 @@ from config import (
     API_KEY as CONFIG_API_KEY,
     ALLOWED_ORIGINS,
     OUTPUT_ROOT,
-    HISTORY_FILE,
     DEFAULT_DEVICE,
     DEFAULT_MODEL,
+    WARMUP_SUBSYSTEMS,
+    IMPORT_BUDGET_SEC,
+    WORKERS_STATUS_FILE,
+    PREVIEW_MUSIC_SEC,
+    PREVIEW_SFX_QUALITY,
+    SFX_LIBRARY_ENABLED,
+    MEMORY_WATCHDOG_ENABLED,
+    MEMORY_CHECK_INTERVAL_SEC,
+    RETENTION_ENABLED,
+    BATCH_MAX_ITEMS,
+    BATCH_MAX_FORWARD,
+    VIDEO_FRAME_BATCH,
+    VIDEO_MAX_HEIGHT,
+    VIDEO_MAX_SEC,
+    VIDEO_MAX_WIDTH,
+    LOUDNESS_ANALYSIS,
 )
 
-from models.responses import GenerateResponse, ResultResponse
-from services import elevenlabs, isolation
-from services.tasks import TASKS
+from models.requests import BatchGenerateRequest, MixdownRequest
+from models.responses import BatchResponse, GenerateResponse, ResultResponse
+from services import elevenlabs
+from services.tasks import TASKS, TaskCancelled, cancellable
+from services.readiness import READINESS
+from services.executor import get_executor
+from engine.registry import all_registries
+from services.metrics import METRICS, RATE_LIMITED_TOTAL, set_job_labels, timed_stage
+from services.tracing import span, start_trace, use_trace
+from services.profiler import capture_into, profile_files, should_profile
+from services.memory_watchdog import MEMORY_WATCHDOG
+from services.retention import RETENTION
+from services.history import HISTORY
+from services.blobstore import BLOBS
+from services.deadlines import (
+    COSTS, DeadlineExceeded, audio_seconds, deadline_at, to_thread_until_deadline, use_deadline,
+)
+from services.storage_tiers import COLD_TIER
 from services.sfx_styles import SOUND_PROMPTS
-from engine.musicgen_engine import MusicEngine, GenParams
-from engine.audio_utils import wav_to_mp3, mp3_to_wav
+from services.styles import STYLES
+from services.sfx_library import SFX_LIBRARY
+from engine.audio_utils import wav_to_mp3, mp3_to_wav, write_wav
+from engine.profiles import (
+    DEFAULT_PROFILE,
+    DEFAULT_SFX_QUALITY,
+    SFX_QUALITY_TIERS,
+    validate_profile,
+    validate_sfx_quality,
+)
+
+# NOTE: torch / audiocraft / diffusers / DeepFilterNet are imported lazily
+# (inside jobs or warm-up) so the server can bind in well under a second.
 
 
 # -----------------------------------------------------------
@@ -70,7 +116,14 @@ print("Note: Access the app via port 5173. The backend is proxied automatically.
 limiter = Limiter(key_func=get_remote_address)
 app = FastAPI(title="🎵 AI Music Studio API", version="2.3.0")
 app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+
+def rate_limit_exceeded(request: Request, exc: RateLimitExceeded):
+    RATE_LIMITED_TOTAL.inc(path=request.url.path)
+    return _rate_limit_exceeded_handler(request, exc)
+
+
+app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded)
 
 app.add_middleware(
     CORSMiddleware,
@@ -91,40 +144,107 @@ async def startup_event():
         loop.default_exception_handler(context)
     loop.set_exception_handler(custom_handler)
 
+    # Start inference workers (core sets / torch threads per worker)
+    get_executor()
+
+    if MEMORY_WATCHDOG_ENABLED:
+        MEMORY_WATCHDOG.start()
+
+    # Old / over-quota outputs are deleted in the background (one worker)
+    if RETENTION_ENABLED:
+        RETENTION.start()
+
+    # Load heavy models in the background; requests load on demand meanwhile
+    if WARMUP_SUBSYSTEMS:
+        print(f"🔥 Warming up in background: {', '.join(WARMUP_SUBSYSTEMS)}")
+        READINESS.warm_up_async(WARMUP_SUBSYSTEMS)
+
 
 # -----------------------------------------------------------
-# HISTORY
+# SUBSYSTEMS (lazy / background warm-up)
 # -----------------------------------------------------------
 
+def _warm_musicgen():
+    from engine.musicgen_engine import load_music_model, pre_encode_texts
+    load_music_model(DEFAULT_MODEL, DEFAULT_DEVICE)
+    # Style presets skip T5 text conditioning from the first request on
+    count = pre_encode_texts(DEFAULT_MODEL, DEFAULT_DEVICE, list(STYLES.values()))
+    print(f"🎼 Pre-encoded {count} style presets")
+
+def _warm_sfx():
+    from engine.sfx import load_pipeline
+    load_pipeline("audioldm2p")
+
+def _warm_isolation():
+    from services.isolation import load_df_model
+    load_df_model()
+
+def _warm_chat():
+    chat_service._ensure_model()
+
+READINESS.register("musicgen", _warm_musicgen, registry="musicgen")
+READINESS.register("sfx", _warm_sfx, registry="sfx")
+READINESS.register("isolation", _warm_isolation, registry="isolation")
+READINESS.register("chat", _warm_chat)
+
+
+# -----------------------------------------------------------
+# JOB HELPERS (admission, tracing, cancel / deadline cleanup, loudness)
+# -----------------------------------------------------------
+
+def check_admission(mode: str):
+    """Shed new heavy (local model) jobs while the memory watchdog reports pressure."""
+    if MEMORY_WATCHDOG.paused:
+        MEMORY_WATCHDOG.record_shed(mode)
+        raise HTTPException(
+            503,
+            "Server is low on memory, please retry shortly",
+            headers={"Retry-After": str(max(5, int(MEMORY_CHECK_INTERVAL_SEC * 2)))},
+        )
+
+
+def trace_tree(trace) -> dict | None:
+    """Span tree of a task (None when TRACING_ENABLED=0)."""
+    return trace.tree() if trace else None
+
+
+def discard_partial_outputs(task_dir: Path, keep=()):
+    """Remove what a cancelled job left in its folder (published files in keep stay)."""
+    keep = {"task.json", "cancel", *keep}
+    for path in list(task_dir.iterdir()):
+        if path.is_file() and path.name not in keep and not path.name.startswith("."):
+            BLOBS.discard(task_dir, path.name)
+
+
+def fail_overdue(task_id: str, task_dir: Path, trace, cost_key: str, deadline_sec: float, error, keep=()):
+    """A job that ran out of time ends as an error; partial files are removed."""
+    discard_partial_outputs(task_dir, keep=keep)
+    COSTS.record_exceeded(cost_key)
+    TASKS.update_meta(task_id, trace=trace_tree(trace), timed_out=True)
+    TASKS.set_status(task_id, "error", error=f"Deadline of {deadline_sec:.0f}s exceeded: {error}")
+    print(f"⏰ Task {task_id} exceeded its {deadline_sec:.0f}s deadline ({error})")
+
+
+def output_loudness(wav_path: Path) -> dict | None:
+    """Loudness of an output WAV for task meta (kept from writing it, so usually no second pass)."""
+    if not LOUDNESS_ANALYSIS:
+        return None
+    from engine.loudness import loudness_for
+    return loudness_for(wav_path)
+
 
 # -----------------------------------------------------------
 # HISTORY
 # -----------------------------------------------------------
 
 def append_history(entry: dict):
-    history = []
-    if HISTORY_FILE.exists():
-        try:
-            history = json.loads(HISTORY_FILE.read_text(encoding="utf-8"))
-        except:
-            pass
-
-    history.insert(0, entry)
-    HISTORY_FILE.write_text(
-        json.dumps(history[:200], indent=2),
-        encoding="utf-8",
-    )
+    HISTORY.append(entry)
 
 
 
 @app.get("/api/history")
 def get_history():
-    if not HISTORY_FILE.exists():
-        return []
-    try:
-        return json.loads(HISTORY_FILE.read_text(encoding="utf-8"))
-    except:
-        return []
+    return HISTORY.read()
 
 
 @app.delete("/api/history")
@@ -132,8 +252,7 @@ def clear_history(x_api_key: str = Header(None)):
     if x_api_key != API_KEY:
         raise HTTPException(status_code=401, detail="Invalid API Key")
     
-    if HISTORY_FILE.exists():
-        HISTORY_FILE.unlink()
+    HISTORY.clear()
     return {"status": "ok", "message": "History cleared"}
 
 
@@ -143,6 +262,24 @@ def get_sfx_prompts():
     return SOUND_PROMPTS
 
 
+@app.get("/api/styles")
+def get_styles():
+    """MusicGen style presets (pass the key as `style` to /api/generate)."""
+    return STYLES
+
+
+@app.get("/api/sfx-library")
+def get_sfx_library_stats():
+    """Pre-rendered catalogue entries available for instant SFX."""
+    return {"enabled": SFX_LIBRARY_ENABLED, **SFX_LIBRARY.stats()}
+
+
+@app.get("/api/sfx-quality")
+def get_sfx_quality_tiers():
+    """Quality tiers accepted by /api/generate (sfx_quality)."""
+    return {"default": DEFAULT_SFX_QUALITY, "tiers": SFX_QUALITY_TIERS}
+
+
 # -----------------------------------------------------------
 # GENERATE API
 # -----------------------------------------------------------
@@ -152,7 +289,10 @@ def get_sfx_prompts():
 async def generate_music(
     request: Request,  # Required for rate limiting
     background: BackgroundTasks,
-    prompt: str = Form(...),
+    prompt: str = Form(""),
+
+    # Music only: STYLES preset, pre-encoded at warm-up (see /api/styles)
+    style: str = Form(""),
 
     ref_audio: UploadFile | str | None = File(default=None),
     use_paid: bool = Form(False),
@@ -172,7 +312,23 @@ async def generate_music(
     # - sfx   → AudioLDM model
     model_name: str = Form(DEFAULT_MODEL),
 
+    # Inference profile: quality (float32) | fast (int8 / bf16)
+    profile: str = Form(DEFAULT_PROFILE),
+
+    # SFX only: draft | fast | balanced | standard (scheduler + steps)
+    sfx_quality: str = Form(DEFAULT_SFX_QUALITY),
+
+    # Publish a quick draft first, then render full quality (cancellable)
+    preview: bool = Form(False),
+
+    # Admin only (x-admin-key): torch.profiler capture of the full render
+    torch_profile: bool = Form(False),
+
+    # Client hint: give up after this many seconds (can only shorten the deadline)
+    timeout_sec: float = Form(0),
+
     x_api_key: str = Header(None),
+    x_admin_key: str = Header(None),
 ):
     if x_api_key != API_KEY:
         raise HTTPException(status_code=401, detail="Invalid or missing API Key")
@@ -180,15 +336,59 @@ async def generate_music(
     if isinstance(ref_audio, str):
         ref_audio = None
 
-    task_id = uuid.uuid4().hex[:12]
-    task_dir = OUTPUT_ROOT / task_id
-    task_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        profile = validate_profile(profile)
+        sfx_quality = validate_sfx_quality(sfx_quality)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    prompt = prompt.strip()
+    style_conditioning = None
+    if style:
+        if style not in STYLES:
+            raise HTTPException(400, f"Unknown style '{style}'. Available: {list(STYLES)}")
+        # Only the bare preset text is pre-encoded at warm-up; preset + extra
+        # prompt is a new text and goes through T5 on its first use
+        style_conditioning = "live" if prompt else "preset"
+        prompt = f"{STYLES[style]}, {prompt}" if prompt else STYLES[style]
+    if not prompt:
+        raise HTTPException(400, "prompt or style is required")
 
     effective_seed = (
         seed if (seed_lock and seed > 0)
         else random.randint(1, 2**31 - 1)
     )
 
+    # Catalogue prompts may already be pre-rendered (render_sfx_library.py)
+    library_hit = None
+    if mode == "sfx" and not use_paid and SFX_LIBRARY_ENABLED:
+        library_hit = SFX_LIBRARY.lookup(
+            prompt, model_name, duration_sec, seed=effective_seed if seed_lock and seed > 0 else None,
+            quality=sfx_quality, profile=profile,
+        )
+        if library_hit:
+            effective_seed = library_hit["seed"]
+
+    if not (mode == "sfx" and use_paid) and library_hit is None:
+        check_admission(mode)
+
+    task_id = uuid.uuid4().hex[:12]
+    task_dir = OUTPUT_ROOT / task_id
+    task_dir.mkdir(parents=True, exist_ok=True)
+    trace = start_trace(task_id)
+
+    cost_key = f"{mode}_paid" if use_paid and mode == "sfx" else mode
+    deadline_sec = COSTS.deadline_for(cost_key, duration_sec, timeout_sec)
+    deadline = deadline_at(deadline_sec)
+    accepted_at = time.monotonic()
+
+    # ElevenLabs renders in one shot, library hits are instant: nothing to preview
+    want_preview = preview and not (mode == "sfx" and use_paid) and library_hit is None
+    want_profile = (
+        not (mode == "sfx" and use_paid) and library_hit is None
+        and should_profile(torch_profile, x_admin_key)
+    )
+
     TASKS.create(task_id, {
         "status": "queued",
         "files": None,
@@ -196,84 +396,128 @@ async def generate_music(
             "prompt": prompt,
             "mode": mode,
             "model": model_name,
+            "style": style or None,
+            "style_conditioning": style_conditioning,
             "duration": duration_sec,
             "seed": effective_seed,
+            "profile": profile,
+            "preview": want_preview,
+            "profiled": want_profile,
+            "deadline_sec": round(deadline_sec, 1),
+            "source": "library" if library_hit else "live",
             "created_at": datetime.utcnow().isoformat(),
         },
         "error": None,
     })
 
-    async def job():
-        try:
-            print(f"🎶 Task {task_id} started (mode={mode}, model={model_name})")
-
-            params = GenParams(
-                temperature=temperature,
-                top_k=top_k,
-                top_p=top_p,
-                seed=effective_seed,
-            )
-
+    # Save the reference now: the upload is closed once the response is sent
+    ref_path = None
+    if isinstance(ref_audio, UploadFile):
+        ref_path = task_dir / ref_audio.filename
+        with span("upload_write"):
+            ref_path.write_bytes(await ref_audio.read())
+
+    def run_generation(preview_pass: bool = False) -> Path:
+        """
+        Blocking part of the job (runs on an inference worker).
+        preview_pass renders the quick draft: a short MusicGen prefix
+        (same seed, so it matches the start of the full render) or a
+        few diffusion steps for SFX.
+        """
+        TASKS.raise_if_cancelled(task_id)
+        TASKS.set_status(task_id, "running")
+        print(f"🎶 Task {task_id} {'preview' if preview_pass else 'started'} (mode={mode}, model={model_name})")
+        from engine.musicgen_engine import MusicEngine, GenParams
+
+        music_duration = min(PREVIEW_MUSIC_SEC, duration_sec) if preview_pass else duration_sec
+
+        params = GenParams(
+            temperature=temperature,
+            top_k=top_k,
+            top_p=top_p,
+            seed=effective_seed,
+        )
+
+        with timed_stage("model_load"):
             engine = MusicEngine(
                 model_name=model_name,
                 device=DEFAULT_DEVICE,
                 output_dir=task_dir,
+                profile=profile,
             )
 
-            # ---------------- MUSIC ----------------
-            if mode == "music":
-                if isinstance(ref_audio, UploadFile):
-                    ref_path = task_dir / ref_audio.filename
-                    ref_path.write_bytes(await ref_audio.read())
-
-                    wav_path = engine.generate_with_reference(
-                        prompt=prompt,
-                        ref_audio_path=ref_path,
-                        duration=duration_sec,
-                        params=params,
-                    )
-                else:
-                    wav_path = engine.generate_text(
-                        prompt=prompt,
-                        duration=duration_sec,
-                        params=params,
-                    )
-
-            # ---------------- SFX ----------------
-            elif mode == "sfx":
-                # model_name here = audioldm2p | audioldmp | audioldm-s-full-v2
-                if use_paid:
-                    print(f"Using ElevenLabs for SFX: {prompt}")
-                    sfx_content = elevenlabs.generate_sfx(prompt, duration_sec)
-                    mp3_path = task_dir / "audio.mp3"
-                    mp3_path.write_bytes(sfx_content)
-                    wav_path = task_dir / "audio.wav"
-                    mp3_to_wav(mp3_path, wav_path)
-                else:
-                    original_wav_path = engine.generate_sfx(
-                        prompt=prompt,
-                        duration=duration_sec,
-                        model_name=model_name,
-                    )
-                    # Move SFX WAV to task dir so it can be downloaded
-                    wav_path = task_dir / original_wav_path.name
-                    if original_wav_path != wav_path:
-                        shutil.copy(original_wav_path, wav_path)
-
+        provider_mp3 = False
+
+        # ---------------- MUSIC ----------------
+        if mode == "music":
+            if ref_path is not None:
+                wav_path = engine.generate_with_reference(
+                    prompt=prompt,
+                    ref_audio_path=ref_path,
+                    duration=music_duration,
+                    params=params,
+                )
             else:
-                raise HTTPException(400, f"Unknown mode: {mode}")
-
-            mp3_path = task_dir / "audio.mp3"
+                wav_path = engine.generate_text(
+                    prompt=prompt,
+                    duration=music_duration,
+                    params=params,
+                )
+
+        # ---------------- SFX ----------------
+        elif mode == "sfx":
+            # model_name here = audioldm2p | audioldmp | audioldm-s-full-v2
+            if use_paid:
+                print(f"Using ElevenLabs for SFX: {prompt}")
+                sfx_content = elevenlabs.generate_sfx(prompt, duration_sec)
+                mp3_path = task_dir / "audio.mp3"
+                mp3_path.write_bytes(sfx_content)
+                wav_path = task_dir / "audio.wav"
+                mp3_to_wav(mp3_path, wav_path)
+                provider_mp3 = True
+            else:
+                from engine.sfx import resolve_model_key, resolve_quality
+                tier = PREVIEW_SFX_QUALITY if preview_pass else sfx_quality
+                if not preview_pass:
+                    TASKS.update_meta(
+                        task_id,
+                        sfx_quality=resolve_quality(resolve_model_key(model_name), tier),
+                    )
+                # Written straight into the task folder
+                wav_path = engine.generate_sfx(
+                    prompt=prompt,
+                    duration=duration_sec,
+                    model_name=model_name,
+                    seed=effective_seed,
+                    quality=tier,
+                )
+
+        else:
+            raise HTTPException(400, f"Unknown mode: {mode}")
+
+        TASKS.raise_if_cancelled(task_id)
+        if preview_pass:
+            preview_wav = task_dir / "preview.wav"
+            os.replace(wav_path, preview_wav)
+            wav_to_mp3(preview_wav, task_dir / "preview.mp3")
+            BLOBS.adopt_all(task_dir, ["preview.wav", "preview.mp3"])
+            return preview_wav
+
+        mp3_path = task_dir / "audio.mp3"
+        if not provider_mp3:  # ElevenLabs already returned the MP3
             wav_to_mp3(wav_path, mp3_path)
+        BLOBS.adopt_all(task_dir, [wav_path.name, mp3_path.name] + ([ref_path.name] if ref_path else []))
+        TASKS.update_meta(task_id, loudness=output_loudness(wav_path))
+        return wav_path
+
+    def finish(wav_path: Path):
+        files = {
+            "wav": f"/api/download/{task_id}/{wav_path.name}",
+            "mp3": f"/api/download/{task_id}/audio.mp3",
+            **profile_files(task_id, task_dir),
+        }
 
-            files = {
-                "wav": f"/api/download/{task_id}/{wav_path.name}",
-                "mp3": f"/api/download/{task_id}/audio.mp3",
-            }
-
-            TASKS.set_status(task_id, "done", files=files)
-
-
+        with span("history_append"):
             append_history({
                 "id": task_id,
                 "task_id": task_id,
@@ -281,21 +525,421 @@ async def generate_music(
                 "mode": mode,
                 "model": model_name,
                 "seed": effective_seed,
+                "profile": profile,
                 "duration": duration_sec,
                 "created_at": datetime.utcnow().isoformat(),
                 "files": files,
+                "loudness": (TASKS.get(task_id) or {}).get("meta", {}).get("loudness"),
+                "trace": trace_tree(trace),
             })
 
-            print(f"✅ Task {task_id} completed")
+        if not library_hit:
+            COSTS.observe(cost_key, duration_sec, time.monotonic() - accepted_at)
+        TASKS.update_meta(task_id, trace=trace_tree(trace))
+        TASKS.set_status(task_id, "done", files=files)
+        print(f"✅ Task {task_id} completed")
+
+    def serve_from_library() -> Path:
+        """
+        Link the stored WAV / MP3 of a pre-rendered FLAC into the task dir;
+        decoded and encoded only the first time a variant is served.
+        """
+        import soundfile as sf
+
+        TASKS.set_status(task_id, "running")
+        TASKS.update_meta(task_id, library_entry=library_hit["entry_id"], sfx_quality=library_hit["quality"])
+        source = Path(library_hit["path"])
+        alias = f"sfx_library:{source}:{source.stat().st_mtime_ns}"
+        wav_path = task_dir / "audio.wav"
+
+        stored = BLOBS.lookup_alias(alias)
+        if not (stored and all(BLOBS.link_into(rel, task_dir / name) for name, rel in stored.items())):
+            audio, sr = sf.read(str(source))
+            write_wav(wav_path, audio, sr)
+            wav_to_mp3(wav_path, task_dir / "audio.mp3")
+            BLOBS.save_alias(alias, BLOBS.adopt_all(task_dir, ["audio.wav", "audio.mp3"]))
+        SFX_LIBRARY.record_served()
+        TASKS.update_meta(task_id, loudness=output_loudness(wav_path))
+        print(f"📚 Task {task_id} served from SFX library ({library_hit['entry_id']})")
+        return wav_path
+
+    async def job():
+        set_job_labels(mode, "elevenlabs" if use_paid else model_name)
+        use_trace(trace)
+        cancellable(task_id)
+        use_deadline(deadline)
+        try:
+            if library_hit:
+                with span("library_serve"):
+                    wav_path = await to_thread_until_deadline(serve_from_library)
+                finish(wav_path)
+                return
+
+            if want_preview:
+                with span("preview"):
+                    await get_executor().run_task(task_id, run_generation, True)
+                TASKS.set_status(task_id, "running", preview={
+                    "wav": f"/api/download/{task_id}/preview.wav",
+                    "mp3": f"/api/download/{task_id}/preview.mp3",
+                })
+                print(f"👀 Task {task_id} preview published")
+
+            # The full render is queued behind other users' previews and
+            # skipped entirely if the user cancels after hearing the draft.
+            if want_profile:
+                capture_into(task_dir)
+            with span("render"):
+                if use_paid and mode == "sfx":
+                    # Network-bound: keep inference workers free
+                    wav_path = await to_thread_until_deadline(run_generation)
+                else:
+                    wav_path = await get_executor().run_task(task_id, run_generation)
+
+            finish(wav_path)
+
+        except TaskCancelled:
+            # A published preview stays downloadable; everything else goes
+            published = ("preview.wav", "preview.mp3") if (TASKS.get(task_id) or {}).get("preview") else ()
+            discard_partial_outputs(task_dir, keep=published)
+            TASKS.update_meta(task_id, trace=trace_tree(trace))
+            TASKS.set_status(task_id, "cancelled")
+            print(f"🛑 Task {task_id} cancelled")
+
+        except DeadlineExceeded as e:
+            published = ("preview.wav", "preview.mp3") if (TASKS.get(task_id) or {}).get("preview") else ()
+            fail_overdue(task_id, task_dir, trace, cost_key, deadline_sec, e, keep=published)
 
         except Exception:
             print("❌ JOB FAILED\n", traceback.format_exc())
+            TASKS.update_meta(task_id, trace=trace_tree(trace))
             TASKS.set_status(task_id, "error", error=traceback.format_exc())
 
     background.add_task(job)
     return GenerateResponse(task_id=task_id, status="queued")
 
 
+# -----------------------------------------------------------
+# BATCH GENERATE (variations / prompt lists)
+# -----------------------------------------------------------
+
+@app.post("/api/generate/batch", response_model=BatchResponse)
+@limiter.limit("10/minute")
+async def generate_batch(
+    request: Request,  # Required for rate limiting
+    background: BackgroundTasks,
+    body: BatchGenerateRequest,
+    x_api_key: str = Header(None),
+):
+    """
+    Several clips in one request: one prompt in `variations` seeds, or a
+    list of prompts. Each clip is a normal task (polled, downloaded and
+    cancelled on its own); the group is polled at /api/batch/{group_id}.
+    Up to BATCH_MAX_FORWARD clips share one forward pass.
+    """
+    if x_api_key != API_KEY:
+        raise HTTPException(status_code=401, detail="Invalid or missing API Key")
+
+    mode = body.mode
+    if mode not in ("music", "sfx"):
+        raise HTTPException(400, f"Unknown mode: {mode}")
+    try:
+        profile = validate_profile(body.profile or DEFAULT_PROFILE)
+        sfx_quality = validate_sfx_quality(body.sfx_quality or DEFAULT_SFX_QUALITY)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    model_name = body.model_name or (DEFAULT_MODEL if mode == "music" else "audioldm2p")
+    if mode == "sfx":
+        from engine.sfx import resolve_model_key
+        try:
+            resolve_model_key(model_name)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        if body.duration_sec not in (5, 10, 15, 20):
+            raise HTTPException(400, "SFX duration must be 5, 10, 15, or 20 seconds")
+
+    if body.prompts:
+        prompts = [p.strip() for p in body.prompts]
+    else:
+        prompts = [(body.prompt or "").strip()] * max(1, body.variations)
+    if body.style:
+        if body.style not in STYLES:
+            raise HTTPException(400, f"Unknown style '{body.style}'. Available: {list(STYLES)}")
+        prompts = [f"{STYLES[body.style]}, {p}" if p else STYLES[body.style] for p in prompts]
+    if not all(prompts):
+        raise HTTPException(400, "prompt, prompts or style is required")
+    if len(prompts) > BATCH_MAX_ITEMS:
+        raise HTTPException(400, f"At most {BATCH_MAX_ITEMS} clips per batch")
+
+    check_admission(mode)
+
+    n = len(prompts)
+    duration_sec = body.duration_sec
+    base_seed = (
+        body.seed if (body.seed_lock and body.seed > 0)
+        else random.randint(1, 2**31 - 1 - n)
+    )
+    # SFX: one generator per clip. MusicGen: clips of a pass share its RNG,
+    # so a music clip is reproducible from (pass seed, batch_index) only.
+    chunks = [list(range(i, min(i + BATCH_MAX_FORWARD, n))) for i in range(0, n, BATCH_MAX_FORWARD)]
+    seeds = [base_seed + i for i in range(n)] if mode == "sfx" else [
+        base_seed + c for c, chunk in enumerate(chunks) for _ in chunk
+    ]
+
+    group_id = uuid.uuid4().hex[:12]
+    group_dir = OUTPUT_ROOT / group_id
+    group_dir.mkdir(parents=True, exist_ok=True)
+    trace = start_trace(group_id)
+
+    deadline_sec = COSTS.deadline_for(mode, duration_sec * n, body.timeout_sec)
+    deadline = deadline_at(deadline_sec)
+    created_at = datetime.utcnow().isoformat()
+
+    task_ids, task_dirs = [], []
+    for i, prompt in enumerate(prompts):
+        task_id = uuid.uuid4().hex[:12]
+        task_dir = OUTPUT_ROOT / task_id
+        task_dir.mkdir(parents=True, exist_ok=True)
+        TASKS.create(task_id, {
+            "status": "queued",
+            "files": None,
+            "meta": {
+                "prompt": prompt,
+                "mode": mode,
+                "model": model_name,
+                "style": body.style or None,
+                "duration": duration_sec,
+                "seed": seeds[i],
+                "profile": profile,
+                "batch": group_id,
+                "batch_index": i,
+                "deadline_sec": round(deadline_sec, 1),
+                "source": "batch",
+                "created_at": created_at,
+            },
+            "error": None,
+        })
+        task_ids.append(task_id)
+        task_dirs.append(task_dir)
+
+    TASKS.create(group_id, {
+        "status": "queued",
+        "files": None,
+        "meta": {
+            "mode": "batch",
+            "batch_mode": mode,
+            "model": model_name,
+            "profile": profile,
+            "duration": duration_sec,
+            "tasks": task_ids,
+            "forward_passes": len(chunks),
+            "deadline_sec": round(deadline_sec, 1),
+            "created_at": created_at,
+        },
+        "error": None,
+    })
+
+    def run_chunk(chunk: list[int]) -> list[tuple[int, Path]]:
+        """One forward pass over the clips of chunk (runs on an inference worker)."""
+        TASKS.raise_if_cancelled(group_id)
+        # Clips cancelled on their own before the pass starts are left out
+        chunk = [i for i in chunk if not TASKS.is_cancelled(task_ids[i])]
+        if not chunk:
+            return []
+        for i in chunk:
+            TASKS.set_status(task_ids[i], "running")
+        print(f"🎶 Batch {group_id}: {len(chunk)} clips in one pass (mode={mode}, model={model_name})")
+
+        from engine.musicgen_engine import MusicEngine, GenParams
+        with timed_stage("model_load"):
+            engine = MusicEngine(
+                model_name=model_name,
+                device=DEFAULT_DEVICE,
+                output_dir=group_dir,
+                profile=profile,
+            )
+        if mode == "music":
+            params = GenParams(
+                temperature=body.temperature,
+                top_k=body.top_k,
+                top_p=body.top_p,
+                seed=seeds[chunk[0]],
+            )
+            wav_paths = engine.generate_text_batch(
+                prompts=[prompts[i] for i in chunk],
+                duration=duration_sec,
+                params=params,
+                out_dirs=[task_dirs[i] for i in chunk],
+            )
+        else:
+            wav_paths = engine.generate_sfx_batch(
+                prompts=[prompts[i] for i in chunk],
+                seeds=[seeds[i] for i in chunk],
+                out_dirs=[task_dirs[i] for i in chunk],
+                duration=duration_sec,
+                model_name=model_name,
+                quality=sfx_quality,
+            )
+
+        for i, wav_path in zip(chunk, wav_paths):
+            wav_to_mp3(wav_path, task_dirs[i] / "audio.mp3")
+            BLOBS.adopt_all(task_dirs[i], [wav_path.name, "audio.mp3"])
+            TASKS.update_meta(task_ids[i], loudness=output_loudness(wav_path))
+        return list(zip(chunk, wav_paths))
+
+    def finish_item(i: int, wav_path: Path):
+        task_id, task_dir = task_ids[i], task_dirs[i]
+        if TASKS.is_cancelled(task_id):
+            discard_partial_outputs(task_dir)
+            TASKS.set_status(task_id, "cancelled")
+            return
+        files = {
+            "wav": f"/api/download/{task_id}/{wav_path.name}",
+            "mp3": f"/api/download/{task_id}/audio.mp3",
+        }
+        append_history({
+            "id": task_id,
+            "task_id": task_id,
+            "prompt": prompts[i],
+            "mode": mode,
+            "model": model_name,
+            "seed": seeds[i],
+            "profile": profile,
+            "duration": duration_sec,
+            "batch": group_id,
+            "created_at": datetime.utcnow().isoformat(),
+            "files": files,
+            "loudness": (TASKS.get(task_id) or {}).get("meta", {}).get("loudness"),
+        })
+        TASKS.set_status(task_id, "done", files=files)
+
+    def end_unfinished(status: str, error: str | None = None):
+        for task_id, task_dir in zip(task_ids, task_dirs):
+            if (TASKS.get(task_id) or {}).get("status") in ("queued", "running"):
+                discard_partial_outputs(task_dir)
+                TASKS.set_status(task_id, status, error=error)
+
+    async def job():
+        set_job_labels(mode, model_name)
+        use_trace(trace)
+        cancellable(group_id)
+        use_deadline(deadline)
+        TASKS.set_status(group_id, "running")
+        started = time.perf_counter()
+        try:
+            for chunk in chunks:
+                with span("batch_pass", clips=len(chunk)):
+                    finished = await get_executor().run_task(group_id, run_chunk, chunk)
+                for i, wav_path in finished:
+                    finish_item(i, wav_path)
+            end_unfinished("cancelled")  # clips cancelled on their own, skipped by every pass
+
+            TASKS.update_meta(
+                group_id,
+                trace=trace_tree(trace),
+                throughput=batch_throughput(mode, task_ids, duration_sec, time.perf_counter() - started),
+            )
+            TASKS.set_status(group_id, "done")
+            print(f"✅ Batch {group_id} completed ({n} clips, {len(chunks)} passes)")
+
+        except TaskCancelled:
+            end_unfinished("cancelled")
+            TASKS.update_meta(group_id, trace=trace_tree(trace))
+            TASKS.set_status(group_id, "cancelled")
+            print(f"🛑 Batch {group_id} cancelled")
+
+        except DeadlineExceeded as e:
+            end_unfinished("error", error=f"Deadline of {deadline_sec:.0f}s exceeded: {e}")
+            fail_overdue(group_id, group_dir, trace, mode, deadline_sec, e)
+
+        except Exception:
+            print("❌ BATCH FAILED\n", traceback.format_exc())
+            end_unfinished("error", error=traceback.format_exc())
+            TASKS.update_meta(group_id, trace=trace_tree(trace))
+            TASKS.set_status(group_id, "error", error=traceback.format_exc())
+
+    background.add_task(job)
+    return BatchResponse(
+        group_id=group_id,
+        status="queued",
+        counts={"queued": n},
+        tasks=[
+            {"task_id": task_id, "status": "queued", "prompt": prompt, "seed": seed}
+            for task_id, prompt, seed in zip(task_ids, prompts, seeds)
+        ],
+    )
+
+
+def batch_throughput(mode: str, task_ids: list[str], duration_sec: int, wall_sec: float) -> dict:
+    """Batch wall time vs. the learned cost of rendering the same clips as single requests."""
+    done = sum(1 for task_id in task_ids if (TASKS.get(task_id) or {}).get("status") == "done")
+    audio_sec = done * duration_sec
+    single_sec = done * COSTS.estimate(mode, duration_sec)
+    return {
+        "clips": done,
+        "audio_seconds": audio_sec,
+        "wall_seconds": round(wall_sec, 2),
+        "clips_per_minute": round(done * 60 / wall_sec, 2) if wall_sec > 0 else None,
+        "realtime_factor": round(audio_sec / wall_sec, 2) if wall_sec > 0 else None,
+        "single_requests_estimate_sec": round(single_sec, 1),
+        "speedup_vs_single": round(single_sec / wall_sec, 2) if done and wall_sec > 0 else None,
+    }
+
+
+@app.get("/api/batch/{group_id}", response_model=BatchResponse)
+def get_batch(group_id: str):
+    group = TASKS.get(group_id)
+    if not group or (group.get("meta") or {}).get("mode") != "batch":
+        raise HTTPException(404, "Batch not found")
+
+    tasks, counts = [], {}
+    for task_id in group["meta"]["tasks"]:
+        task = TASKS.get(task_id) or {"status": "deleted"}
+        meta = task.get("meta") or {}
+        counts[task["status"]] = counts.get(task["status"], 0) + 1
+        tasks.append({
+            "task_id": task_id,
+            "status": task["status"],
+            "prompt": meta.get("prompt"),
+            "seed": meta.get("seed"),
+            "files": task.get("files"),
+            "error": task.get("error"),
+        })
+
+    return BatchResponse(
+        group_id=group_id,
+        status=group["status"],
+        counts=counts,
+        tasks=tasks,
+        throughput=group["meta"].get("throughput"),
+    )
+
+
+# -----------------------------------------------------------
+# CANCEL
+# -----------------------------------------------------------
+
+@app.delete("/api/task/{task_id}")
+def cancel_task(task_id: str, x_api_key: str = Header(None)):
+    """
+    Cancel a task (tab closed, regenerated, moved on after the preview).
+    Queued work is dropped at once; running inference stops at its next
+    step boundary (diffusion step, MusicGen token, DeepFilterNet chunk)
+    and partial files are removed. The task ends as "cancelled".
+    """
+    if x_api_key != API_KEY:
+        raise HTTPException(status_code=401, detail="Invalid API Key")
+
+    task = TASKS.get(task_id)
+    if not task:
+        raise HTTPException(404, "Task not found")
+
+    if task["status"] in ("done", "error", "cancelled"):
+        return {"task_id": task_id, "status": task["status"], "cancelled": False}
+
+    dropped = TASKS.request_cancel(task_id)
+    return {"task_id": task_id, "status": "cancelled" if dropped else "cancelling", "cancelled": True}
+
+
 # -----------------------------------------------------------
 # RESULT
 # -----------------------------------------------------------
@@ -310,6 +954,7 @@ def get_result(task_id: str):
         task_id=task_id,
         status=task["status"],
         files=task.get("files"),
+        preview=task.get("preview"),
         meta=task.get("meta"),
         error=task.get("error"),
     )
@@ -327,65 +972,111 @@ async def isolate_audio(
     background: BackgroundTasks,
     audio_file: UploadFile = File(...),
     use_paid: bool = Form(False),
+    torch_profile: bool = Form(False),
+    timeout_sec: float = Form(0),
     x_api_key: str = Header(None),
+    x_admin_key: str = Header(None),
 ):
     if x_api_key != API_KEY:
         raise HTTPException(status_code=401, detail="Invalid API Key")
+    if not use_paid:
+        check_admission("isolation")
 
     task_id = uuid.uuid4().hex[:12]
     task_dir = OUTPUT_ROOT / task_id
     task_dir.mkdir(parents=True, exist_ok=True)
     
+    trace = start_trace(task_id)
+    want_profile = not use_paid and should_profile(torch_profile, x_admin_key)
+
     # Save input file
     input_path = task_dir / audio_file.filename
-    with open(input_path, "wb") as f:
+    with span("upload_write"), open(input_path, "wb") as f:
         f.write(await audio_file.read())
-        
+
+    cost_key = "isolation_paid" if use_paid else "isolation"
+    audio_sec = audio_seconds(input_path)
+    deadline_sec = COSTS.deadline_for(cost_key, audio_sec, timeout_sec)
+    deadline = deadline_at(deadline_sec)
+    accepted_at = time.monotonic()
+
     TASKS.create(task_id, {
         "status": "queued",
         "files": None,
         "meta": {
             "mode": "isolation",
             "use_paid": use_paid,
+            "profiled": want_profile,
+            "deadline_sec": round(deadline_sec, 1),
             "original_file": audio_file.filename,
             "created_at": datetime.utcnow().isoformat(),
         }
     })
     
+    def run_isolation():
+        """Blocking part of the job (inference worker, or a thread when paid)."""
+        TASKS.raise_if_cancelled(task_id)
+        TASKS.set_status(task_id, "running")
+        print(f"🎤 Isolation Task {task_id} started (Paid={use_paid})")
+
+        if use_paid:
+            # ElevenLabs
+            isolated_content = elevenlabs.isolate_voice(str(input_path))
+            output_path = task_dir / "audio.mp3" # ElevenLabs usually mp3
+            output_path.write_bytes(isolated_content)
+            final_mp3 = output_path
+            final_wav = task_dir / "audio.wav"
+            mp3_to_wav(mp3_path=final_mp3, wav_path=final_wav)
+
+        else:
+            # Local DeepFilterNet, written straight to audio.wav
+            from services import isolation
+            final_wav = Path(isolation.isolate_voice_local(str(input_path), str(task_dir), "audio.wav"))
+
+            TASKS.raise_if_cancelled(task_id)
+            final_mp3 = task_dir / "audio.mp3"
+            wav_to_mp3(final_wav, final_mp3)
+
+        BLOBS.adopt_all(task_dir, [input_path.name, final_wav.name, final_mp3.name])
+        TASKS.update_meta(task_id, loudness=output_loudness(final_wav))
+
     async def job():
+        set_job_labels("isolation", "elevenlabs" if use_paid else "deepfilternet")
+        use_trace(trace)
+        cancellable(task_id)
+        use_deadline(deadline)
         try:
-            print(f"🎤 Isolation Task {task_id} started (Paid={use_paid})")
-            
             if use_paid:
-                # ElevenLabs
-                isolated_content = elevenlabs.isolate_voice(str(input_path))
-                output_path = task_dir / "audio.mp3" # ElevenLabs usually mp3
-                output_path.write_bytes(isolated_content)
-                final_mp3 = output_path
-                final_wav = task_dir / "audio.wav"
-                mp3_to_wav(mp3_path=final_mp3, wav_path=final_wav)
-
+                await to_thread_until_deadline(run_isolation)
             else:
-                # Local Demucs
-                vocals_path = isolation.isolate_voice_local(str(input_path), str(task_dir))
-                # output is wav
-                final_wav = task_dir / "audio.wav"
-                shutil.copy(vocals_path, final_wav)
-                
-                final_mp3 = task_dir / "audio.mp3"
-                wav_to_mp3(final_wav, final_mp3)
+                if want_profile:
+                    capture_into(task_dir)
+                await get_executor().run_task(task_id, run_isolation)
 
             files = {
                 "wav": f"/api/download/{task_id}/audio.wav",
                 "mp3": f"/api/download/{task_id}/audio.mp3",
-                "original": f"/api/download/{task_id}/{audio_file.filename}"
+                "original": f"/api/download/{task_id}/{audio_file.filename}",
+                **profile_files(task_id, task_dir),
             }
             
+            COSTS.observe(cost_key, audio_sec, time.monotonic() - accepted_at)
+            TASKS.update_meta(task_id, trace=trace_tree(trace))
             TASKS.set_status(task_id, "done", files=files)
             print(f"✅ Isolation Task {task_id} completed")
-            
+
+        except TaskCancelled:
+            discard_partial_outputs(task_dir)
+            TASKS.update_meta(task_id, trace=trace_tree(trace))
+            TASKS.set_status(task_id, "cancelled")
+            print(f"🛑 Isolation Task {task_id} cancelled")
+
+        except DeadlineExceeded as e:
+            fail_overdue(task_id, task_dir, trace, cost_key, deadline_sec, e)
+
         except Exception:
              print("❌ JOB FAILED\n", traceback.format_exc())
+             TASKS.update_meta(task_id, trace=trace_tree(trace))
              TASKS.set_status(task_id, "error", error=traceback.format_exc())
 
     background.add_task(job)
@@ -401,6 +1092,7 @@ async def transpose_audio(
     background: BackgroundTasks,
     audio_file: UploadFile = File(...),
     semitones: float = Form(...),
+    timeout_sec: float = Form(0),
     x_api_key: str = Header(None),
 ):
     if x_api_key != API_KEY:
@@ -410,55 +1102,329 @@ async def transpose_audio(
     task_dir = OUTPUT_ROOT / task_id
     task_dir.mkdir(parents=True, exist_ok=True)
     
+    trace = start_trace(task_id)
+
     input_path = task_dir / f"input_{audio_file.filename}"
-    with open(input_path, "wb") as f:
+    with span("upload_write"), open(input_path, "wb") as f:
         f.write(await audio_file.read())
 
+    audio_sec = audio_seconds(input_path)
+    deadline_sec = COSTS.deadline_for("transpose", audio_sec, timeout_sec)
+    deadline = deadline_at(deadline_sec)
+    accepted_at = time.monotonic()
+
     TASKS.create(task_id, {
         "status": "queued",
         "meta": {
             "mode": "transpose",
             "semitones": semitones,
+            "deadline_sec": round(deadline_sec, 1),
             "original_file": audio_file.filename,
             "created_at": datetime.utcnow().isoformat(),
         }
     })
 
+    def run_transpose():
+        TASKS.raise_if_cancelled(task_id)
+        TASKS.set_status(task_id, "running")
+        print(f"🎹 Transpose Task {task_id} started ({semitones} semitones)")
+        from engine.audio_utils import pitch_shift_file, wav_to_mp3
+
+        output_wav = task_dir / "audio.wav"
+        pitch_shift_file(input_path, output_wav, semitones)
+
+        output_mp3 = task_dir / "audio.mp3"
+        wav_to_mp3(output_wav, output_mp3)
+        BLOBS.adopt_all(task_dir, [input_path.name, output_wav.name, output_mp3.name])
+        TASKS.update_meta(task_id, loudness=output_loudness(output_wav))
+
     async def job():
+        set_job_labels("transpose", "librosa")
+        use_trace(trace)
+        cancellable(task_id)
+        use_deadline(deadline)
         try:
-            print(f"🎹 Transpose Task {task_id} started ({semitones} semitones)")
-            from engine.audio_utils import pitch_shift_file, wav_to_mp3
-            
-            output_wav = task_dir / "audio.wav"
-            pitch_shift_file(input_path, output_wav, semitones)
-            
-            output_mp3 = task_dir / "audio.mp3"
-            wav_to_mp3(output_wav, output_mp3)
+            await get_executor().run_task(task_id, run_transpose)
 
             files = {
                 "wav": f"/api/download/{task_id}/audio.wav",
                 "mp3": f"/api/download/{task_id}/audio.mp3",
             }
+            COSTS.observe("transpose", audio_sec, time.monotonic() - accepted_at)
+            TASKS.update_meta(task_id, trace=trace_tree(trace))
             TASKS.set_status(task_id, "done", files=files)
             print(f"✅ Transpose Task {task_id} completed")
-            
+
+        except TaskCancelled:
+            discard_partial_outputs(task_dir)
+            TASKS.update_meta(task_id, trace=trace_tree(trace))
+            TASKS.set_status(task_id, "cancelled")
+            print(f"🛑 Transpose Task {task_id} cancelled")
+
+        except DeadlineExceeded as e:
+            fail_overdue(task_id, task_dir, trace, "transpose", deadline_sec, e)
+
         except Exception:
              print("❌ TRANSPOSE JOB FAILED\n", traceback.format_exc())
+             TASKS.update_meta(task_id, trace=trace_tree(trace))
              TASKS.set_status(task_id, "error", error=traceback.format_exc())
 
     background.add_task(job)
     return GenerateResponse(task_id=task_id, status="queued")
 
 
+# -----------------------------------------------------------
+# MIXDOWN (studio timeline export)
+# -----------------------------------------------------------
+
+@app.post("/api/mixdown")
+@limiter.limit("20/minute")
+async def mixdown_project(
+    request: Request,  # Required for rate limiting
+    body: MixdownRequest,
+    x_api_key: str = Header(None),
+):
+    """
+    Render a studio project (tracks, clips, offsets, gains, transpose) to
+    one stereo WAV / MP3 and stream it back. The file is also kept as a
+    task (X-Task-Id header) so it can be downloaded again.
+    """
+    if x_api_key != API_KEY:
+        raise HTTPException(status_code=401, detail="Invalid API Key")
+    if body.format not in ("wav", "mp3"):
+        raise HTTPException(400, "format must be wav or mp3")
+
+    from engine.mixdown import MixdownError, render_project
+
+    task_id = uuid.uuid4().hex[:12]
+    task_dir = OUTPUT_ROOT / task_id
+    task_dir.mkdir(parents=True, exist_ok=True)
+    trace = start_trace(task_id)
+
+    project = body.model_dump()
+    audio_sec = body.duration or max(
+        (c.offset + c.endTime - c.startTime for t in body.tracks for c in t.clips), default=0.0
+    )
+    deadline_sec = COSTS.deadline_for("mixdown", audio_sec, body.timeout_sec)
+    accepted_at = time.monotonic()
+
+    TASKS.create(task_id, {
+        "status": "running",
+        "files": None,
+        "meta": {
+            "mode": "mixdown",
+            "tracks": len(body.tracks),
+            "format": body.format,
+            "sample_rate": body.sample_rate,
+            "deadline_sec": round(deadline_sec, 1),
+            "created_at": datetime.utcnow().isoformat(),
+        },
+        "error": None,
+    })
+
+    set_job_labels("mixdown", "numpy")
+    use_trace(trace)
+    use_deadline(deadline_at(deadline_sec))
+    wav_path, mp3_path = task_dir / "mixdown.wav", task_dir / "mixdown.mp3"
+    try:
+        with span("mixdown", tracks=len(body.tracks)):
+            stats = await to_thread_until_deadline(render_project, project, wav_path, body.sample_rate)
+        if body.format == "mp3":
+            await to_thread_until_deadline(wav_to_mp3, wav_path, mp3_path)
+    except MixdownError as e:
+        discard_partial_outputs(task_dir)
+        TASKS.set_status(task_id, "error", error=str(e))
+        raise HTTPException(400, str(e))
+    except DeadlineExceeded as e:
+        fail_overdue(task_id, task_dir, trace, "mixdown", deadline_sec, e)
+        raise HTTPException(504, f"Mixdown did not finish within {deadline_sec:.0f}s")
+    except Exception:
+        print("❌ MIXDOWN FAILED\n", traceback.format_exc())
+        discard_partial_outputs(task_dir)
+        TASKS.set_status(task_id, "error", error=traceback.format_exc())
+        raise HTTPException(500, "Mixdown failed")
+
+    BLOBS.adopt_all(task_dir, [wav_path.name, mp3_path.name])
+    for source_task in stats["sources"]:
+        RETENTION.touch(source_task)
+
+    files = {"wav": f"/api/download/{task_id}/{wav_path.name}"}
+    if body.format == "mp3":
+        files["mp3"] = f"/api/download/{task_id}/{mp3_path.name}"
+    COSTS.observe("mixdown", stats["duration_sec"], time.monotonic() - accepted_at)
+    TASKS.update_meta(task_id, mixdown=stats, loudness=stats.get("loudness"), trace=trace_tree(trace))
+    TASKS.set_status(task_id, "done", files=files)
+    print(f"🎚️ Mixdown {task_id}: {stats['duration_sec']}s, "
+          f"{stats['blocks_cached']}/{stats['blocks']} blocks from cache")
+
+    out_path = mp3_path if body.format == "mp3" else wav_path
+    return FileResponse(
+        out_path,
+        media_type="audio/mpeg" if body.format == "mp3" else "audio/wav",
+        filename=out_path.name,
+        headers={"X-Task-Id": task_id},
+    )
+
+
+# -----------------------------------------------------------
+# WAVEFORM VIDEO (MP4 export)
+# -----------------------------------------------------------
+
+@app.post("/api/video/waveform", response_model=GenerateResponse)
+@limiter.limit("10/minute")
+async def waveform_video(
+    request: Request,  # Required for rate limiting
+    background: BackgroundTasks,
+    audio_file: UploadFile | str | None = File(default=None),
+
+    # Or an existing artefact: /api/download/<task_id>/<file> (e.g. a mixdown)
+    source: str = Form(""),
+
+    style: str = Form("waveform"),      # waveform | spectrum
+    width: int = Form(1280),
+    height: int = Form(720),
+    fps: int = Form(30),
+    color: str = Form("#22d3ee"),
+    background_color: str = Form("#0b0b10"),
+    timeout_sec: float = Form(0),
+    x_api_key: str = Header(None),
+):
+    """
+    Render an animated waveform / spectrum MP4 of an upload or a task
+    artefact. Progress (frames done / total) is in meta.progress of
+    /api/result/{id}; DELETE /api/task/{id} stops the encode.
+    """
+    if x_api_key != API_KEY:
+        raise HTTPException(status_code=401, detail="Invalid API Key")
+    if isinstance(audio_file, str):
+        audio_file = None
+    if style not in ("waveform", "spectrum"):
+        raise HTTPException(400, "style must be waveform or spectrum")
+    if not (16 <= width <= VIDEO_MAX_WIDTH and 16 <= height <= VIDEO_MAX_HEIGHT) or width % 2 or height % 2:
+        raise HTTPException(400, f"width / height must be even and at most {VIDEO_MAX_WIDTH}x{VIDEO_MAX_HEIGHT}")
+    if not 1 <= fps <= 60:
+        raise HTTPException(400, "fps must be between 1 and 60")
+    for name, value in (("color", color), ("background_color", background_color)):
+        if not re.fullmatch(r"#?[0-9a-fA-F]{6}", value):
+            raise HTTPException(400, f"{name} must be a #rrggbb colour, got '{value}'")
+    if audio_file is None and not source:
+        raise HTTPException(400, "audio_file or source is required")
+
+    task_id = uuid.uuid4().hex[:12]
+    task_dir = OUTPUT_ROOT / task_id
+    task_dir.mkdir(parents=True, exist_ok=True)
+    trace = start_trace(task_id)
+
+    if audio_file is not None:
+        input_path = task_dir / f"input_{audio_file.filename}"
+        with span("upload_write"), open(input_path, "wb") as f:
+            f.write(await audio_file.read())
+    else:
+        from engine.mixdown import MixdownError, resolve_source
+        try:
+            source_task, input_path = resolve_source(source)
+        except MixdownError as e:
+            shutil.rmtree(task_dir, ignore_errors=True)
+            raise HTTPException(404, str(e))
+        RETENTION.touch(source_task)
+
+    audio_sec = audio_seconds(input_path)
+    if audio_sec > VIDEO_MAX_SEC:
+        shutil.rmtree(task_dir, ignore_errors=True)
+        raise HTTPException(400, f"Audio longer than {VIDEO_MAX_SEC:.0f}s cannot be rendered")
+    deadline_sec = COSTS.deadline_for("video", audio_sec, timeout_sec)
+    deadline = deadline_at(deadline_sec)
+    accepted_at = time.monotonic()
+
+    TASKS.create(task_id, {
+        "status": "queued",
+        "files": None,
+        "meta": {
+            "mode": "video",
+            "style": style,
+            "size": f"{width}x{height}",
+            "fps": fps,
+            "source": source or audio_file.filename,
+            "deadline_sec": round(deadline_sec, 1),
+            "created_at": datetime.utcnow().isoformat(),
+        },
+        "error": None,
+    })
+
+    def run_video() -> dict:
+        TASKS.raise_if_cancelled(task_id)
+        TASKS.set_status(task_id, "running")
+        print(f"🎬 Video Task {task_id} started ({style}, {width}x{height}@{fps})")
+        from engine.audio_utils import render_waveform_video
+
+        last_update = [0.0]
+
+        def on_progress(done: int, total: int):
+            # task.json is rewritten on every update: at most twice a second
+            now = time.monotonic()
+            if done == total or now - last_update[0] >= 0.5:
+                last_update[0] = now
+                TASKS.update_meta(task_id, progress={
+                    "frames_done": done, "frames_total": total, "percent": round(100 * done / total, 1),
+                })
+
+        stats = render_waveform_video(
+            input_path, task_dir / "video.mp4",
+            width=width, height=height, fps=fps, style=style,
+            color=color, background=background_color,
+            batch=VIDEO_FRAME_BATCH, on_progress=on_progress,
+        )
+        # An artefact used as source stays in its own task folder
+        BLOBS.adopt_all(task_dir, ["video.mp4"] + ([input_path.name] if input_path.parent == task_dir else []))
+        return stats
+
+    async def job():
+        set_job_labels("video", "ffmpeg")
+        use_trace(trace)
+        cancellable(task_id)
+        use_deadline(deadline)
+        try:
+            stats = await get_executor().run_task(task_id, run_video)
+
+            files = {"mp4": f"/api/download/{task_id}/video.mp4"}
+            COSTS.observe("video", audio_sec, time.monotonic() - accepted_at)
+            TASKS.update_meta(task_id, video=stats, trace=trace_tree(trace))
+            TASKS.set_status(task_id, "done", files=files)
+            print(f"✅ Video Task {task_id} completed ({stats['frames']} frames, {stats['render_fps']} fps)")
+
+        except TaskCancelled:
+            discard_partial_outputs(task_dir)
+            TASKS.update_meta(task_id, trace=trace_tree(trace))
+            TASKS.set_status(task_id, "cancelled")
+            print(f"🛑 Video Task {task_id} cancelled")
+
+        except DeadlineExceeded as e:
+            fail_overdue(task_id, task_dir, trace, "video", deadline_sec, e)
+
+        except Exception:
+            print("❌ VIDEO JOB FAILED\n", traceback.format_exc())
+            TASKS.update_meta(task_id, trace=trace_tree(trace))
+            TASKS.set_status(task_id, "error", error=traceback.format_exc())
+
+    background.add_task(job)
+    return GenerateResponse(task_id=task_id, status="queued")
+
+
 # -----------------------------------------------------------
 # DOWNLOAD
 # -----------------------------------------------------------
 
 @app.get("/api/download/{task_id}/{filename}")
 def download_file(task_id: str, filename: str):
-    file_path = OUTPUT_ROOT / task_id / filename
+    started = time.perf_counter()
+    file_path, tier = OUTPUT_ROOT / task_id / filename, "hot"
     if not file_path.exists():
-        raise HTTPException(404, "File not found")
+        # Compacted to the cold tier: re-create the WAV / MP3 on demand
+        file_path, tier = COLD_TIER.materialise(OUTPUT_ROOT / task_id, filename), "cold"
+        if file_path is None:
+            raise HTTPException(404, "File not found")
+    RETENTION.touch(task_id)
+    COLD_TIER.record_download(tier, time.perf_counter() - started)
     return FileResponse(file_path)
 
 
@@ -473,16 +1439,126 @@ def health():
     free_gb = free // (2**30)
     
     # Count active tasks
-    active_tasks = sum(1 for t in TASKS._tasks.values() if t.get("status") == "processing")
+    counts = TASKS.counts()
     
     return {
         "status": "ok",
         "base_url": BASE_URL,
         "version": "2.3.1",
-        "active_tasks": active_tasks,
+        "active_tasks": counts.get("running", 0),
+        "queued_tasks": counts.get("queued", 0),
         "disk_space_gb": free_gb,
-        "models": ["musicgen-small", "audioldm2p"],
+        "storage": {**RETENTION.usage(), "cold_tier": COLD_TIER.snapshot()},
+        "models": sorted(
+            key for registry in all_registries().values() for key in registry.snapshot()["loaded"]
+        ),
+    }
+
+
+@app.get("/api/health/ready")
+def health_ready():
+    """
+    Per-subsystem readiness + startup import time.
+    Returns 503 until every warm-up subsystem is loaded.
+    """
+    report = READINESS.report()
+    report["import"] = {
+        "main_seconds": round(IMPORT_SECONDS, 3),
+        "budget_seconds": IMPORT_BUDGET_SEC,
+        "within_budget": IMPORT_SECONDS <= IMPORT_BUDGET_SEC,
+    }
+    report["executor"] = get_executor().stats()
+    report["job_costs"] = COSTS.snapshot()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+
+@app.get("/api/health/workers")
+def health_workers():
+    """
+    Memory of the fork-server workers (see serve.py): shared model pages
+    vs. per-worker incremental (private) memory.
+    """
+    from services.memory import process_memory, to_mb
+
+    report = {}
+    if WORKERS_STATUS_FILE.exists():
+        try:
+            report = json.loads(WORKERS_STATUS_FILE.read_text(encoding="utf-8"))
+        except ValueError:
+            pass
+
+    mem = process_memory()
+    report["this_worker"] = {
+        "pid": os.getpid(),
+        "rss_mb": to_mb(mem["rss"]),
+        "pss_mb": to_mb(mem["pss"]),
+        "incremental_mb": to_mb(mem["uss"]),
     }
+    return report
+
+
+@app.get("/api/health/memory")
+def health_memory():
+    """Memory watchdog: pressure state, watermarks, recently unloaded models."""
+    return MEMORY_WATCHDOG.snapshot()
+
+
+@app.get("/api/health/caches")
+def health_caches():
+    """Hit rate and inference time saved by each cache (this worker)."""
+    from engine.caches import all_caches
+
+    return {name: cache.stats() for name, cache in all_caches().items()}
+
+
+# -----------------------------------------------------------
+# METRICS (Prometheus text format)
+# -----------------------------------------------------------
+
+EXECUTOR_JOBS = METRICS.gauge("aistudio_executor_jobs", "Inference executor jobs by state", ("state",))
+TASKS_BY_STATUS = METRICS.gauge("aistudio_tasks", "Tasks held by this worker, by status", ("status",))
+MODELS_LOADED = METRICS.gauge("aistudio_models_loaded", "Models resident in memory", ("registry",))
+PROCESS_RSS = METRICS.gauge("aistudio_process_resident_memory_bytes", "Resident memory of this worker")
+CACHE_LOOKUPS = METRICS.counter("aistudio_cache_lookups_total", "Inference cache lookups", ("cache", "result"))
+CACHE_SAVED = METRICS.counter(
+    "aistudio_cache_saved_seconds_total", "Inference time saved by cache hits", ("cache",)
+)
+
+
+def collect_runtime_metrics():
+    from engine.caches import all_caches
+    from services.memory import process_memory
+
+    stats = get_executor().stats()
+    EXECUTOR_JOBS.set(stats["queued"], state="queued")
+    EXECUTOR_JOBS.set(stats["busy"], state="busy")
+    EXECUTOR_JOBS.set(stats["stuck"], state="stuck")
+
+    TASKS_BY_STATUS.clear()
+    for status, count in TASKS.counts().items():
+        TASKS_BY_STATUS.set(count, status=status)
+
+    for name, registry in all_registries().items():
+        MODELS_LOADED.set(len(registry.snapshot()["loaded"]), registry=name)
+
+    rss = process_memory()["rss"]
+    if rss is not None:
+        PROCESS_RSS.set(rss)
+
+    for name, cache in all_caches().items():
+        cache_stats = cache.stats()
+        CACHE_LOOKUPS.set(cache_stats["hits"], cache=name, result="hit")
+        CACHE_LOOKUPS.set(cache_stats["misses"], cache=name, result="miss")
+        CACHE_SAVED.set(cache_stats["saved_seconds"], cache=name)
+
+
+METRICS.add_collector(collect_runtime_metrics)
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint (per worker process)."""
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
 
 
 
@@ -581,4 +1657,5 @@ async def update_config_keys(config: ConfigUpdate, x_api_key: str = Header(None)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-
+# Time spent importing this module (reported by /api/health/ready)
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
@@ -0,0 +1,72 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class BatchGenerateRequest(BaseModel):
+    """
+    Body of POST /api/generate/batch. Either one prompt rendered in
+    `variations` seeds, or a list of prompts (one clip each).
+    """
+    model_config = {
+        "protected_namespaces": ()
+    }
+    prompt: Optional[str] = None
+    variations: int = 1
+    prompts: Optional[List[str]] = None
+
+    mode: str = "music"              # music | sfx
+    duration_sec: int = 10
+    model_name: Optional[str] = None
+    profile: Optional[str] = None
+    sfx_quality: Optional[str] = None
+    style: Optional[str] = None
+
+    temperature: float = 1.0
+    top_k: int = 250
+    top_p: float = 0.95
+    seed: int = 0
+    seed_lock: bool = False
+
+    # Client hint: give up after this many seconds (can only shorten the deadline)
+    timeout_sec: float = 0
+
+
+class MixdownClip(BaseModel):
+    """A clip as the studio stores it (ClipData); times in seconds."""
+    id: Optional[str] = None
+    assetId: Optional[str] = None
+    source: Optional[str] = None     # /api/download/<task_id>/<file>; else looked up via assetId
+    startTime: float = 0.0
+    endTime: float
+    offset: float = 0.0
+    fadeIn: float = 0.0
+    fadeOut: float = 0.0
+    playbackRate: float = 1.0
+
+
+class MixdownTrack(BaseModel):
+    id: Optional[str] = None
+    volume: float = 1.0
+    gain: float = 1.0
+    muted: bool = False
+    solo: bool = False
+    pan: float = 0.0
+    transpose: float = 0.0           # semitones
+    clips: List[MixdownClip] = []
+
+
+class MixdownAsset(BaseModel):
+    id: str
+    url: str
+
+
+class MixdownRequest(BaseModel):
+    """Body of POST /api/mixdown: the studio project to render."""
+    tracks: List[MixdownTrack]
+    assets: List[MixdownAsset] = []
+    duration: float = 0.0            # seconds, 0 = end of the last clip
+    sample_rate: int = 44100
+    format: str = "wav"              # wav | mp3
+
+    # Client hint: give up after this many seconds (can only shorten the deadline)
+    timeout_sec: float = 0
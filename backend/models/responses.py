@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 
 
 class GenerateResponse(BaseModel):
@@ -13,13 +13,28 @@ class GenerateResponse(BaseModel):
 class ResultResponse(BaseModel):
     """
     Response returned when polling /api/result/{task_id}
-    - status: queued / running / done / error
+    - status: queued / running / done / error / cancelled
     - files: dict { wav: url, mp3: url }
-    - meta: prompt, seed, model, timestamps
+    - preview: quick draft { wav: url, mp3: url } published before the full render
+    - meta: prompt, seed, model, timestamps, trace (span tree, once finished)
     - error: error message only if failed
     """
     task_id: str
     status: str
     files: Optional[Dict[str, str]] = None
+    preview: Optional[Dict[str, str]] = None
     meta: Optional[Dict] = None
     error: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    """
+    Response of POST /api/generate/batch and GET /api/batch/{group_id}
+    - tasks: one entry per clip { task_id, status, prompt, seed, files, error }
+    - throughput: once finished, batch wall time vs. the same clips as single requests
+    """
+    group_id: str
+    status: str
+    counts: Optional[Dict[str, int]] = None
+    tasks: List[Dict] = []
+    throughput: Optional[Dict] = None
@@ -0,0 +1,184 @@
+"""
+Offline renderer for the pre-rendered SFX library (see services/sfx_library.py).
+
+Renders N seeded variants of every SOUND_PROMPTS entry per model into
+outputs/sfx_library as FLAC + index.json. Resumable: variants already on
+disk are skipped, so an interrupted run just continues. Variants are
+rendered in parallel processes, each with its own share of the cores.
+
+Usage (from backend/):
+    python render_sfx_library.py
+    python render_sfx_library.py --models audioldm2p --durations 5,10 --variants 3
+    python render_sfx_library.py --categories transitions --procs 4 --limit 20
+"""
+
+import os
+import sys
+import time
+import argparse
+import multiprocessing as mp
+
+from config import SFX_LIBRARY_DIR
+from services.sfx_library import (
+    entry_key,
+    iter_catalogue,
+    load_index,
+    normalize_model,
+    save_index,
+    variant_seed,
+)
+from services.executor import available_cores, heuristic_workers
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Pre-render the SFX prompt catalogue")
+    parser.add_argument("--models", default="audioldm2p", help="Comma-separated SFX models")
+    parser.add_argument("--durations", default="5", help="Comma-separated durations (5, 10, 15, 20)")
+    parser.add_argument("--variants", type=int, default=2, help="Seeded variants per entry")
+    parser.add_argument("--quality", default="standard", help="SFX quality tier")
+    parser.add_argument("--profile", default="quality", help="Inference profile")
+    parser.add_argument("--categories", default=None, help="Only these top-level categories")
+    parser.add_argument("--limit", type=int, default=0, help="Only the first N catalogue entries")
+    parser.add_argument("--procs", type=int, default=0, help="Render processes (default: 1 per 4 cores)")
+    return parser.parse_args()
+
+
+def variant_file(model_key: str, duration: int, entry_id: str, variant: int) -> str:
+    return f"{model_key}/{duration}s/{entry_id.replace('/', '__')}_{variant}.flac"
+
+
+# ---------------------------------------------------------------
+# RENDER PROCESS
+# ---------------------------------------------------------------
+def init_worker(threads: int):
+    import torch
+    torch.set_num_threads(threads)
+
+
+def render_variant(job: dict) -> dict:
+    """Render one variant to FLAC (atomic write) and return its index record."""
+    import soundfile as sf
+    from engine import sfx
+
+    started = time.perf_counter()
+    rel = sfx.generate_sfx(
+        job["prompt"], job["model"], job["duration"], job["seed"], job["profile"], job["quality"]
+    )
+    wav_path = sfx.OUTPUT_DIR.parent / rel
+    audio, sr = sf.read(str(wav_path))
+    wav_path.unlink(missing_ok=True)
+
+    out_path = SFX_LIBRARY_DIR / job["file"]
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_name(out_path.stem + ".tmp.flac")
+    sf.write(str(tmp), audio, sr, format="FLAC", subtype="PCM_16")
+    os.replace(tmp, out_path)
+
+    return {**job, "render_sec": round(time.perf_counter() - started, 2)}
+
+
+# ---------------------------------------------------------------
+# INDEX
+# ---------------------------------------------------------------
+def add_to_index(index: dict, job: dict, render_sec=None):
+    key = entry_key(job["model"], job["duration"], job["entry_id"])
+    entry = index["entries"].setdefault(key, {
+        "entry_id": job["entry_id"],
+        "prompt": job["prompt"],
+        "model": job["model"],
+        "duration": job["duration"],
+        "variants": [],
+    })
+    entry["variants"] = [v for v in entry["variants"] if v["file"] != job["file"]]
+    entry["variants"].append({
+        "seed": job["seed"],
+        "file": job["file"],
+        "render_sec": render_sec,
+        "quality": job["quality"],
+        "profile": job["profile"],
+    })
+    entry["variants"].sort(key=lambda v: v["file"])
+
+
+def plan_jobs(args, index: dict) -> tuple[list[dict], int]:
+    categories = [c.strip() for c in args.categories.split(",")] if args.categories else None
+    catalogue = list(iter_catalogue(categories))
+    if args.limit:
+        catalogue = catalogue[:args.limit]
+
+    jobs, resumed = [], 0
+    for model in [normalize_model(m) for m in args.models.split(",") if m.strip()]:
+        for duration in [int(d) for d in args.durations.split(",") if d.strip()]:
+            for entry_id, prompt in catalogue:
+                for variant in range(args.variants):
+                    job = {
+                        "entry_id": entry_id,
+                        "prompt": prompt,
+                        "model": model,
+                        "duration": duration,
+                        "seed": variant_seed(entry_id, model, variant),
+                        "quality": args.quality,
+                        "profile": args.profile,
+                        "file": variant_file(model, duration, entry_id, variant),
+                    }
+                    if (SFX_LIBRARY_DIR / job["file"]).exists():
+                        # Rendered by an interrupted run: make sure it is indexed
+                        key = entry_key(model, duration, entry_id)
+                        known = index["entries"].get(key, {}).get("variants", [])
+                        if not any(v["file"] == job["file"] for v in known):
+                            add_to_index(index, job)
+                        resumed += 1
+                        continue
+                    jobs.append(job)
+    return jobs, resumed
+
+
+def main():
+    args = parse_args()
+    index = load_index()
+    jobs, resumed = plan_jobs(args, index)
+    save_index(index)
+
+    cores = available_cores()
+    procs = max(1, min(args.procs or heuristic_workers(len(cores)), len(jobs) or 1))
+    threads = max(1, len(cores) // procs)
+
+    print(f"🎛 SFX library: {len(jobs)} variants to render, {resumed} already on disk "
+          f"({procs} processes x {threads} threads) -> {SFX_LIBRARY_DIR}")
+    if not jobs:
+        return 0
+
+    started = time.perf_counter()
+    done = failed = 0
+    # One pool per model so every process loads a single pipeline
+    for model in sorted({j["model"] for j in jobs}):
+        model_jobs = [j for j in jobs if j["model"] == model]
+        ctx = mp.get_context("spawn")
+        with ctx.Pool(procs, initializer=init_worker, initargs=(threads,)) as pool:
+            results = pool.imap_unordered(_safe_render, model_jobs)
+            for result in results:
+                if "error" in result:
+                    failed += 1
+                    print(f"❌ {result['entry_id']} ({model}): {result['error']}")
+                    continue
+                done += 1
+                add_to_index(index, result, result["render_sec"])
+                if done % 10 == 0:
+                    save_index(index)
+                    elapsed = time.perf_counter() - started
+                    print(f"   {done}/{len(jobs)} rendered ({elapsed / done:.1f}s per variant)")
+        save_index(index)
+
+    print(f"✅ Rendered {done} variants ({failed} failed) in {time.perf_counter() - started:.0f}s")
+    return 1 if failed else 0
+
+
+def _safe_render(job: dict) -> dict:
+    try:
+        return render_variant(job)
+    except Exception as e:
+        return {**job, "error": str(e)}
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""
+Fork-Server Launcher for AI Music Studio
+Loads model weights ONCE in a parent process, then forks uvicorn workers
+that share those weight pages copy-on-write instead of each loading its
+own copy of MusicGen / AudioLDM / DeepFilterNet.
+
+Usage:
+    python serve.py --workers 4 --port 8000
+    python serve.py --workers 2 --preload musicgen,sfx
+
+Per-worker memory (RSS / PSS / private USS) is written to
+outputs/workers.json and served at /api/health/workers.
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import signal
+import socket
+import argparse
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Preload models once and fork inference workers")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("MUSIC_WORKERS", "2")))
+    parser.add_argument("--preload", default=None,
+                        help="Comma-separated subsystems to load before forking (default: PRELOAD_SUBSYSTEMS)")
+    parser.add_argument("--report-interval", type=float, default=30.0,
+                        help="Seconds between memory reports")
+    return parser.parse_args()
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """Bind once in the parent; every forked worker accepts on the same socket."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def set_torch_threads(n: int):
+    try:
+        import torch
+        torch.set_num_threads(n)
+    except ImportError:
+        pass
+
+
+def run_worker(index: int, sock: socket.socket, cores: list[int]):
+    """Entry point of a forked worker (never returns)."""
+    import uvicorn
+    from main import app
+    from services.executor import format_cores
+
+    # uvicorn installs its own handlers; drop the supervisor's
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    # This process's inference executor partitions only its own cores
+    os.environ["INFERENCE_CORES"] = format_cores(cores)
+
+    print(f"👷 Worker {index} (pid {os.getpid()}) serving on cores {format_cores(cores)}")
+    server = uvicorn.Server(uvicorn.Config(app, log_level="info"))
+    server.run(sockets=[sock])
+
+
+class Supervisor:
+    def __init__(self, sock: socket.socket, workers: int, parent_memory: dict):
+        from services.executor import available_cores, split_cores
+
+        self.sock = sock
+        self.workers = workers
+        self.core_slices = split_cores(available_cores(), workers)
+        self.parent_memory = parent_memory
+        self.children: dict[int, dict] = {}
+        self.stopping = False
+
+    def spawn(self, index: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(index, self.sock, self.core_slices[index % len(self.core_slices)])
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = {"index": index, "started_at": time.time()}
+
+    def reap(self):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            info = self.children.pop(pid, None)
+            if info and not self.stopping:
+                print(f"⚠️ Worker {info['index']} (pid {pid}) exited with status {status}, restarting")
+                self.spawn(info["index"])
+
+    def stop(self, *_):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def memory_report(self) -> dict:
+        from services.memory import process_memory, to_mb
+
+        workers = []
+        for pid, info in sorted(self.children.items(), key=lambda kv: kv[1]["index"]):
+            mem = process_memory(pid)
+            workers.append({
+                "index": info["index"],
+                "pid": pid,
+                "rss_mb": to_mb(mem["rss"]),
+                "pss_mb": to_mb(mem["pss"]),
+                # Private pages = what this worker adds on top of the shared weights
+                "incremental_mb": to_mb(mem["uss"]),
+            })
+
+        parent_now = process_memory()
+        preload_mb = to_mb(self.parent_memory["after"]["rss"] - self.parent_memory["before"]["rss"])
+        incremental = [w["incremental_mb"] or 0 for w in workers]
+        total_pss = sum(w["pss_mb"] or 0 for w in workers) + (to_mb(parent_now["pss"]) or 0)
+
+        return {
+            "updated_at": time.time(),
+            "parent": {
+                "pid": os.getpid(),
+                "rss_mb": to_mb(parent_now["rss"]),
+                "preloaded_models_mb": preload_mb,
+            },
+            "workers": workers,
+            "total_pss_mb": round(total_pss, 1),
+            # What N independent processes would need (each its own model copy)
+            "estimated_unshared_mb": round(sum((preload_mb or 0) + i for i in incremental), 1),
+        }
+
+    def write_report(self):
+        from config import WORKERS_STATUS_FILE
+
+        report = self.memory_report()
+        tmp = WORKERS_STATUS_FILE.with_suffix(".tmp")
+        tmp.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        os.replace(tmp, WORKERS_STATUS_FILE)
+
+        per_worker = ", ".join(f"w{w['index']}={w['incremental_mb']}MB" for w in report["workers"])
+        print(f"📊 Workers: shared models {report['parent']['preloaded_models_mb']}MB, "
+              f"incremental {per_worker}, total PSS {report['total_pss_mb']}MB "
+              f"(vs ~{report['estimated_unshared_mb']}MB unshared)")
+
+    def run(self, report_interval: float):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        for i in range(self.workers):
+            self.spawn(i)
+
+        next_report = time.time() + min(report_interval, 15.0)
+        while not self.stopping:
+            self.reap()
+            if time.time() >= next_report:
+                try:
+                    self.write_report()
+                except Exception as e:
+                    print(f"⚠️ Memory report failed: {e}")
+                next_report = time.time() + report_interval
+            time.sleep(0.5)
+
+        deadline = time.time() + 30
+        while self.children and time.time() < deadline:
+            self.reap()
+            time.sleep(0.2)
+        for pid in list(self.children):
+            os.kill(pid, signal.SIGKILL)
+        print("👋 Supervisor stopped")
+
+
+def main():
+    args = parse_args()
+    workers = max(1, args.workers)
+
+    # Must be set before config / main are imported (TaskStore reads it)
+    os.environ["MUSIC_WORKERS"] = str(workers)
+
+    if not hasattr(os, "fork"):
+        import uvicorn
+        print("⚠️ os.fork() is not available on this platform, running a single process")
+        uvicorn.run("main:app", host=args.host, port=args.port)
+        return
+
+    from config import PRELOAD_SUBSYSTEMS
+    from services.memory import process_memory, to_mb
+
+    preload = [s.strip() for s in args.preload.split(",")] if args.preload else PRELOAD_SUBSYSTEMS
+    preload = [s for s in preload if s and s != "chat"]
+
+    sock = bind_socket(args.host, args.port)
+
+    before = process_memory()
+
+    # Keep the parent single-threaded: OpenMP thread pools do not survive fork()
+    set_torch_threads(1)
+
+    import main as app_module  # noqa: F401  (builds the app + registers subsystems)
+    from services.readiness import READINESS
+
+    for name in preload:
+        print(f"📦 Preloading {name} in supervisor...")
+        READINESS.ensure(name)
+
+    # Move everything loaded so far out of the GC's reach so collections in the
+    # workers do not touch (and therefore copy) the shared pages.
+    gc.collect()
+    gc.freeze()
+
+    after = process_memory()
+    print(f"✅ Preloaded {', '.join(preload) or 'nothing'}: "
+          f"{to_mb(after['rss'] - before['rss'])}MB shared by {workers} workers")
+
+    Supervisor(sock, workers, {"before": before, "after": after}).run(args.report_interval)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""
+Content-addressed artefact store.
+
+Finished artefacts (WAV / MP3 / uploads) are stored once under
+OUTPUT_ROOT/blobs/<aa>/<sha256><ext>; task folders are views made of hard
+links to those blobs, plus a manifest.json (file name -> blob). Identical
+outputs (library hits, seed-locked re-renders, re-uploaded references)
+share one copy on disk.
+
+Engines keep writing straight into the task folder; adopt() then links
+the finished file into the store (no copy). Stored files are read-only:
+anything that changes an artefact must write a new file and replace it.
+
+Blobs whose only remaining link is the store's own are garbage: retention
+reads a task's manifest before deleting its folder and collect()s after.
+Where hard links are not supported the file simply stays in the task
+folder (nothing is lost, only the dedup).
+"""
+
+import os
+import json
+import hashlib
+from pathlib import Path
+from threading import Lock
+
+from config import BLOB_STORE_DIR, BLOB_STORE_ENABLED
+from services.metrics import METRICS
+
+MANIFEST = "manifest.json"
+
+BLOB_DEDUP = METRICS.counter(
+    "aistudio_blob_dedup_bytes_total", "Bytes not stored again because the content already existed"
+)
+BLOBS_STORED = METRICS.counter("aistudio_blobs_stored_total", "New blobs added to the artefact store")
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class BlobStore:
+    def __init__(self, root: Path = BLOB_STORE_DIR, enabled: bool = BLOB_STORE_ENABLED):
+        self.root = Path(root)
+        self.enabled = enabled
+        self._manifest_lock = Lock()
+
+    def blob_path(self, digest: str, suffix: str) -> Path:
+        return self.root / digest[:2] / f"{digest}{suffix.lower()}"
+
+    # ---------------- adopt ----------------
+    def adopt(self, path: Path) -> str | None:
+        """
+        Move a finished artefact into the store and leave a hard link in its
+        place. Returns the blob path relative to the store (None if not stored).
+        """
+        path = Path(path)
+        if not self.enabled or not path.is_file():
+            return None
+        digest = file_digest(path)
+        blob = self.blob_path(digest, path.suffix)
+        size = path.stat().st_size
+        try:
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            if blob.exists():
+                if not os.path.samefile(blob, path):
+                    # Same content already stored: swap the file for a link
+                    tmp = path.with_name(f".{path.name}.link")
+                    os.link(blob, tmp)
+                    os.replace(tmp, path)
+                    BLOB_DEDUP.inc(size)
+            else:
+                tmp = blob.with_name(f".{blob.name}.{os.getpid()}.tmp")
+                os.link(path, tmp)
+                os.replace(tmp, blob)
+                if os.name == "posix":
+                    os.chmod(blob, 0o444)
+                BLOBS_STORED.inc()
+        except OSError as e:
+            print(f"⚠️ Blob store: keeping {path.name} unlinked ({e})")
+            return None
+
+        rel = blob.relative_to(self.root).as_posix()
+        self._record(path.parent, path.name, rel, size)
+        return rel
+
+    def adopt_all(self, task_dir: Path, names) -> dict:
+        """Adopt the named files of a task folder that exist."""
+        stored = {}
+        for name in names:
+            rel = self.adopt(Path(task_dir) / name)
+            if rel:
+                stored[name] = rel
+        return stored
+
+    def link_into(self, rel: str, dest: Path) -> bool:
+        """Materialise a stored blob at dest (hard link, no copy)."""
+        blob = self.root / rel
+        try:
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            tmp = dest.with_name(f".{dest.name}.link")
+            os.link(blob, tmp)
+            os.replace(tmp, dest)
+        except OSError:
+            return False
+        self._record(dest.parent, dest.name, rel, blob.stat().st_size)
+        return True
+
+    # ---------------- aliases ----------------
+    # Derived artefacts of a fixed source (e.g. the WAV / MP3 decoded from a
+    # pre-rendered library FLAC) are remembered by source key, so repeat
+    # requests link the stored blobs instead of decoding / encoding again.
+    def _alias_path(self, key: str) -> Path:
+        return self.root / "aliases" / f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.json"
+
+    def lookup_alias(self, key: str) -> dict | None:
+        if not self.enabled:
+            return None
+        try:
+            stored = json.loads(self._alias_path(key).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if all((self.root / rel).exists() for rel in stored.values()):
+            return stored
+        return None
+
+    def save_alias(self, key: str, stored: dict):
+        if not self.enabled or not stored:
+            return
+        path = self._alias_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(stored), encoding="utf-8")
+        os.replace(tmp, path)
+
+    # ---------------- manifest ----------------
+    def _record(self, task_dir: Path, name: str, rel: str, size: int):
+        with self._manifest_lock:
+            manifest = read_manifest(task_dir)
+            manifest[name] = {"blob": rel, "bytes": size}
+            write_manifest(task_dir, manifest)
+
+    def discard(self, task_dir: Path, name: str) -> int:
+        """Remove one file from a task folder (and its blob if now unused). Returns bytes freed."""
+        path = Path(task_dir) / name
+        with self._manifest_lock:
+            manifest = read_manifest(task_dir)
+            entry = manifest.pop(name, None)
+            if entry is not None:
+                write_manifest(task_dir, manifest)
+        try:
+            st = path.stat()
+            path.unlink()
+        except OSError:
+            return 0
+        if entry is None:
+            return st.st_size
+        return self.collect([entry["blob"]])
+
+    # ---------------- garbage collection ----------------
+    def collect(self, rels) -> int:
+        """Delete blobs no task folder links to any more. Returns bytes freed."""
+        freed = 0
+        for rel in set(rels):
+            blob = self.root / rel
+            try:
+                st = blob.stat()
+                if st.st_nlink <= 1:
+                    blob.unlink()
+                    freed += st.st_size
+            except OSError:
+                pass
+        return freed
+
+    def stats(self) -> dict:
+        """Store size (walks the store: health/CLI use only)."""
+        blobs = total = 0
+        if self.root.is_dir():
+            for shard in os.scandir(self.root):
+                if shard.is_dir() and len(shard.name) == 2:
+                    for entry in os.scandir(shard.path):
+                        blobs += 1
+                        total += entry.stat().st_size
+        return {"enabled": self.enabled, "blobs": blobs, "bytes": total}
+
+
+def read_manifest(task_dir: Path) -> dict:
+    try:
+        return json.loads((Path(task_dir) / MANIFEST).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def write_manifest(task_dir: Path, manifest: dict):
+    tmp = Path(task_dir) / f".{MANIFEST}.tmp"
+    tmp.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    os.replace(tmp, Path(task_dir) / MANIFEST)
+
+
+# ✅ Global artefact store
+BLOBS = BlobStore()
@@ -1,15 +1,18 @@
 import os
 import json
 import re
-import requests
-from bs4 import BeautifulSoup
-from youtube_transcript_api import YouTubeTranscriptApi
+import importlib.util
+from threading import Lock
 from urllib.parse import urlparse, parse_qs
 from dotenv import load_dotenv
 
+from config import URL_FETCH_TIMEOUT_SEC
+from services.deadlines import TimeoutSession, http_timeout
+
+# google-generativeai, bs4 and youtube_transcript_api are slow to import,
+# so they are only imported when the assistant is actually used.
 try:
-    import google.generativeai as genai
-    HAS_GENAI = True
+    HAS_GENAI = importlib.util.find_spec("google.generativeai") is not None
 except ImportError:
     HAS_GENAI = False
 
@@ -48,9 +51,20 @@ You must respond in JSON format ONLY.
 Actions: "move_to_timeline", "move_to_generate", "move_to_assets".
 """
 
+        # Model is configured lazily on the first chat (no network at import)
         self.model = None
-        if HAS_GENAI and self.api_key:
+        self.model_name = None
+        self._model_lock = Lock()
+        if not (HAS_GENAI and self.api_key):
+            print("⚠️ ROOBO: No GOOGLE_API_KEY found. Chat system disabled.")
+
+    def _ensure_model(self):
+        with self._model_lock:
+            if self.model is not None or not (HAS_GENAI and self.api_key):
+                return self.model
             try:
+                import google.generativeai as genai
+
                 genai.configure(api_key=self.api_key)
                 
                 # Check for 2.0 Flash which is much better at following these instructions
@@ -70,8 +84,7 @@ Actions: "move_to_timeline", "move_to_generate", "move_to_assets".
                 self.model = genai.GenerativeModel(self.model_name, system_instruction=self.system_prompt)
             except Exception as e:
                 print(f"GenAI configuration error: {e}")
-        else:
-            print("⚠️ ROOBO: No GOOGLE_API_KEY found. Chat system disabled.")
+            return self.model
 
     def _extract_urls(self, text: str):
         return re.findall(r'https?://[^\s<>"]+|www\.[^\s<>"]+', text)
@@ -94,19 +107,24 @@ Actions: "move_to_timeline", "move_to_generate", "move_to_assets".
             # Check for YouTube
             yt_id = self._get_youtube_id(url)
             if yt_id:
+                from youtube_transcript_api import YouTubeTranscriptApi
                 try:
-                    transcript_list = YouTubeTranscriptApi.get_transcript(yt_id)
-                    transcript_text = " ".join([t['text'] for t in transcript_list])
+                    # The session bounds every request the client makes
+                    api = YouTubeTranscriptApi(http_client=TimeoutSession(URL_FETCH_TIMEOUT_SEC))
+                    transcript_text = " ".join(snippet.text for snippet in api.fetch(yt_id))
                     return f"[YouTube Video: {url}]\nCONTENT_START\n{transcript_text[:12000]}\nCONTENT_END"
                 except Exception as e:
                     print(f"Transcript failed for {yt_id}: {e}")
                     return f"[YouTube Video: {url}] - (Notice: No captions available for this video, so I can only see the URL, not the full dialogue.)"
 
             # General Link Fetching
+            import requests
+            from bs4 import BeautifulSoup
+
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
             }
-            response = requests.get(url, headers=headers, timeout=8)
+            response = requests.get(url, headers=headers, timeout=http_timeout(URL_FETCH_TIMEOUT_SEC))
             response.encoding = 'utf-8'
             soup = BeautifulSoup(response.text, 'html.parser')
             
@@ -126,7 +144,7 @@ Actions: "move_to_timeline", "move_to_generate", "move_to_assets".
         if not HAS_GENAI:
             return {"reply": "I can't connect to my brain right now! (Missing google-generativeai package).", "action": "none"}
         
-        if not self.model:
+        if not self._ensure_model():
             return {"reply": "I'm sorry, but I need a valid GOOGLE_API_KEY to function. Please check your .env file.", "action": "none"}
 
         try:
@@ -0,0 +1,167 @@
+"""
+Per-job deadlines and the timeouts derived from them.
+
+A job gets its deadline when it is accepted: the estimated cost (seconds
+per second of audio, learned per mode from finished jobs, starting from
+JOB_COST_DEFAULTS) times JOB_DEADLINE_SLACK, clamped to
+[JOB_DEADLINE_MIN_SEC, JOB_DEADLINE_MAX_SEC] and shortened by the
+client's timeout_sec hint. The deadline is a context variable, so it
+follows the job onto inference workers and threads. Everything below
+reads the time left from it:
+
+  - executor: jobs that expire while queued are dropped; a job still
+    running at its deadline is failed at once, and its worker is replaced
+    if it has not stopped JOB_DEADLINE_GRACE_SEC later
+  - engines stop at their next step boundary (services.tasks.checkpoint)
+  - ffmpeg runs and HTTP calls get timeouts capped by the time left
+"""
+
+import time
+import asyncio
+import contextvars
+from pathlib import Path
+from threading import Lock
+from typing import Optional
+
+import requests
+
+from config import (
+    HTTP_CONNECT_TIMEOUT_SEC,
+    JOB_COST_DEFAULTS,
+    JOB_COST_OVERHEAD_SEC,
+    JOB_DEADLINE_MAX_SEC,
+    JOB_DEADLINE_MIN_SEC,
+    JOB_DEADLINE_SLACK,
+)
+from services.metrics import METRICS
+
+DEADLINES_EXCEEDED = METRICS.counter(
+    "aistudio_job_deadline_exceeded_total", "Jobs stopped at their deadline", ("mode",)
+)
+
+_DEADLINE: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("job_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a job (or a call made for it) runs out of time."""
+
+
+# ---------------- context ----------------
+def deadline_at(seconds: float) -> float:
+    """Absolute deadline (time.monotonic) for a job accepted now."""
+    return time.monotonic() + seconds
+
+
+def use_deadline(at: Optional[float]):
+    """Bind a job's deadline to the current context (None = no deadline)."""
+    _DEADLINE.set(at)
+
+
+def current_deadline() -> Optional[float]:
+    return _DEADLINE.get()
+
+
+def time_left() -> Optional[float]:
+    at = _DEADLINE.get()
+    return None if at is None else at - time.monotonic()
+
+
+def check_deadline():
+    left = time_left()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("job deadline exceeded")
+
+
+def capped_timeout(cap: float) -> float:
+    """Timeout for one blocking call: cap, or less if the job has less time left."""
+    left = time_left()
+    if left is None:
+        return cap
+    if left <= 0:
+        raise DeadlineExceeded("job deadline exceeded")
+    return max(1.0, min(cap, left))
+
+
+def http_timeout(read_cap: float) -> tuple[float, float]:
+    """(connect, read) timeout for requests."""
+    read = capped_timeout(read_cap)
+    return min(HTTP_CONNECT_TIMEOUT_SEC, read), read
+
+
+class TimeoutSession(requests.Session):
+    """requests.Session with a default timeout (for clients that take a session)."""
+
+    def __init__(self, read_cap: float):
+        super().__init__()
+        self.read_cap = read_cap
+
+    def request(self, *args, **kwargs):
+        kwargs.setdefault("timeout", http_timeout(self.read_cap))
+        return super().request(*args, **kwargs)
+
+
+async def to_thread_until_deadline(fn, *args):
+    """asyncio.to_thread that gives up at the job's deadline."""
+    try:
+        return await asyncio.wait_for(asyncio.to_thread(fn, *args), time_left())
+    except asyncio.TimeoutError as e:
+        if isinstance(e, DeadlineExceeded):
+            raise
+        raise DeadlineExceeded("job deadline exceeded") from None
+
+
+# ---------------- cost model ----------------
+def audio_seconds(path: Path) -> float:
+    """Length of an uploaded file (from its size if it cannot be probed)."""
+    try:
+        import soundfile as sf
+        return float(sf.info(str(path)).duration)
+    except Exception:
+        # ~128 kbit/s compressed audio
+        return Path(path).stat().st_size / 16000
+
+
+class CostModel:
+    """Seconds of job time per second of audio, per mode (exponential moving average)."""
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self._rates = dict(JOB_COST_DEFAULTS)
+        self._observed = {}
+        self._lock = Lock()
+
+    def estimate(self, mode: str, audio_sec: float) -> float:
+        with self._lock:
+            rate = self._rates.get(mode, max(JOB_COST_DEFAULTS.values()))
+        return JOB_COST_OVERHEAD_SEC + rate * max(0.0, audio_sec)
+
+    def deadline_for(self, mode: str, audio_sec: float, hint: float | None = None) -> float:
+        """Seconds the job may take; a client hint can only shorten it."""
+        seconds = min(max(JOB_DEADLINE_SLACK * self.estimate(mode, audio_sec), JOB_DEADLINE_MIN_SEC),
+                      JOB_DEADLINE_MAX_SEC)
+        if hint and hint > 0:
+            seconds = min(seconds, max(1.0, hint))
+        return seconds
+
+    def observe(self, mode: str, audio_sec: float, seconds: float):
+        if audio_sec <= 0:
+            return
+        rate = max(0.0, seconds - JOB_COST_OVERHEAD_SEC) / audio_sec
+        with self._lock:
+            previous = self._rates.get(mode)
+            self._rates[mode] = rate if previous is None else previous + self.alpha * (rate - previous)
+            self._observed[mode] = self._observed.get(mode, 0) + 1
+
+    def record_exceeded(self, mode: str):
+        DEADLINES_EXCEEDED.inc(mode=mode)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                mode: {"sec_per_audio_sec": round(rate, 3), "observed_jobs": self._observed.get(mode, 0)}
+                for mode, rate in self._rates.items()
+            }
+
+
+# ✅ Global job cost model
+COSTS = CostModel()
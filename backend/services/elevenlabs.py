@@ -2,6 +2,9 @@ import os
 import requests
 import json
 
+from config import ELEVENLABS_TIMEOUT_SEC
+from services.deadlines import http_timeout
+
 ELEVENLABS_API_URL = "https://api.elevenlabs.io/v1"
 
 def generate_sfx(prompt: str, duration_seconds: float = 10):
@@ -26,7 +29,7 @@ def generate_sfx(prompt: str, duration_seconds: float = 10):
         "prompt_influence": 0.3 # Default value
     }
     
-    response = requests.post(url, headers=headers, json=data)
+    response = requests.post(url, headers=headers, json=data, timeout=http_timeout(ELEVENLABS_TIMEOUT_SEC))
     
     if response.status_code != 200:
         raise RuntimeError(f"ElevenLabs SFX generation failed {response.status_code}: {response.text}")
@@ -48,11 +51,14 @@ def isolate_voice(audio_file_path: str):
         "xi-api-key": api_key
     }
     
-    files = {
-        'audio': open(audio_file_path, 'rb')
-    }
-    
-    response = requests.post(url, headers=headers, files=files)
+    with open(audio_file_path, 'rb') as audio:
+        files = {
+            'audio': audio
+        }
+
+        response = requests.post(
+            url, headers=headers, files=files, timeout=http_timeout(ELEVENLABS_TIMEOUT_SEC)
+        )
     
     if response.status_code != 200:
         raise RuntimeError(f"ElevenLabs Voice Isolation failed {response.status_code}: {response.text}")
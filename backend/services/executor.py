@@ -0,0 +1,445 @@
+"""
+Inference executor + CPU execution profiles.
+
+Every heavy job (MusicGen, AudioLDM, DeepFilterNet, librosa) runs on one of
+N inference worker threads. Each worker owns a disjoint core set and sets
+torch / OpenMP threads to match (optionally pinning its affinity), so
+concurrent jobs do not oversubscribe the machine.
+
+The split (N workers x T threads) comes from, in order:
+  1. INFERENCE_WORKERS=<n>            explicit
+  2. outputs/execution_profile.json   written by `python -m services.executor --calibrate`
+  3. a heuristic (4 threads per worker)
+
+Jobs carry their deadline (services/deadlines.py) in their context: a job
+that expires while queued is dropped, and a job still running at its
+deadline is failed straight away. If its worker has not come back
+JOB_DEADLINE_GRACE_SEC later (stuck in native code or a child process),
+a replacement worker takes over the core set and the stuck thread exits
+whenever it returns, so capacity is never silently lost.
+
+Calibrate on the target host:
+    python -m services.executor --calibrate
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import asyncio
+import threading
+import contextvars
+import concurrent.futures
+from dataclasses import dataclass, field, asdict
+from threading import Lock
+
+from config import INFERENCE_WORKERS, INFERENCE_PIN_CORES, EXECUTION_PROFILE_FILE, JOB_DEADLINE_GRACE_SEC
+from services.deadlines import DeadlineExceeded, current_deadline
+from services.metrics import METRICS, observe_stage
+from services.tracing import record_span
+
+WORKERS_REPLACED = METRICS.counter(
+    "aistudio_inference_workers_replaced_total", "Inference workers replaced after overrunning a deadline"
+)
+
+
+# ---------------------------------------------------------------
+# CORE DISCOVERY
+# ---------------------------------------------------------------
+def parse_cores(spec: str) -> list[int]:
+    """'0-3,8,10-11' -> [0, 1, 2, 3, 8, 10, 11]"""
+    cores = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            cores.extend(range(int(lo), int(hi) + 1))
+        else:
+            cores.append(int(part))
+    return sorted(set(cores))
+
+
+def format_cores(cores: list[int]) -> str:
+    return ",".join(str(c) for c in cores)
+
+
+def available_cores() -> list[int]:
+    """
+    Cores this process may use. serve.py hands each worker process its own
+    slice through INFERENCE_CORES (read at call time: it is set after fork).
+    """
+    spec = os.getenv("INFERENCE_CORES", "")
+    if spec:
+        return parse_cores(spec)
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def split_cores(cores: list[int], parts: int) -> list[list[int]]:
+    """Split cores into `parts` contiguous, near-equal groups."""
+    parts = max(1, min(parts, len(cores)))
+    size, extra = divmod(len(cores), parts)
+    groups, start = [], 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        groups.append(cores[start:end])
+        start = end
+    return groups
+
+
+# ---------------------------------------------------------------
+# EXECUTION PROFILE
+# ---------------------------------------------------------------
+@dataclass
+class ExecutionProfile:
+    workers: int
+    threads: int
+    interop_threads: int
+    core_sets: list[list[int]]
+    pin: bool = False
+    source: str = "heuristic"
+    measured: list[dict] = field(default_factory=list)
+
+    @classmethod
+    def for_split(cls, cores: list[int], workers: int, pin: bool, source: str) -> "ExecutionProfile":
+        core_sets = split_cores(cores, workers)
+        threads = min(len(c) for c in core_sets)
+        return cls(
+            workers=len(core_sets),
+            threads=threads,
+            interop_threads=1 if threads <= 2 else 2,
+            core_sets=core_sets,
+            pin=pin,
+            source=source,
+        )
+
+
+def heuristic_workers(n_cores: int) -> int:
+    # CPU inference of these models scales poorly past ~4 threads per job,
+    # so prefer more concurrent jobs with 4 threads each.
+    return max(1, n_cores // 4)
+
+
+def load_profile(cores: list[int] | None = None) -> ExecutionProfile:
+    cores = cores or available_cores()
+
+    if INFERENCE_WORKERS != "auto":
+        return ExecutionProfile.for_split(cores, int(INFERENCE_WORKERS), INFERENCE_PIN_CORES, "config")
+
+    if EXECUTION_PROFILE_FILE.exists():
+        try:
+            saved = json.loads(EXECUTION_PROFILE_FILE.read_text(encoding="utf-8"))
+            # The calibration was done for a whole host; scale to our core slice
+            threads = max(1, int(saved["threads"]))
+            workers = max(1, len(cores) // threads)
+            profile = ExecutionProfile.for_split(cores, workers, INFERENCE_PIN_CORES, "calibrated")
+            profile.measured = saved.get("measured", [])
+            return profile
+        except (ValueError, KeyError, OSError) as e:
+            print(f"⚠️ Ignoring invalid {EXECUTION_PROFILE_FILE.name}: {e}")
+
+    return ExecutionProfile.for_split(cores, heuristic_workers(len(cores)), INFERENCE_PIN_CORES, "heuristic")
+
+
+def apply_thread_settings(threads: int, cores: list[int] | None, pin: bool):
+    """
+    Configure the CALLING thread: torch intra-op threads (per-thread on
+    OpenMP builds) and, optionally, CPU affinity. OpenMP worker threads
+    created afterwards inherit the affinity.
+    """
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    if pin and cores and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, cores)  # 0 = calling thread on Linux
+        except OSError as e:
+            print(f"⚠️ Could not pin worker to cores {cores}: {e}")
+
+
+def set_interop_threads(n: int):
+    """Inter-op threads are process-wide and can only be set once."""
+    try:
+        import torch
+        torch.set_interop_threads(n)
+    except (ImportError, RuntimeError):
+        pass
+
+
+# ---------------------------------------------------------------
+# EXECUTOR
+# ---------------------------------------------------------------
+def _record_queue_wait(seconds: float):
+    observe_stage("queue_wait", seconds)
+    record_span("queue_wait", seconds)
+
+
+def _settle(future: concurrent.futures.Future, result=None, error: BaseException | None = None):
+    """Complete a future unless the deadline monitor already failed it."""
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except concurrent.futures.InvalidStateError:
+        pass
+
+
+class InferenceExecutor:
+    """
+    Fixed pool of inference worker threads, one per core set.
+    Jobs run in the submitting coroutine's context (contextvars).
+    """
+
+    def __init__(self, profile: ExecutionProfile):
+        self.profile = profile
+        self._queue: "queue.Queue" = queue.Queue()
+        self._busy = 0
+        self._lock = Lock()
+        self._threads = []
+        # slot -> (future, deadline) of the job running there
+        self._running: dict[int, tuple] = {}
+        self._abandoned: list[threading.Thread] = []
+        self.replaced = 0
+
+        for slot, cores in enumerate(profile.core_sets):
+            self._threads.append(self._thread(slot, cores))
+        for t in self._threads:
+            t.start()
+
+        threading.Thread(target=self._monitor, name="inference-deadlines", daemon=True).start()
+
+        print(f"⚙️ Inference executor: {profile.workers} workers x {profile.threads} threads "
+              f"({profile.source}{', pinned' if profile.pin else ''})")
+
+    def _thread(self, slot: int, cores: list[int], generation: int = 0) -> threading.Thread:
+        return threading.Thread(
+            target=self._worker,
+            args=(slot, cores),
+            name=f"inference-{slot}" + (f".{generation}" if generation else ""),
+            daemon=True,
+        )
+
+    def _worker(self, slot: int, cores: list[int]):
+        if slot == 0 and threading.current_thread().name == "inference-0":
+            # torch is imported here, off the event loop, not during startup
+            set_interop_threads(self.profile.interop_threads)
+        apply_thread_settings(len(cores), cores, self.profile.pin)
+        # A replaced worker finishes its current job, then exits
+        while self._threads[slot] is threading.current_thread():
+            ctx, fn, args, kwargs, future, queued_at = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            deadline = ctx.run(current_deadline)
+            if deadline is not None and time.monotonic() >= deadline:
+                future.set_exception(DeadlineExceeded("deadline passed while queued"))
+                continue
+            with self._lock:
+                self._busy += 1
+                self._running[slot] = (future, deadline)
+            # Labelled with the submitting job's mode / model / trace
+            ctx.run(_record_queue_wait, time.perf_counter() - queued_at)
+            try:
+                _settle(future, ctx.run(fn, *args, **kwargs))
+            except BaseException as e:
+                _settle(future, error=e)
+            finally:
+                with self._lock:
+                    # Not ours any more if the worker was replaced meanwhile
+                    if self._running.get(slot, (None,))[0] is future:
+                        del self._running[slot]
+                        self._busy -= 1
+        with self._lock:
+            if threading.current_thread() in self._abandoned:
+                self._abandoned.remove(threading.current_thread())
+
+    def _monitor(self, interval: float = 1.0):
+        """Fail jobs past their deadline; replace workers that do not come back."""
+        while True:
+            time.sleep(interval)
+            now = time.monotonic()
+            with self._lock:
+                running = list(self._running.items())
+            for slot, (future, deadline) in running:
+                if deadline is None or now < deadline:
+                    continue
+                if not future.done():
+                    # The awaiting job is released now; the worker stops at its next checkpoint
+                    _settle(future, error=DeadlineExceeded("job deadline exceeded"))
+                if now >= deadline + JOB_DEADLINE_GRACE_SEC:
+                    self._replace(slot, future)
+
+    def _replace(self, slot: int, future):
+        with self._lock:
+            if self._running.get(slot, (None,))[0] is not future:
+                return
+            del self._running[slot]
+            stuck = self._threads[slot]
+            self._abandoned.append(stuck)
+            self._busy -= 1
+            self.replaced += 1
+            generation = self.replaced
+            replacement = self._thread(slot, self.profile.core_sets[slot], generation)
+            self._threads[slot] = replacement
+        replacement.start()
+        WORKERS_REPLACED.inc()
+        print(f"🪓 Inference worker {stuck.name} overran its job's deadline; started {replacement.name}")
+
+    def submit(self, fn, *args, **kwargs) -> concurrent.futures.Future:
+        future = concurrent.futures.Future()
+        self._queue.put((contextvars.copy_context(), fn, args, kwargs, future, time.perf_counter()))
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        """Run a blocking function on an inference worker and await it."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    async def run_task(self, task_id: str, fn, *args, **kwargs):
+        """
+        Like run(), for a task's job: cancelling the task while the call is
+        still queued drops it (TaskCancelled) without occupying a worker.
+        Once running, engines stop at their next step via check_cancelled().
+        """
+        from services.tasks import TASKS, TaskCancelled
+
+        future = self.submit(fn, *args, **kwargs)
+        TASKS.on_cancel(task_id, future.cancel)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            if future.cancelled():
+                raise TaskCancelled(task_id) from None
+            raise
+        finally:
+            TASKS.clear_cancel_hooks(task_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            busy = self._busy
+            abandoned = len(self._abandoned)
+        return {
+            "workers": self.profile.workers,
+            "threads_per_worker": self.profile.threads,
+            "busy": busy,
+            "replaced": self.replaced,
+            "stuck": abandoned,
+            "queued": self._queue.qsize(),
+            "core_sets": [format_cores(c) for c in self.profile.core_sets],
+            "pinned": self.profile.pin,
+            "source": self.profile.source,
+        }
+
+
+_EXECUTOR: InferenceExecutor | None = None
+_EXECUTOR_LOCK = Lock()
+
+
+def get_executor() -> InferenceExecutor:
+    """Created on first use (after fork in serve.py workers)."""
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = InferenceExecutor(load_profile())
+        return _EXECUTOR
+
+
+# ---------------------------------------------------------------
+# CALIBRATION (pick the split with the best jobs/hour)
+# ---------------------------------------------------------------
+def _reference_job(size: int = 512, layers: int = 12, steps: int = 8):
+    """A transformer-shaped CPU workload: stacked Linear + GELU over a sequence."""
+    import torch
+
+    torch.manual_seed(0)
+    x = torch.randn(1, 256, size)
+    weights = [torch.randn(size, size * 2) / size ** 0.5 for _ in range(layers)]
+    back = [torch.randn(size * 2, size) / size ** 0.5 for _ in range(layers)]
+    with torch.inference_mode():
+        for _ in range(steps):
+            h = x
+            for w1, w2 in zip(weights, back):
+                h = h + torch.nn.functional.gelu(h @ w1) @ w2
+    return h
+
+
+def measure_split(cores: list[int], workers: int, jobs_per_worker: int, pin: bool) -> dict:
+    core_sets = split_cores(cores, workers)
+    barrier = threading.Barrier(len(core_sets) + 1)
+    durations: list[float] = []
+    lock = Lock()
+
+    def run(group):
+        apply_thread_settings(len(group), group, pin)
+        _reference_job(steps=1)  # warm-up (thread pool creation)
+        barrier.wait()
+        for _ in range(jobs_per_worker):
+            started = time.perf_counter()
+            _reference_job()
+            with lock:
+                durations.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=run, args=(g,)) for g in core_sets]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    jobs = len(durations)
+    return {
+        "workers": len(core_sets),
+        "threads": min(len(g) for g in core_sets),
+        "jobs": jobs,
+        "elapsed_sec": round(elapsed, 3),
+        "mean_job_sec": round(sum(durations) / jobs, 3),
+        "jobs_per_hour": round(jobs / elapsed * 3600, 1),
+    }
+
+
+def calibrate(cores: list[int], jobs_per_worker: int = 3, pin: bool = True) -> dict:
+    candidates = sorted({w for w in (1, 2, 3, 4, 6, 8, 12, 16, 24, 32) if w <= len(cores)} | {len(cores)})
+    results = []
+    for workers in candidates:
+        r = measure_split(cores, workers, jobs_per_worker, pin)
+        results.append(r)
+        print(f"   {r['workers']:>3} workers x {r['threads']:>3} threads: "
+              f"{r['jobs_per_hour']:>10.1f} jobs/h  (mean job {r['mean_job_sec']:.2f}s)")
+
+    best = max(results, key=lambda r: r["jobs_per_hour"])
+    return {
+        "workers": best["workers"],
+        "threads": best["threads"],
+        "cores": len(cores),
+        "calibrated_at": time.time(),
+        "measured": results,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inference execution profile")
+    parser.add_argument("--calibrate", action="store_true", help="Measure every split and save the best")
+    parser.add_argument("--jobs", type=int, default=3, help="Reference jobs per worker and split")
+    parser.add_argument("--no-pin", action="store_true")
+    args = parser.parse_args()
+
+    cores = available_cores()
+    if args.calibrate:
+        print(f"🧪 Calibrating on {len(cores)} cores ({format_cores(cores)})...")
+        result = calibrate(cores, args.jobs, pin=not args.no_pin)
+        EXECUTION_PROFILE_FILE.write_text(json.dumps(result, indent=2), encoding="utf-8")
+        print(f"✅ Best: {result['workers']} workers x {result['threads']} threads "
+              f"-> saved to {EXECUTION_PROFILE_FILE}")
+    else:
+        print(json.dumps(asdict(load_profile(cores)), indent=2))
+    sys.exit(0)
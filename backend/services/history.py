@@ -0,0 +1,90 @@
+"""
+history.json: the Library list of finished generations, newest first.
+
+Jobs append entries, the retention pass drops entries of deleted tasks,
+and DELETE /api/history clears the list, from several threads and (with
+serve.py) several worker processes. Every read-modify-write runs under
+one lock (a thread lock plus an flock on history.lock) and the file is
+replaced atomically, so no update is lost and readers never see a
+half-written file.
+"""
+
+import os
+import json
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+from typing import Callable
+
+from config import HISTORY_FILE
+
+try:
+    import fcntl
+except ImportError:  # Windows: single process, the thread lock is enough
+    fcntl = None
+
+MAX_ENTRIES = 200
+
+
+class HistoryFile:
+    def __init__(self, path: Path, max_entries: int = MAX_ENTRIES):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self._lock = Lock()
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.path.with_name("history.lock"), "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read(self) -> list:
+        # Written with os.replace: a lock-free read sees the old or the new list
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return []
+
+    def _write(self, history: list):
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(history[:self.max_entries], indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def update(self, change: Callable[[list], list | None]) -> list:
+        """Apply change() to the current list under the lock; None leaves the file alone."""
+        with self._locked():
+            history = change(self.read())
+            if history is not None:
+                self._write(history)
+            return history
+
+    def append(self, entry: dict):
+        self.update(lambda history: [entry] + history)
+
+    def drop(self, task_ids: set[str]) -> int:
+        """Remove the entries of task_ids. Returns how many were removed."""
+        removed = 0
+
+        def change(history):
+            nonlocal removed
+            kept = [h for h in history if h.get("task_id", h.get("id")) not in task_ids]
+            removed = len(history) - len(kept)
+            return kept if removed else None
+
+        self.update(change)
+        return removed
+
+    def clear(self):
+        with self._locked():
+            self.path.unlink(missing_ok=True)
+
+
+# ✅ Global history file
+HISTORY = HistoryFile(HISTORY_FILE)
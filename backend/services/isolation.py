@@ -22,17 +22,44 @@ sys.path.insert(0, DF_PACKAGE_ROOT)
 # -------------------------------------------------
 from df.enhance import enhance, init_df
 
-# Initialize model ONCE (FastAPI-safe)
-model, df_state, suffix, epoch = init_df()
+from engine.audio_utils import write_wav
+from engine.registry import get_registry
+from services.metrics import timed_stage
+from services.profiler import profiled
+from services.deadlines import DeadlineExceeded
+from services.tasks import TaskCancelled, checkpoint
 
-# Enable memory optimization for CPU inference
-model.eval()
+DF_MODELS = get_registry("isolation")
 
-# Optional: Set to lower precision if supported
-try:
-    model = model.float()
-except Exception:
-    pass
+
+def load_df_model():
+    """
+    Initialize DeepFilterNet ONCE (on first use, FastAPI-safe).
+    Returns (model, df_state).
+    """
+    def loader():
+        print("🔄 Loading DeepFilterNet model...")
+        model, df_state, suffix, epoch = init_df()
+
+        # Enable memory optimization for CPU inference
+        model.eval()
+
+        # Optional: Set to lower precision if supported
+        try:
+            model = model.float()
+        except Exception:
+            pass
+
+        print("✅ DeepFilterNet model loaded")
+        return model, df_state
+
+    return DF_MODELS.get("deepfilternet", loader)
+
+
+def _enhance(model, df_state, audio_tensor):
+    # df_state keeps STFT state between calls: one enhancement at a time
+    with DF_MODELS.inference_lock("deepfilternet"), timed_stage("inference"), profiled():
+        return enhance(model, df_state, audio_tensor, pad=True)
 
 
 def remove_noise(input_path, output_path):
@@ -44,6 +71,16 @@ def remove_noise(input_path, output_path):
         input_path: Path to input audio file
         output_path: Path to save enhanced audio
     """
+    # The inference lock is only held per chunk: keep the model marked in
+    # use for the whole file so the memory watchdog cannot unload it between chunks
+    with DF_MODELS.in_use("deepfilternet"):
+        _remove_noise(input_path, output_path)
+
+
+def _remove_noise(input_path, output_path):
+    model, df_state = load_df_model()
+    checkpoint()
+
     audio, sr = sf.read(input_path)
 
     # Stereo → mono
@@ -70,11 +107,10 @@ def remove_noise(input_path, output_path):
         audio_tensor = torch.from_numpy(audio).float()  # [T]
         
         # Enhance audio
-        enhanced_audio = enhance(
+        enhanced_audio = _enhance(
             model,
             df_state,
             audio_tensor.unsqueeze(0),  # Add batch dimension [1, T]
-            pad=True
         )
         
         enhanced_array = enhanced_audio.squeeze(0).cpu().numpy()
@@ -90,6 +126,7 @@ def remove_noise(input_path, output_path):
         enhanced_parts = []
         
         for i in range(num_chunks):
+            checkpoint()
             print(f"⏳ Processing chunk {i+1}/{num_chunks}...")
             
             start_idx = i * (max_chunk_samples - overlap_samples)
@@ -99,11 +136,10 @@ def remove_noise(input_path, output_path):
             audio_tensor = torch.from_numpy(chunk).float()
             
             # Enhance chunk
-            enhanced_chunk = enhance(
+            enhanced_chunk = _enhance(
                 model,
                 df_state,
                 audio_tensor.unsqueeze(0),  # Add batch dimension [1, T]
-                pad=True
             )
             
             enhanced_part = enhanced_chunk.squeeze(0).cpu().numpy()
@@ -132,11 +168,13 @@ def remove_noise(input_path, output_path):
         
         print("✅ Processing complete!")
 
-    sf.write(output_path, enhanced_array, sr)
+    checkpoint()
+    with timed_stage("wav_write"):
+        write_wav(output_path, enhanced_array, sr)
     print(f"💾 Saved enhanced audio to: {output_path}")
 
 
-def isolate_voice_local(audio_file_path: str, output_dir: str):
+def isolate_voice_local(audio_file_path: str, output_dir: str, output_name: str | None = None):
     """
     Isolates vocals from the given audio file using DeepFilterNet (local).
     Returns the path to the isolated vocals file.
@@ -144,6 +182,7 @@ def isolate_voice_local(audio_file_path: str, output_dir: str):
     Args:
         audio_file_path: Path to input audio file
         output_dir: Directory to save output file
+        output_name: File name (default: <input>_enhanced.wav)
         
     Returns:
         str: Path to the enhanced audio file
@@ -153,7 +192,7 @@ def isolate_voice_local(audio_file_path: str, output_dir: str):
     
     # Generate output filename
     input_filename = Path(audio_file_path).stem
-    output_path = os.path.join(output_dir, f"{input_filename}_enhanced.wav")
+    output_path = os.path.join(output_dir, output_name or f"{input_filename}_enhanced.wav")
     
     print(f"🎤 Starting voice isolation for: {audio_file_path}")
     
@@ -162,6 +201,9 @@ def isolate_voice_local(audio_file_path: str, output_dir: str):
         remove_noise(audio_file_path, output_path)
         print(f"✅ Voice isolation complete: {output_path}")
         return output_path
+    except (TaskCancelled, DeadlineExceeded):
+        # Cancelled / overdue: main.py reports these as such, not as a failure
+        raise
     except Exception as e:
         print(f"❌ DeepFilterNet processing failed: {str(e)}")
         raise RuntimeError(f"DeepFilterNet processing failed: {str(e)}")
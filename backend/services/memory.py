@@ -0,0 +1,78 @@
+import sys
+
+
+def _read_kb_fields(path: str) -> dict:
+    """Parse 'Key:   1234 kB' style files (/proc/*/status, smaps_rollup, meminfo)."""
+    fields = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                parts = rest.split()
+                if parts and parts[0].isdigit():
+                    fields[key.strip()] = int(parts[0]) * 1024
+    except OSError:
+        pass
+    return fields
+
+
+def process_memory(pid: int | None = None) -> dict:
+    """
+    Memory of a process in bytes.
+      - rss: resident set size (includes pages shared with other processes)
+      - pss: proportional share of shared pages
+      - uss: private pages only (what this process costs on its own)
+    On non-Linux systems only rss (peak) is available.
+    """
+    proc = f"/proc/{pid or 'self'}"
+    rollup = _read_kb_fields(f"{proc}/smaps_rollup")
+    if rollup:
+        return {
+            "rss": rollup.get("Rss", 0),
+            "pss": rollup.get("Pss", 0),
+            "uss": rollup.get("Private_Clean", 0) + rollup.get("Private_Dirty", 0),
+            "shared": rollup.get("Shared_Clean", 0) + rollup.get("Shared_Dirty", 0),
+        }
+
+    status = _read_kb_fields(f"{proc}/status")
+    if status:
+        return {"rss": status.get("VmRSS", 0), "pss": None, "uss": None, "shared": None}
+
+    if pid is None:
+        try:
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # ru_maxrss is KiB on Linux, bytes on macOS
+            return {"rss": peak if sys.platform == "darwin" else peak * 1024, "pss": None, "uss": None, "shared": None}
+        except (ImportError, OSError):
+            pass
+    return {"rss": None, "pss": None, "uss": None, "shared": None}
+
+
+def to_mb(value: int | None) -> float | None:
+    return None if value is None else round(value / (1024 * 1024), 1)
+
+
+def system_memory() -> dict:
+    """Total / available system memory in bytes (None where unknown)."""
+    meminfo = _read_kb_fields("/proc/meminfo")
+    if meminfo:
+        return {"total": meminfo.get("MemTotal"), "available": meminfo.get("MemAvailable")}
+    try:
+        import psutil
+        vm = psutil.virtual_memory()
+        return {"total": vm.total, "available": vm.available}
+    except ImportError:
+        return {"total": None, "available": None}
+
+
+def release_freed_memory():
+    """Return freed heap pages to the OS after dropping models (glibc only)."""
+    import gc
+    gc.collect()
+    if sys.platform.startswith("linux"):
+        try:
+            import ctypes
+            ctypes.CDLL("libc.so.6").malloc_trim(0)
+        except (OSError, AttributeError):
+            pass
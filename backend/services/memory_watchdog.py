@@ -0,0 +1,184 @@
+"""
+Memory-pressure watchdog.
+
+A daemon thread samples this process's RSS and the system's available
+memory. Crossing a high watermark puts the process under pressure:
+
+  1. idle models are unloaded from the engine registries (least recently
+     used first, never one that is mid-inference), re-checking after each
+  2. if that is not enough, in-memory inference caches are dropped
+     (persisted entries stay on disk)
+  3. admission of new heavy jobs is paused (main.py answers 503) until
+     memory is back under the low watermarks
+
+In fork-server mode (serve.py) each worker runs its own watchdog; model
+pages shared copy-on-write are only freed once every worker drops them.
+"""
+
+import time
+import threading
+from threading import Lock
+
+from config import (
+    MEMORY_AVAILABLE_LOW_MB,
+    MEMORY_AVAILABLE_RECOVER_MB,
+    MEMORY_CHECK_INTERVAL_SEC,
+    MEMORY_EVICT_IDLE_SEC,
+    MEMORY_RSS_HIGH_MB,
+    MEMORY_RSS_LOW_MB,
+)
+from engine.registry import all_registries
+from services.memory import process_memory, release_freed_memory, system_memory, to_mb
+from services.metrics import METRICS
+
+MB = 1024 * 1024
+
+MEMORY_BYTES = METRICS.gauge(
+    "aistudio_memory_bytes", "Process RSS and system available memory", ("kind",)
+)
+MEMORY_PRESSURE = METRICS.gauge("aistudio_memory_pressure", "1 while new heavy jobs are paused")
+WATCHDOG_ACTIONS = METRICS.counter(
+    "aistudio_memory_watchdog_actions_total", "Memory watchdog actions", ("action",)
+)
+MODELS_EVICTED = METRICS.counter(
+    "aistudio_models_evicted_total", "Models unloaded under memory pressure", ("registry",)
+)
+JOBS_SHED = METRICS.counter(
+    "aistudio_jobs_shed_total", "Heavy jobs rejected under memory pressure", ("mode",)
+)
+
+
+class MemoryWatchdog:
+    def __init__(self, interval: float = MEMORY_CHECK_INTERVAL_SEC):
+        self.interval = interval
+        self.rss_high = MEMORY_RSS_HIGH_MB * MB
+        self.rss_low = (MEMORY_RSS_LOW_MB or MEMORY_RSS_HIGH_MB) * MB
+        self.available_low = MEMORY_AVAILABLE_LOW_MB * MB
+        self.available_recover = max(MEMORY_AVAILABLE_RECOVER_MB, MEMORY_AVAILABLE_LOW_MB) * MB
+        self.paused = False
+        self.paused_since = None
+        self.last_sample = {}
+        self.evicted = []
+        self._lock = Lock()
+        self._thread = None
+
+    # ---------------- sampling ----------------
+    def sample(self) -> dict:
+        sample = {"rss": process_memory()["rss"], "available": system_memory()["available"]}
+        if sample["rss"] is not None:
+            MEMORY_BYTES.set(sample["rss"], kind="rss")
+        if sample["available"] is not None:
+            MEMORY_BYTES.set(sample["available"], kind="available")
+        self.last_sample = sample
+        return sample
+
+    def over_high(self, sample: dict) -> bool:
+        rss, available = sample["rss"], sample["available"]
+        return bool(
+            (self.rss_high and rss is not None and rss > self.rss_high)
+            or (self.available_low and available is not None and available < self.available_low)
+        )
+
+    def under_low(self, sample: dict) -> bool:
+        rss, available = sample["rss"], sample["available"]
+        return not (
+            (self.rss_low and rss is not None and rss > self.rss_low)
+            or (self.available_low and available is not None and available < self.available_recover)
+        )
+
+    # ---------------- relief ----------------
+    def evict_one(self) -> bool:
+        """Unload the least recently used idle model across all registries."""
+        candidates = []
+        for name, registry in all_registries().items():
+            last_used = registry.snapshot()["last_used"]
+            for key in registry.idle_keys(MEMORY_EVICT_IDLE_SEC):
+                candidates.append((last_used.get(key, 0.0), name, key, registry))
+        if not candidates:
+            return False
+
+        _, name, key, registry = min(candidates, key=lambda c: c[0])
+        if not registry.unload(key, if_idle=True):
+            return False
+        release_freed_memory()
+        MODELS_EVICTED.inc(registry=name)
+        WATCHDOG_ACTIONS.inc(action="evict_model")
+        with self._lock:
+            self.evicted = (self.evicted + [{"registry": name, "model": key, "at": time.time()}])[-20:]
+        print(f"🧯 Memory pressure: unloaded idle model {name}/{key}")
+        return True
+
+    def drop_caches(self) -> bool:
+        from engine.caches import all_caches
+
+        filled = [c for c in all_caches().values() if c.stats()["entries"]]
+        if not filled:
+            return False
+        for cache in filled:
+            cache.clear()
+        release_freed_memory()
+        WATCHDOG_ACTIONS.inc(action="drop_caches")
+        print("🧯 Memory pressure: dropped in-memory inference caches")
+        return True
+
+    # ---------------- loop ----------------
+    def check(self):
+        sample = self.sample()
+        if self.over_high(sample):
+            while self.over_high(sample) and self.evict_one():
+                sample = self.sample()
+            if self.over_high(sample) and self.drop_caches():
+                sample = self.sample()
+
+        if not self.paused and self.over_high(sample):
+            self.paused, self.paused_since = True, time.time()
+            MEMORY_PRESSURE.set(1)
+            WATCHDOG_ACTIONS.inc(action="pause_admission")
+            print(f"⏸ Memory pressure (RSS {to_mb(sample['rss'])} MB, available "
+                  f"{to_mb(sample['available'])} MB): pausing new heavy jobs")
+        elif self.paused and self.under_low(sample):
+            self.paused, self.paused_since = False, None
+            MEMORY_PRESSURE.set(0)
+            WATCHDOG_ACTIONS.inc(action="resume_admission")
+            print(f"▶️ Memory recovered (RSS {to_mb(sample['rss'])} MB, available "
+                  f"{to_mb(sample['available'])} MB): accepting heavy jobs")
+
+    def run(self):
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                print(f"⚠️ Memory watchdog check failed: {e}")
+            time.sleep(self.interval)
+
+    def start(self) -> threading.Thread:
+        if self._thread is None:
+            MEMORY_PRESSURE.set(0)
+            self._thread = threading.Thread(target=self.run, name="memory-watchdog", daemon=True)
+            self._thread.start()
+            print(f"🧠 Memory watchdog started (every {self.interval:g}s)")
+        return self._thread
+
+    def record_shed(self, mode: str):
+        JOBS_SHED.inc(mode=mode)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            evicted = list(self.evicted)
+        return {
+            "paused": self.paused,
+            "paused_since": self.paused_since,
+            "rss_mb": to_mb(self.last_sample.get("rss")),
+            "available_mb": to_mb(self.last_sample.get("available")),
+            "watermarks_mb": {
+                "rss_high": to_mb(self.rss_high) or None,
+                "rss_low": to_mb(self.rss_low) or None,
+                "available_low": to_mb(self.available_low) or None,
+                "available_recover": to_mb(self.available_recover) or None,
+            },
+            "recently_evicted": evicted,
+        }
+
+
+# ✅ Global watchdog (started by main.py on startup)
+MEMORY_WATCHDOG = MemoryWatchdog()
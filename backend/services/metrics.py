@@ -0,0 +1,215 @@
+"""
+Minimal Prometheus-style metrics (text exposition format 0.0.4) for /metrics.
+
+No client library: counters, gauges and fixed-bucket histograms with
+labels, each guarded by its own lock, so recording costs a dict lookup
+and a few additions. Values that already live elsewhere (executor queue,
+loaded models, caches, RSS) are read by collectors at scrape time.
+
+Job stages are labelled with the current job's mode / model, taken from
+a context variable that main.py sets per job (the inference executor
+runs jobs in the submitting context, so engines see it too):
+
+    with timed_stage("inference"):
+        ...
+"""
+
+import time
+import contextvars
+from contextlib import contextmanager
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from services.tracing import span
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# ---------------------------------------------------------------
+# METRIC TYPES
+# ---------------------------------------------------------------
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = Lock()
+
+    def _key(self, labels: dict) -> Tuple:
+        return tuple(labels.get(n, "") for n in self.label_names)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set(self, value: float, **labels):
+        """Gauges; for counters, mirror a count kept elsewhere (collectors)."""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, k)} {_format_value(v)}" for k, v in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, list] = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        lines = self.header()
+        inf = 'le="+Inf"'
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(self.label_names, key, f'le="{_format_value(float(bound))}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, inf)} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {series[-1]}")
+        return lines
+
+
+# ---------------------------------------------------------------
+# REGISTRY
+# ---------------------------------------------------------------
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = Lock()
+
+    def _add(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labels=()) -> Counter:
+        return self._add(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=()) -> Gauge:
+        return self._add(Gauge(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help_text, labels, buckets))
+
+    def add_collector(self, collector: Callable[[], None]):
+        """Called on every scrape to refresh gauges from their sources."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        with self._lock:
+            collectors = list(self._collectors)
+            metrics = list(self._metrics.values())
+        for collect in collectors:
+            try:
+                collect()
+            except Exception as e:
+                print(f"⚠️ Metrics collector failed: {e}")
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+
+# ---------------------------------------------------------------
+# APPLICATION METRICS
+# ---------------------------------------------------------------
+JOB_STAGE_SECONDS = METRICS.histogram(
+    "aistudio_job_stage_seconds",
+    "Time per job stage (queue_wait, model_load, inference, wav_write, mp3_encode, mp3_decode)",
+    ("stage", "mode", "model"),
+)
+JOBS_TOTAL = METRICS.counter("aistudio_jobs_total", "Finished jobs by outcome", ("mode", "status"))
+RATE_LIMITED_TOTAL = METRICS.counter(
+    "aistudio_rate_limited_total", "Requests rejected by the rate limiter", ("path",)
+)
+
+
+_JOB_LABELS: contextvars.ContextVar[dict] = contextvars.ContextVar("job_labels", default={})
+
+
+def set_job_labels(mode: str, model: str):
+    """Label every stage recorded in this context (and the jobs it submits)."""
+    _JOB_LABELS.set({"mode": mode, "model": model})
+
+
+def observe_stage(stage: str, seconds: float):
+    JOB_STAGE_SECONDS.observe(seconds, stage=stage, **_JOB_LABELS.get())
+
+
+@contextmanager
+def timed_stage(stage: str):
+    """Histogram observation plus a span in the current task's trace."""
+    started = time.perf_counter()
+    try:
+        with span(stage):
+            yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
@@ -0,0 +1,81 @@
+"""
+Opt-in torch.profiler capture of a task's inference.
+
+main.py decides per job (admin flag or PROFILER_SAMPLE_RATE) and sets the
+capture target for the job's context; engines wrap their inference call
+in profiled(). When no target is set, profiled() is a context variable
+read and nothing else.
+
+Artefacts in the task dir:
+    profile.json  Chrome trace (chrome://tracing, ui.perfetto.dev)
+    profile.txt   top operators by self CPU time and by allocated memory
+"""
+
+import random
+import contextvars
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from config import ADMIN_API_KEY, PROFILER_RECORD_SHAPES, PROFILER_SAMPLE_RATE
+
+
+TRACE_FILE = "profile.json"
+SUMMARY_FILE = "profile.txt"
+
+_TARGET: contextvars.ContextVar[Optional[Path]] = contextvars.ContextVar("profile_target", default=None)
+
+
+def should_profile(requested: bool, admin_key: Optional[str]) -> bool:
+    """Admin-requested (valid x-admin-key) or sampled."""
+    if requested and ADMIN_API_KEY and admin_key == ADMIN_API_KEY:
+        return True
+    return PROFILER_SAMPLE_RATE > 0 and random.random() < PROFILER_SAMPLE_RATE
+
+
+def capture_into(task_dir: Optional[Path]):
+    """Profile inference run in this context (None = off)."""
+    _TARGET.set(task_dir)
+
+
+@contextmanager
+def profiled():
+    task_dir = _TARGET.get()
+    if task_dir is None:
+        yield
+        return
+
+    from torch.profiler import ProfilerActivity, profile
+
+    # First inference call of the job only
+    _TARGET.set(None)
+    with profile(
+        activities=[ProfilerActivity.CPU],
+        profile_memory=True,
+        record_shapes=PROFILER_RECORD_SHAPES,
+    ) as prof:
+        yield
+
+    try:
+        prof.export_chrome_trace(str(task_dir / TRACE_FILE))
+        averages = prof.key_averages()
+        (task_dir / SUMMARY_FILE).write_text(
+            "== Top operators by self CPU time ==\n"
+            + averages.table(sort_by="self_cpu_time_total", row_limit=40)
+            + "\n\n== Top operators by self CPU memory ==\n"
+            + averages.table(sort_by="self_cpu_memory_usage", row_limit=25),
+            encoding="utf-8",
+        )
+        print(f"🔬 Profile written: {task_dir / TRACE_FILE}")
+    except Exception as e:
+        print(f"⚠️ Could not write profile: {e}")
+
+
+def profile_files(task_id: str, task_dir: Path) -> dict:
+    """Download links for the task's profile artefacts (if captured)."""
+    files = {}
+    if (task_dir / TRACE_FILE).exists():
+        files["profile"] = f"/api/download/{task_id}/{TRACE_FILE}"
+    if (task_dir / SUMMARY_FILE).exists():
+        files["profile_summary"] = f"/api/download/{task_id}/{SUMMARY_FILE}"
+    return files
@@ -0,0 +1,107 @@
+import time
+import threading
+import traceback
+from threading import Lock
+from typing import Callable, Dict, Iterable
+
+from engine.registry import get_registry
+
+
+class Readiness:
+    """
+    Tracks heavy subsystems (model families, chat, ...) that are
+    initialised lazily or warmed up in the background after startup.
+
+    Subsystem states:
+      - cold:    not loaded yet, will load on first use
+      - loading: warm-up in progress
+      - ready:   loaded (by warm-up or by a request)
+      - error:   warm-up failed (requests will retry on demand)
+    """
+
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[], None]] = {}
+        self._registries: Dict[str, str] = {}
+        self._state: Dict[str, Dict] = {}
+        self._required: set[str] = set()
+        self._lock = Lock()
+
+    def register(self, name: str, loader: Callable[[], None], registry: str | None = None):
+        """Register a subsystem and the function that warms it up."""
+        with self._lock:
+            self._loaders[name] = loader
+            if registry:
+                self._registries[name] = registry
+            self._state.setdefault(name, {"state": "cold", "seconds": None, "error": None})
+
+    def ensure(self, name: str):
+        """Warm up a subsystem synchronously (no-op if already ready)."""
+        with self._lock:
+            loader = self._loaders[name]
+            if self._state[name]["state"] == "ready":
+                return
+            self._state[name] = {"state": "loading", "seconds": None, "error": None}
+
+        started = time.perf_counter()
+        try:
+            loader()
+        except Exception as e:
+            print(f"❌ Warm-up failed for {name}: {e}")
+            traceback.print_exc()
+            with self._lock:
+                self._state[name] = {
+                    "state": "error",
+                    "seconds": round(time.perf_counter() - started, 3),
+                    "error": str(e),
+                }
+            return
+
+        with self._lock:
+            self._state[name] = {
+                "state": "ready",
+                "seconds": round(time.perf_counter() - started, 3),
+                "error": None,
+            }
+        print(f"✅ Subsystem ready: {name} ({time.perf_counter() - started:.1f}s)")
+
+    def warm_up_async(self, names: Iterable[str]) -> threading.Thread:
+        """
+        Warm up the given subsystems one after another in a daemon thread,
+        so the HTTP server can answer requests while models load.
+        Warmed subsystems become required for overall readiness.
+        """
+        names = [n for n in names if n in self._loaders]
+        with self._lock:
+            self._required.update(names)
+
+        def run():
+            for name in names:
+                self.ensure(name)
+
+        thread = threading.Thread(target=run, name="warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def report(self) -> dict:
+        with self._lock:
+            subsystems = {}
+            for name, state in self._state.items():
+                entry = dict(state)
+                registry = self._registries.get(name)
+                if registry:
+                    snap = get_registry(registry).snapshot()
+                    entry["models"] = snap["loaded"]
+                    # A request may have loaded the models before warm-up did
+                    if entry["state"] == "cold" and snap["loaded"]:
+                        entry["state"] = "ready"
+                    elif entry["state"] == "cold" and snap["loading"]:
+                        entry["state"] = "loading"
+                entry["warm_up"] = name in self._required
+                subsystems[name] = entry
+
+            ready = all(subsystems[n]["state"] == "ready" for n in self._required)
+        return {"ready": ready, "subsystems": subsystems}
+
+
+# ✅ Global READINESS instance
+READINESS = Readiness()
@@ -0,0 +1,391 @@
+"""
+Retention manager for generated outputs (replaces the manual cleanup.py).
+
+Keeps an index of task folders under OUTPUT_ROOT: size, mtime and last
+access (downloads touch the folder). Each background pass lists
+OUTPUT_ROOT once and re-sizes only folders whose mtime changed, so usage
+is known without walking the tree. Then, in small batches:
+
+  - deletes finished tasks not accessed for RETENTION_MAX_AGE_DAYS
+  - deletes least recently used tasks while over RETENTION_MAX_GB
+  - removes their history.json entries and in-memory task records
+  - compacts tasks idle for STORAGE_COLD_AFTER_DAYS to the cold tier
+    (services/storage_tiers.py)
+  - clears old engine scratch files (engine/outputs/sfx)
+
+With several worker processes (serve.py) only the one holding
+retention.lock runs passes; the others read the saved index summary.
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import threading
+from collections import Counter
+from pathlib import Path
+from threading import Lock
+
+from config import (
+    BASE_DIR,
+    OUTPUT_ROOT,
+    RETENTION_BATCH,
+    RETENTION_INDEX_FILE,
+    RETENTION_INTERVAL_SEC,
+    RETENTION_MAX_AGE_DAYS,
+    RETENTION_MAX_GB,
+    RETENTION_SCRATCH_MAX_AGE_SEC,
+)
+from services.blobstore import BLOBS, read_manifest
+from services.history import HISTORY
+from services.metrics import METRICS
+from services.storage_tiers import COLD_TIER
+from services.tasks import TASKS
+
+try:
+    import fcntl
+except ImportError:  # Windows: single process, always the owner
+    fcntl = None
+
+TASK_DIR_RE = re.compile(r"^[0-9a-f]{12}$")
+SCRATCH_DIRS = [BASE_DIR / "engine" / "outputs" / "sfx"]
+# Never touch a folder changed this recently (it may belong to a live job)
+MIN_IDLE_SEC = 600
+GB = 1024 ** 3
+
+STORAGE_BYTES = METRICS.gauge("aistudio_storage_bytes", "Bytes used by task outputs", ("tier",))
+STORAGE_TASKS = METRICS.gauge("aistudio_storage_tasks", "Task folders on disk", ("tier",))
+RETENTION_DELETED = METRICS.counter(
+    "aistudio_retention_deleted_total", "Task folders deleted by retention", ("reason",)
+)
+RETENTION_FREED = METRICS.counter("aistudio_retention_freed_bytes_total", "Bytes freed by retention")
+
+
+def dir_size(path: Path, linked: dict | None = None) -> tuple[int, dict]:
+    """
+    (bytes of files only this folder holds, {"dev:ino": bytes} of hard-linked
+    files). Linked files are blob store artefacts shared with the store and
+    possibly other tasks: usage counts each of them once (see usage_bytes).
+    """
+    total, linked = 0, {} if linked is None else linked
+    try:
+        for entry in os.scandir(path):
+            if entry.is_file(follow_symlinks=False):
+                st = entry.stat(follow_symlinks=False)
+                if st.st_nlink > 1:
+                    linked[f"{st.st_dev}:{st.st_ino}"] = st.st_size
+                else:
+                    total += st.st_size
+            elif entry.is_dir(follow_symlinks=False):
+                total += dir_size(Path(entry.path), linked)[0]
+    except OSError:
+        pass
+    return total, linked
+
+
+def usage_bytes(entries) -> int:
+    """Disk used by index entries, each hard-linked file counted once."""
+    linked = {}
+    for entry in entries:
+        linked.update(entry.get("linked", {}))
+    return sum(e["bytes"] for e in entries) + sum(linked.values())
+
+
+class RetentionManager:
+    def __init__(self, root: Path = OUTPUT_ROOT, index_file: Path = RETENTION_INDEX_FILE):
+        self.root = Path(root)
+        self.index_file = Path(index_file)
+        self.summary_file = self.index_file.with_suffix(".summary.json")
+        self.max_age_sec = RETENTION_MAX_AGE_DAYS * 86400
+        self.max_bytes = int(RETENTION_MAX_GB * GB)
+        self.batch = max(1, RETENTION_BATCH)
+        self.owner = False
+        self._entries: dict[str, dict] = {}
+        self._pending = 0
+        self._lock = Lock()
+        self._lock_file = None
+        self._thread = None
+
+    # ---------------- index ----------------
+    def load_index(self):
+        try:
+            data = json.loads(self.index_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            # Entries from before hard-linked files were counted apart are re-sized
+            self._entries = {k: e for k, e in data.get("entries", {}).items() if "linked" in e}
+
+    def save_index(self):
+        with self._lock:
+            summary, entries = self._summary(), dict(self._entries)
+        try:
+            for path, data in ((self.index_file, {"entries": entries}), (self.summary_file, summary)):
+                tmp = path.with_suffix(".tmp")
+                tmp.write_text(json.dumps(data), encoding="utf-8")
+                os.replace(tmp, path)
+        except OSError as e:
+            print(f"⚠️ Could not save retention index: {e}")
+
+    def refresh(self, max_resize: int | None = None):
+        """List OUTPUT_ROOT once; re-size new or changed task folders only."""
+        max_resize = max_resize if max_resize is not None else self.batch * 4
+        seen, resized, pending = set(), 0, 0
+        try:
+            listing = list(os.scandir(self.root))
+        except OSError:
+            return
+        for entry in listing:
+            if not TASK_DIR_RE.match(entry.name) or not entry.is_dir(follow_symlinks=False):
+                continue
+            seen.add(entry.name)
+            try:
+                mtime = entry.stat().st_mtime
+            except OSError:
+                continue
+            with self._lock:
+                known = self._entries.get(entry.name)
+            if known and known["mtime"] == mtime:
+                continue
+            if resized >= max_resize:
+                pending += 1
+                continue
+            size, linked = dir_size(Path(entry.path))
+            resized += 1
+            with self._lock:
+                self._entries[entry.name] = {
+                    "bytes": size,
+                    "linked": linked,
+                    "mtime": mtime,
+                    "last_access": max(mtime, known["last_access"] if known else 0.0),
+                    "tier": COLD_TIER.tier_of(Path(entry.path)),
+                }
+        with self._lock:
+            for task_id in set(self._entries) - seen:
+                del self._entries[task_id]
+            self._pending = pending
+
+    def touch(self, task_id: str):
+        """Mark a task as accessed (download). Safe to call from any worker."""
+        now = time.time()
+        try:
+            os.utime(self.root / task_id, (now, now))
+        except OSError:
+            return
+        with self._lock:
+            if task_id in self._entries:
+                self._entries[task_id]["last_access"] = now
+
+    # ---------------- eviction ----------------
+    def _deletable(self, task_id: str, entry: dict, now: float) -> bool:
+        if now - entry["mtime"] < MIN_IDLE_SEC or now - entry["last_access"] < MIN_IDLE_SEC:
+            return False
+        task = TASKS.get(task_id)
+        return not (task and task.get("status") in ("queued", "running"))
+
+    def plan(self, now: float | None = None) -> list[tuple[str, str]]:
+        """Up to one batch of (task_id, reason): expired first, then LRU over quota."""
+        now = now or time.time()
+        with self._lock:
+            entries = sorted(self._entries.items(), key=lambda kv: kv[1]["last_access"])
+            total = usage_bytes(self._entries.values())
+        # A shared artefact is only freed with the last task linking it
+        links = Counter(key for _, entry in entries for key in entry.get("linked", {}))
+
+        def freed_by(entry: dict) -> int:
+            freed = entry["bytes"]
+            for key, size in entry.get("linked", {}).items():
+                links[key] -= 1
+                freed += size if not links[key] else 0
+            return freed
+
+        victims = []
+        for task_id, entry in entries:
+            if len(victims) >= self.batch:
+                break
+            if not self._deletable(task_id, entry, now):
+                continue
+            if self.max_age_sec and now - entry["last_access"] > self.max_age_sec:
+                victims.append((task_id, "age"))
+                total -= freed_by(entry)
+            elif self.max_bytes and total > self.max_bytes:
+                victims.append((task_id, "quota"))
+                total -= freed_by(entry)
+        return victims
+
+    def delete(self, victims: list[tuple[str, str]]) -> int:
+        freed, deleted = 0, []
+        for task_id, reason in victims:
+            with self._lock:
+                entry = self._entries.pop(task_id, None)
+            linked = read_manifest(self.root / task_id)
+            try:
+                shutil.rmtree(self.root / task_id)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"⚠️ Retention: could not delete {task_id}: {e}")
+                continue
+            # Hard-linked outputs only free space once their last task goes
+            size = (entry["bytes"] if entry else 0) + BLOBS.collect(e["blob"] for e in linked.values())
+            freed += size
+            deleted.append(task_id)
+            TASKS.forget(task_id)
+            RETENTION_DELETED.inc(reason=reason)
+            RETENTION_FREED.inc(size)
+        if deleted:
+            drop_history_entries(set(deleted))
+            print(f"🧹 Retention: deleted {len(deleted)} task folders ({freed / (1024 * 1024):.1f} MB)")
+        return freed
+
+    # ---------------- cold tier ----------------
+    def plan_compaction(self, now: float | None = None) -> list[str]:
+        """Up to one batch of hot tasks idle for STORAGE_COLD_AFTER_DAYS."""
+        if not COLD_TIER.enabled:
+            return []
+        now = now or time.time()
+        with self._lock:
+            entries = sorted(self._entries.items(), key=lambda kv: kv[1]["last_access"])
+        due = []
+        for task_id, entry in entries:
+            if len(due) >= self.batch or now - entry["last_access"] < COLD_TIER.after_sec:
+                break
+            if entry.get("tier", "hot") == "hot" and self._deletable(task_id, entry, now):
+                due.append(task_id)
+        return due
+
+    def compact(self, task_ids: list[str]) -> int:
+        saved = 0
+        for task_id in task_ids:
+            path = self.root / task_id
+            saved += COLD_TIER.compact(path)
+            try:
+                mtime = path.stat().st_mtime
+            except OSError:
+                continue
+            with self._lock:
+                entry = self._entries.get(task_id)
+                if entry:
+                    # Compaction is not an access: keep last_access as it was
+                    size, linked = dir_size(path)
+                    entry.update(bytes=size, linked=linked, mtime=mtime, tier=COLD_TIER.tier_of(path))
+        if task_ids:
+            print(f"🧊 Cold tier: compacted {len(task_ids)} task folders ({saved / (1024 * 1024):.1f} MB saved)")
+        return saved
+
+    def sweep_scratch(self, now: float | None = None) -> int:
+        """Remove old engine scratch files (one batch per directory)."""
+        now = now or time.time()
+        removed = 0
+        for scratch in SCRATCH_DIRS:
+            if not scratch.is_dir():
+                continue
+            for entry in os.scandir(scratch):
+                if removed >= self.batch:
+                    break
+                try:
+                    if entry.is_file() and now - entry.stat().st_mtime > RETENTION_SCRATCH_MAX_AGE_SEC:
+                        os.unlink(entry.path)
+                        removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    # ---------------- passes ----------------
+    def run_once(self, dry_run: bool = False, full: bool = False) -> dict:
+        self.refresh(max_resize=10 ** 9 if full else None)
+        victims = self.plan()
+        if dry_run:
+            return {"would_delete": victims, "would_compact": self.plan_compaction()}
+        freed = self.delete(victims)
+        if full:
+            while victims:
+                victims = self.plan()
+                freed += self.delete(victims)
+        due = self.plan_compaction()
+        freed += self.compact(due)
+        while full and due:
+            due = self.plan_compaction()
+            freed += self.compact(due)
+        scratch = self.sweep_scratch()
+        self.save_index()
+        summary = self.usage()
+        for tier, usage in summary["tiers"].items():
+            STORAGE_BYTES.set(usage["bytes"], tier=tier)
+            STORAGE_TASKS.set(usage["tasks"], tier=tier)
+        return {"freed_bytes": freed, "scratch_removed": scratch, **summary}
+
+    def acquire(self) -> bool:
+        """One retention owner per OUTPUT_ROOT (fork-server workers share it)."""
+        if fcntl is None:
+            self.owner = True
+            return True
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock_file = open(self.root / "retention.lock", "w")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self.owner = True
+        except OSError:
+            self._lock_file.close()
+            self._lock_file = None
+        return self.owner
+
+    def run(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"⚠️ Retention pass failed: {e}")
+            time.sleep(RETENTION_INTERVAL_SEC)
+
+    def start(self):
+        if self._thread is not None or not self.acquire():
+            return
+        self.load_index()
+        self._thread = threading.Thread(target=self.run, name="retention", daemon=True)
+        self._thread.start()
+        quota = f"{RETENTION_MAX_GB:g} GB" if self.max_bytes else "no quota"
+        print(f"🧹 Retention started ({RETENTION_MAX_AGE_DAYS:g} days, {quota})")
+
+    # ---------------- reporting ----------------
+    def _summary(self) -> dict:
+        """Caller holds the lock."""
+        total = usage_bytes(self._entries.values())
+        tiers = {}
+        for tier in ("hot", "cold"):
+            entries = [e for e in self._entries.values() if e.get("tier", "hot") == tier]
+            used = usage_bytes(entries)
+            tiers[tier] = {
+                "tasks": len(entries),
+                "bytes": used,
+                "mb_per_task": round(used / len(entries) / (1024 * 1024), 2) if entries else None,
+            }
+        return {
+            "bytes": total,
+            "gb": round(total / GB, 3),
+            "tasks": len(self._entries),
+            "tiers": tiers,
+            "pending_index": self._pending,
+            "quota_gb": RETENTION_MAX_GB or None,
+            "max_age_days": RETENTION_MAX_AGE_DAYS or None,
+            "updated_at": time.time(),
+        }
+
+    def usage(self) -> dict:
+        """Disk usage from the index (non-owner workers read the owner's summary)."""
+        if self.owner:
+            with self._lock:
+                return self._summary()
+        try:
+            return json.loads(self.summary_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+
+def drop_history_entries(task_ids: set[str]):
+    HISTORY.drop(task_ids)
+
+
+# ✅ Global retention manager (started by main.py on startup)
+RETENTION = RetentionManager()
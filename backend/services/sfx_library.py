@@ -0,0 +1,197 @@
+"""
+Pre-rendered SFX library for the SOUND_PROMPTS catalogue.
+
+render_sfx_library.py renders N seeded variants per catalogue entry and
+model into OUTPUT_ROOT/sfx_library as FLAC, described by index.json:
+
+    {
+      "version": 1,
+      "entries": {
+        "<model>|<duration>|<entry_id>": {
+          "entry_id": "nature/rain/heavy_rain",
+          "prompt": "...", "model": "audioldm2p", "duration": 5,
+          "variants": [{"seed": 123, "file": "audioldm2p/5s/<name>.flac", "render_sec": 41.2,
+                        "quality": "standard", "profile": "quality"}]
+        }
+      }
+    }
+
+/api/generate serves exact catalogue matches from here, but only variants
+rendered at the requested SFX quality tier and inference profile or better,
+and falls back to live generation for everything else. Variants of older
+indexes without their own quality / profile use the entry's quality and
+the default profile.
+"""
+
+import os
+import json
+import random
+import hashlib
+from pathlib import Path
+from threading import Lock
+from typing import Iterator, Optional
+
+from config import SFX_LIBRARY_DIR
+from engine.profiles import DEFAULT_PROFILE, DEFAULT_SFX_QUALITY, INFERENCE_PROFILES, SFX_QUALITY_TIERS
+from services.sfx_styles import SOUND_PROMPTS
+
+
+INDEX_VERSION = 1
+
+# Same aliases as engine.sfx.resolve_model_key (kept here: no torch import)
+MODEL_ALIASES = {"audioldm-s-full": "audioldm-s-full-v2"}
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join((prompt or "").split()).lower()
+
+
+def normalize_model(model_name: str) -> str:
+    key = (model_name or "").lower().strip()
+    return MODEL_ALIASES.get(key, key)
+
+
+def entry_key(model_key: str, duration: int, entry_id: str) -> str:
+    return f"{model_key}|{int(duration)}|{entry_id}"
+
+
+def at_least(value: str, wanted: str, order) -> bool:
+    """value ranks at or above wanted in order (lowest first); unknown values never do."""
+    order = list(order)
+    return value in order and wanted in order and order.index(value) >= order.index(wanted)
+
+
+def variant_seed(entry_id: str, model_key: str, variant: int) -> int:
+    """Stable seed per (entry, model, variant) so re-renders are reproducible."""
+    digest = hashlib.sha256(f"{entry_id}|{model_key}|{variant}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") % (2**31 - 1) + 1
+
+
+def iter_catalogue(categories: Optional[list[str]] = None) -> Iterator[tuple[str, str]]:
+    """Yield (entry_id, prompt) for every SOUND_PROMPTS entry (category/group/name)."""
+    for category, groups in SOUND_PROMPTS.items():
+        if categories and category not in categories:
+            continue
+        for group, entries in groups.items():
+            for name, prompt in entries.items():
+                yield f"{category}/{group}/{name}", " ".join(prompt.split())
+
+
+# ---------------------------------------------------------------
+# LIBRARY (read side, used by /api/generate)
+# ---------------------------------------------------------------
+class SfxLibrary:
+    def __init__(self, root: Path):
+        self.root = root
+        self.index_file = root / "index.json"
+        self._entries: dict = {}
+        self._by_prompt: dict = {}
+        self._mtime = None
+        self._lock = Lock()
+        self.served = 0
+
+    def _refresh(self):
+        """(Re)load the index when the renderer has updated it."""
+        try:
+            mtime = self.index_file.stat().st_mtime
+        except FileNotFoundError:
+            self._entries, self._by_prompt, self._mtime = {}, {}, None
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            data = json.loads(self.index_file.read_text(encoding="utf-8"))
+        except (ValueError, OSError) as e:
+            print(f"⚠️ SFX library index unreadable: {e}")
+            return
+
+        entries = data.get("entries", {})
+        by_prompt = {}
+        for entry in entries.values():
+            if entry.get("variants"):
+                key = (normalize_prompt(entry["prompt"]), entry["model"], int(entry["duration"]))
+                by_prompt[key] = entry
+        self._entries, self._by_prompt, self._mtime = entries, by_prompt, mtime
+
+    def lookup(
+        self,
+        prompt: str,
+        model_name: str,
+        duration: int,
+        seed: Optional[int] = None,
+        quality: str = DEFAULT_SFX_QUALITY,
+        profile: str = DEFAULT_PROFILE,
+    ) -> Optional[dict]:
+        """
+        A pre-rendered variant for an exact catalogue prompt / model / duration,
+        rendered at quality and profile or better, or None. With a locked seed
+        only that exact variant matches.
+        """
+        with self._lock:
+            self._refresh()
+            try:
+                entry = self._by_prompt.get((normalize_prompt(prompt), normalize_model(model_name), int(duration)))
+            except (TypeError, ValueError):
+                return None
+        if entry is None:
+            return None
+
+        # Fast profile = int8 weights: full-precision ("quality") renders rank above it
+        profiles = sorted(INFERENCE_PROFILES, key=lambda p: p != "fast")
+        variants = [
+            {"quality": entry.get("quality"), "profile": DEFAULT_PROFILE, **v}
+            for v in entry["variants"]
+        ]
+        variants = [
+            v for v in variants
+            if at_least(v["quality"], quality, SFX_QUALITY_TIERS)
+            and at_least(v["profile"], profile, profiles)
+            and (self.root / v["file"]).exists()
+        ]
+        if seed is not None:
+            variants = [v for v in variants if v["seed"] == seed]
+        if not variants:
+            return None
+
+        variant = random.choice(variants)
+        return {
+            "entry_id": entry["entry_id"],
+            "quality": variant["quality"],
+            "profile": variant["profile"],
+            "seed": variant["seed"],
+            "path": self.root / variant["file"],
+        }
+
+    def record_served(self):
+        with self._lock:
+            self.served += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._refresh()
+            return {
+                "entries": len(self._by_prompt),
+                "variants": sum(len(e["variants"]) for e in self._by_prompt.values()),
+                "served": self.served,
+            }
+
+
+def load_index(root: Path = SFX_LIBRARY_DIR) -> dict:
+    index_file = root / "index.json"
+    if index_file.exists():
+        try:
+            return json.loads(index_file.read_text(encoding="utf-8"))
+        except ValueError:
+            print("⚠️ SFX library index unreadable, starting a new one")
+    return {"version": INDEX_VERSION, "entries": {}}
+
+
+def save_index(index: dict, root: Path = SFX_LIBRARY_DIR):
+    root.mkdir(parents=True, exist_ok=True)
+    index_file = root / "index.json"
+    tmp = index_file.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(index, indent=1), encoding="utf-8")
+    os.replace(tmp, index_file)
+
+
+SFX_LIBRARY = SfxLibrary(SFX_LIBRARY_DIR)
@@ -0,0 +1,231 @@
+"""
+Cold storage tier for finished task folders.
+
+Retention compacts task folders not downloaded for STORAGE_COLD_AFTER_DAYS:
+every WAV is transcoded to STORAGE_COLD_FORMAT next to it (FLAC: lossless,
+about half the size of 16-bit PCM; Opus: lossy, far smaller), then the WAV
+and its MP3 are removed. cold.json records what can be re-created.
+
+FLAC only holds 16 / 24-bit integer PCM bit-exactly, so with the FLAC
+format other WAVs (OUTPUT_WAV_SUBTYPE=FLOAT) stay as they are; cold.json
+marks them as kept, and the folder counts as compacted.
+
+Download URLs never change: asking for a .wav / .mp3 that is no longer on
+disk re-creates it from the cold file (materialise). The re-created file
+stays until the task has been idle long enough to be compacted again.
+"""
+
+import os
+import json
+from pathlib import Path
+from threading import Lock
+
+from config import (
+    OUTPUT_WAV_SUBTYPE,
+    STORAGE_COLD_AFTER_DAYS,
+    STORAGE_COLD_FORMAT,
+    STORAGE_OPUS_BITRATE,
+)
+from services.blobstore import BLOBS
+from services.metrics import METRICS
+
+COLD_INDEX = "cold.json"
+COLD_SUFFIXES = {"flac": ".flac", "opus": ".opus"}
+MP3_BITRATE = "192k"
+FLAC_SUBTYPES = ("PCM_16", "PCM_24")   # restored bit-exactly from FLAC
+BLOCK = 1 << 16
+
+DOWNLOAD_SECONDS = METRICS.histogram(
+    "aistudio_download_prepare_seconds",
+    "Time until a download is ready to stream (cold = re-created from the cold tier)",
+    ("tier",),
+)
+TASKS_COMPACTED = METRICS.counter("aistudio_storage_compacted_total", "Task folders moved to the cold tier")
+COMPACTED_SAVED = METRICS.counter(
+    "aistudio_storage_compacted_saved_bytes_total", "Bytes saved by moving task folders to the cold tier"
+)
+MATERIALISED = METRICS.counter(
+    "aistudio_storage_materialised_total", "Files re-created from the cold tier on download", ("kind",)
+)
+
+
+def read_cold_index(task_dir: Path) -> dict:
+    try:
+        return json.loads((Path(task_dir) / COLD_INDEX).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_cold_index(task_dir: Path, index: dict):
+    tmp = Path(task_dir) / f".{COLD_INDEX}.tmp"
+    tmp.write_text(json.dumps(index, indent=2), encoding="utf-8")
+    os.replace(tmp, Path(task_dir) / COLD_INDEX)
+
+
+def _tmp_path(path: Path) -> Path:
+    # Keep the real suffix last: soundfile / ffmpeg pick the format from it
+    return path.with_name(f".{path.stem}.{os.getpid()}.tmp{path.suffix}")
+
+
+class ColdTier:
+    def __init__(self):
+        self.format = STORAGE_COLD_FORMAT if STORAGE_COLD_FORMAT in COLD_SUFFIXES else "flac"
+        self.suffix = COLD_SUFFIXES[self.format]
+        self.after_sec = STORAGE_COLD_AFTER_DAYS * 86400
+        self.enabled = STORAGE_COLD_AFTER_DAYS >= 0
+        self._lock = Lock()
+        self._stats_lock = Lock()
+        self._downloads = {"hot": [0, 0.0], "cold": [0, 0.0]}
+
+    def tier_of(self, task_dir: Path) -> str:
+        """'cold' once compacted and nothing has been re-created since."""
+        task_dir = Path(task_dir)
+        if not (task_dir / COLD_INDEX).exists():
+            return "hot"
+        index = read_cold_index(task_dir)
+        try:
+            names = os.listdir(task_dir)
+        except OSError:
+            return "cold"
+        if any(
+            (name in index or name.endswith(".wav")) and not index.get(name, {}).get("kept")
+            for name in names
+        ):
+            return "hot"
+        return "cold"
+
+    # ---------------- compaction ----------------
+    def _encode(self, wav: Path, dest: Path) -> dict:
+        """WAV -> cold file. Returns what is needed to restore the WAV."""
+        import soundfile as sf
+        from engine.audio_utils import run_ffmpeg
+
+        info = sf.info(str(wav))
+        tmp = _tmp_path(dest)
+        if self.format == "flac":
+            with sf.SoundFile(str(wav)) as src, sf.SoundFile(
+                str(tmp), "w", src.samplerate, src.channels, subtype=info.subtype, format="FLAC"
+            ) as out:
+                for block in src.blocks(blocksize=BLOCK, dtype="int32"):
+                    out.write(block)
+        else:
+            result = run_ffmpeg(["-i", str(wav), "-c:a", "libopus", "-b:a", STORAGE_OPUS_BITRATE, str(tmp)])
+            if result.returncode != 0:
+                tmp.unlink(missing_ok=True)
+                raise RuntimeError(f"opus encode failed for {wav.name}")
+        os.replace(tmp, dest)
+        return {"sr": info.samplerate, "subtype": info.subtype}
+
+    @staticmethod
+    def _flac_lossless(wav: Path) -> bool:
+        import soundfile as sf
+
+        try:
+            return sf.info(str(wav)).subtype in FLAC_SUBTYPES
+        except RuntimeError:
+            return False
+
+    def compact(self, task_dir: Path) -> int:
+        """Move one task folder to the cold tier. Returns bytes saved."""
+        task_dir = Path(task_dir)
+        index = read_cold_index(task_dir)
+        saved = 0
+        for wav in sorted(task_dir.glob("*.wav")):
+            entry = index.get(wav.name)
+            if entry and entry.get("kept"):
+                continue
+            if not entry and self.format == "flac" and not self._flac_lossless(wav):
+                # FLOAT (or other) samples would be cut to 24 bits and clipped: keep the WAV
+                index[wav.name] = {"kept": True}
+                continue
+            cold = task_dir / (entry["from"] if entry else wav.stem + self.suffix)
+            if not (entry and cold.exists()):
+                cold = task_dir / (wav.stem + self.suffix)
+                try:
+                    index[wav.name] = {"from": cold.name, **self._encode(wav, cold)}
+                except Exception as e:
+                    print(f"⚠️ Cold tier: could not compact {task_dir.name}/{wav.name}: {e}")
+                    continue
+                BLOBS.adopt(cold)
+                saved -= cold.stat().st_size
+
+            mp3 = wav.with_suffix(".mp3")
+            if mp3.exists():
+                index[mp3.name] = {"from": cold.name, "bitrate": MP3_BITRATE}
+            # Record first: the files may only go once they can be re-created
+            _write_cold_index(task_dir, index)
+            for path in (wav, mp3):
+                saved += BLOBS.discard(task_dir, path.name)
+
+        if not (task_dir / COLD_INDEX).exists() or any(e.get("kept") for e in index.values()):
+            _write_cold_index(task_dir, index)
+        TASKS_COMPACTED.inc()
+        COMPACTED_SAVED.inc(max(0, saved))
+        return saved
+
+    # ---------------- download ----------------
+    def materialise(self, task_dir: Path, name: str) -> Path | None:
+        """Re-create a compacted .wav / .mp3 from its cold file (None if not possible)."""
+        import soundfile as sf
+        from engine.audio_utils import run_ffmpeg
+
+        task_dir = Path(task_dir)
+        entry = read_cold_index(task_dir).get(name)
+        if not entry or "from" not in entry or not (task_dir / entry["from"]).exists():
+            return None
+        source, dest = task_dir / entry["from"], task_dir / name
+        tmp = _tmp_path(dest)
+
+        with self._lock:
+            if dest.exists():
+                return dest
+            if dest.suffix == ".wav" and source.suffix == ".flac":
+                with sf.SoundFile(str(source)) as src, sf.SoundFile(
+                    str(tmp), "w", src.samplerate, src.channels,
+                    subtype=entry.get("subtype", OUTPUT_WAV_SUBTYPE), format="WAV",
+                ) as out:
+                    for block in src.blocks(blocksize=BLOCK, dtype="int32"):
+                        out.write(block)
+            elif dest.suffix == ".wav":
+                codec = {"PCM_24": "pcm_s24le", "FLOAT": "pcm_f32le"}.get(entry.get("subtype"), "pcm_s16le")
+                args = ["-i", str(source), "-c:a", codec]
+                if entry.get("sr"):
+                    args += ["-ar", str(entry["sr"])]
+                run_ffmpeg([*args, str(tmp)])
+            else:
+                run_ffmpeg(["-i", str(source), "-b:a", entry.get("bitrate", MP3_BITRATE), str(tmp)])
+
+            if not tmp.exists() or tmp.stat().st_size == 0:
+                tmp.unlink(missing_ok=True)
+                return None
+            os.replace(tmp, dest)
+
+        BLOBS.adopt(dest)
+        MATERIALISED.inc(kind=dest.suffix.lstrip("."))
+        print(f"🧊 Re-created {task_dir.name}/{name} from {source.name}")
+        return dest
+
+    def record_download(self, tier: str, seconds: float):
+        DOWNLOAD_SECONDS.observe(seconds, tier=tier)
+        with self._stats_lock:
+            stats = self._downloads[tier]
+            stats[0] += 1
+            stats[1] += seconds
+
+    def snapshot(self) -> dict:
+        with self._stats_lock:
+            downloads = {
+                tier: {"count": n, "avg_ms": round(total / n * 1000, 1) if n else None}
+                for tier, (n, total) in self._downloads.items()
+            }
+        return {
+            "enabled": self.enabled,
+            "format": self.format,
+            "after_days": STORAGE_COLD_AFTER_DAYS if self.enabled else None,
+            "wav_subtype": OUTPUT_WAV_SUBTYPE,
+            "downloads": downloads,
+        }
+
+
+# ✅ Global cold tier (driven by the retention passes)
+COLD_TIER = ColdTier()
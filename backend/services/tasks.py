@@ -1,25 +1,66 @@
-from typing import Dict, Any
+import json
+import os
+import contextvars
+from pathlib import Path
+from typing import Callable, Dict, Any, List, Optional
 from threading import Lock
 
+from services.deadlines import check_deadline
+from services.metrics import JOBS_TOTAL
+
+
+class TaskCancelled(Exception):
+    """Raised inside a job when its task was cancelled by the user."""
+
 
 class TaskStore:
     """
     Simple in-memory task storage.
     Holds:
-      - status: queued / running / done / error
+      - status: queued / running / done / error / cancelled
       - files: wav/mp3/mp4 links
       - meta: prompt, model, seed, style, etc.
       - error: error message if any
+
+    If persist_root is set, every change is also mirrored to
+    <persist_root>/<task_id>/task.json so that other worker processes
+    (see serve.py) can answer polls for tasks they did not run.
     """
 
-    def __init__(self):
+    def __init__(self, persist_root: Path | None = None):
         self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._cancel_hooks: Dict[str, List[Callable[[], bool]]] = {}
         self._lock = Lock()
+        self._persist_root = Path(persist_root) if persist_root else None
+
+    def _persist(self, task_id: str):
+        """Write the task snapshot atomically (caller holds the lock)."""
+        if self._persist_root is None:
+            return
+        task_dir = self._persist_root / task_id
+        if not task_dir.is_dir():
+            return
+        try:
+            tmp = task_dir / "task.json.tmp"
+            tmp.write_text(json.dumps(self._tasks[task_id], default=str), encoding="utf-8")
+            os.replace(tmp, task_dir / "task.json")
+        except OSError as e:
+            print(f"⚠️ Could not persist task {task_id}: {e}")
+
+    def _load(self, task_id: str) -> Dict[str, Any] | None:
+        if self._persist_root is None or not task_id.isalnum():
+            return None
+        path = self._persist_root / task_id / "task.json"
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
 
     def create(self, task_id: str, payload: Dict[str, Any]):
         """Create new task entry."""
         with self._lock:
             self._tasks[task_id] = payload
+            self._persist(task_id)
 
     def set_status(self, task_id: str, status: str, **extra):
         """Update task status and attach any extra fields."""
@@ -28,12 +69,112 @@ class TaskStore:
                 self._tasks[task_id]["status"] = status
                 for k, v in extra.items():
                     self._tasks[task_id][k] = v
+                self._persist(task_id)
+                if status in ("done", "error", "cancelled"):
+                    mode = self._tasks[task_id].get("meta", {}).get("mode", "unknown")
+                    JOBS_TOTAL.inc(mode=mode, status=status)
+
+    def counts(self) -> Dict[str, int]:
+        """Number of in-memory tasks per status."""
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for task in self._tasks.values():
+                status = task.get("status", "unknown")
+                counts[status] = counts.get(status, 0) + 1
+            return counts
+
+    def update_meta(self, task_id: str, **fields):
+        """Merge fields into the task's meta dict."""
+        with self._lock:
+            if task_id in self._tasks:
+                self._tasks[task_id].setdefault("meta", {}).update(fields)
+                self._persist(task_id)
+
+    def request_cancel(self, task_id: str) -> bool:
+        """
+        Flag a task for cancellation. A marker file is also written so the
+        worker process that owns the task sees it (see serve.py).
+        Returns True if queued work was dropped before it started.
+        """
+        with self._lock:
+            if task_id in self._tasks:
+                self._tasks[task_id]["cancel_requested"] = True
+            hooks = self._cancel_hooks.pop(task_id, [])
+        if self._persist_root is not None and task_id.isalnum():
+            marker = self._persist_root / task_id / "cancel"
+            if marker.parent.is_dir():
+                marker.touch()
+        return any([hook() for hook in hooks])
+
+    def on_cancel(self, task_id: str, hook: Callable[[], bool]):
+        """Run hook (e.g. Future.cancel of queued work) when the task is cancelled."""
+        with self._lock:
+            self._cancel_hooks.setdefault(task_id, []).append(hook)
+
+    def clear_cancel_hooks(self, task_id: str):
+        with self._lock:
+            self._cancel_hooks.pop(task_id, None)
+
+    def is_cancelled(self, task_id: str) -> bool:
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is not None and task.get("cancel_requested"):
+                return True
+        if self._persist_root is not None:
+            return (self._persist_root / task_id / "cancel").exists()
+        return False
+
+    def raise_if_cancelled(self, task_id: str):
+        if self.is_cancelled(task_id):
+            raise TaskCancelled(task_id)
+
+    def forget(self, task_id: str):
+        """Drop a task whose outputs were deleted (retention)."""
+        with self._lock:
+            self._tasks.pop(task_id, None)
 
     def get(self, task_id: str) -> Dict[str, Any] | None:
-        """Retrieve task entry."""
+        """Retrieve task entry (falls back to the on-disk snapshot)."""
         with self._lock:
-            return self._tasks.get(task_id)
+            task = self._tasks.get(task_id)
+        if task is None:
+            task = self._load(task_id)
+        return task
+
+
+# ---------------------------------------------------------------
+# STEP-BOUNDARY CANCELLATION
+# ---------------------------------------------------------------
+# A job marks its context with its task id; engines call checkpoint() at
+# every step boundary (diffusion step, MusicGen token, DeepFilterNet chunk)
+# without knowing which task they run for. The context follows the
+# job onto inference workers (executor ctx.run) and asyncio.to_thread.
+_CURRENT_TASK: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("cancellable_task", default=None)
+
+
+def cancellable(task_id: Optional[str]):
+    """Let engines running in this context stop when task_id is cancelled."""
+    _CURRENT_TASK.set(task_id)
+
+
+def check_cancelled():
+    """Raise TaskCancelled if the task of the current context was cancelled."""
+    task_id = _CURRENT_TASK.get()
+    if task_id is not None:
+        TASKS.raise_if_cancelled(task_id)
+
+
+def checkpoint():
+    """Step-boundary hook for engines: stop if the job was cancelled or is out of time."""
+    check_cancelled()
+    check_deadline()
+
+
+def _persist_root() -> Path | None:
+    # Only needed when several worker processes share OUTPUT_ROOT
+    from config import OUTPUT_ROOT, WORKERS
+    return OUTPUT_ROOT if WORKERS > 1 else None
 
 
 # ✅ Global TASK STORE instance
-TASKS = TaskStore()
+TASKS = TaskStore(persist_root=_persist_root())
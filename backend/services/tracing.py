@@ -0,0 +1,183 @@
+"""
+Per-task span tracing.
+
+A Trace collects the timed spans of one task (upload write, queue wait,
+model load, text encode, inference, decode, file writes, transcode,
+history append) as a tree. The current trace and parent span live in
+context variables, so spans opened on inference workers (which run jobs
+in the submitting context) or in asyncio.to_thread nest under the job.
+
+Finished spans are also logged as JSON lines through a QueueHandler: the
+caller only enqueues, a listener thread does the file I/O.
+
+    trace = start_trace(task_id)
+    with span("upload_write", bytes=n):
+        ...
+    meta["trace"] = trace.tree()
+"""
+
+import json
+import time
+import queue
+import atexit
+import logging
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from threading import Lock
+from typing import Dict, List, Optional
+
+from config import TRACING_ENABLED, TRACE_LOG_FILE
+
+
+# ---------------------------------------------------------------
+# LOG QUEUE (non-blocking: a listener thread writes the file)
+# ---------------------------------------------------------------
+_LOGGER = logging.getLogger("aistudio.trace")
+_LOGGER.propagate = False
+_LISTENER: Optional[QueueListener] = None
+_LISTENER_LOCK = Lock()
+
+
+def _ensure_listener():
+    global _LISTENER
+    if _LISTENER is not None:
+        return
+    with _LISTENER_LOCK:
+        if _LISTENER is not None:
+            return
+        TRACE_LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
+        file_handler = logging.FileHandler(TRACE_LOG_FILE, encoding="utf-8")
+        file_handler.setFormatter(logging.Formatter("%(message)s"))
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        _LOGGER.addHandler(QueueHandler(log_queue))
+        _LOGGER.setLevel(logging.INFO)
+        _LISTENER = QueueListener(log_queue, file_handler)
+        _LISTENER.start()
+        atexit.register(_LISTENER.stop)
+
+
+def _emit(record: dict):
+    _ensure_listener()
+    _LOGGER.info(json.dumps(record, default=str))
+
+
+# ---------------------------------------------------------------
+# TRACE
+# ---------------------------------------------------------------
+class Trace:
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self._spans: List[dict] = []
+        self._next_id = 0
+        self._lock = Lock()
+
+    def offset(self, at: float) -> float:
+        """perf_counter() value -> ms since the trace started."""
+        return round((at - self._t0) * 1000, 2)
+
+    def add(self, name: str, start: float, end: float, parent: Optional[int], span_id: int,
+            attrs: dict, error: Optional[str] = None):
+        record = {
+            "id": span_id,
+            "parent": parent,
+            "name": name,
+            "start_ms": self.offset(start),
+            "duration_ms": round((end - start) * 1000, 2),
+        }
+        if attrs:
+            record["attrs"] = attrs
+        if error:
+            record["error"] = error
+        with self._lock:
+            self._spans.append(record)
+        _emit({"task_id": self.task_id, **record})
+
+    def next_id(self) -> int:
+        with self._lock:
+            self._next_id += 1
+            return self._next_id
+
+    def tree(self) -> dict:
+        """Spans nested under their parents, in start order."""
+        with self._lock:
+            spans = sorted(self._spans, key=lambda s: s["start_ms"])
+        nodes: Dict[int, dict] = {s["id"]: {**s, "children": []} for s in spans}
+        roots = []
+        for s in spans:
+            node = nodes[s["id"]]
+            parent = nodes.get(s["parent"])
+            (parent["children"] if parent else roots).append(node)
+        for node in nodes.values():
+            node.pop("id")
+            node.pop("parent")
+            if not node["children"]:
+                node.pop("children")
+        return {
+            "started_at": self.started_at,
+            "total_ms": self.offset(time.perf_counter()),
+            "spans": roots,
+        }
+
+
+_TRACE: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("trace", default=None)
+_PARENT: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("trace_parent", default=None)
+
+
+def start_trace(task_id: str) -> Optional[Trace]:
+    """Begin a task's trace and make it current in this context."""
+    if not TRACING_ENABLED:
+        return None
+    trace = Trace(task_id)
+    use_trace(trace)
+    return trace
+
+
+def use_trace(trace: Optional[Trace]):
+    """Make a trace current (e.g. in the background job of the request that started it)."""
+    _TRACE.set(trace)
+    _PARENT.set(None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _TRACE.get()
+
+
+@contextmanager
+def span(name: str, **attrs):
+    trace = _TRACE.get()
+    if trace is None:
+        yield
+        return
+    span_id = trace.next_id()
+    parent = _PARENT.get()
+    token = _PARENT.set(span_id)
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        _PARENT.reset(token)
+        trace.add(name, started, time.perf_counter(), parent, span_id, attrs, error)
+
+
+def record_span(name: str, seconds: float, **attrs):
+    """A span that just ended, measured elsewhere (e.g. time spent queued)."""
+    trace = _TRACE.get()
+    if trace is None:
+        return
+    end = time.perf_counter()
+    trace.add(name, end - seconds, end, _PARENT.get(), trace.next_id(), attrs)
+
+
+def traced(fn, name: str):
+    """Wrap a callable (e.g. a model's decode method) so each call is a span."""
+    def wrapper(*args, **kwargs):
+        with span(name):
+            return fn(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,126 @@
+"""
+Startup Import-Time Report for AI Music Studio
+Runs `python -X importtime -c "import main"` in a fresh interpreter,
+prints the slowest imports and fails if the total exceeds the budget.
+
+Usage (CI):
+    python startup_report.py                # budget from IMPORT_BUDGET_SEC (default 1.0s)
+    python startup_report.py --budget 0.8 --top 25 --json import_report.json
+"""
+
+import sys
+import json
+import argparse
+import subprocess
+from pathlib import Path
+
+from config import IMPORT_BUDGET_SEC
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# Modules that must never be imported while `main` is imported
+FORBIDDEN_AT_IMPORT = [
+    "torch",
+    "audiocraft",
+    "diffusers",
+    "transformers",
+    "df",
+    "google.generativeai",
+    "bs4",
+    "youtube_transcript_api",
+]
+
+
+def run_importtime(module: str = "main"):
+    """Import `module` in a clean interpreter and parse -X importtime output."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BASE_DIR,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        # "import time:  self [us] | cumulative | imported package"
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            rows.append({
+                "module": name.strip(),
+                "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+            })
+        except ValueError:
+            continue
+    return proc, rows
+
+
+def build_report(rows: list[dict], module: str, budget_sec: float, top: int) -> dict:
+    root = next((r for r in rows if r["module"] == module and r["depth"] == 0), None)
+    total_sec = (root["cumulative_us"] if root else sum(r["self_us"] for r in rows)) / 1e6
+
+    imported = {r["module"] for r in rows}
+    forbidden = [m for m in FORBIDDEN_AT_IMPORT if m in imported]
+
+    top_level = sorted(
+        (r for r in rows if r["depth"] <= 1),
+        key=lambda r: r["cumulative_us"],
+        reverse=True,
+    )[:top]
+
+    return {
+        "module": module,
+        "total_seconds": round(total_sec, 3),
+        "budget_seconds": budget_sec,
+        "within_budget": total_sec <= budget_sec,
+        "forbidden_imports": forbidden,
+        "slowest": [
+            {"module": r["module"], "cumulative_ms": round(r["cumulative_us"] / 1000, 1)}
+            for r in top_level
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check `import main` against a time budget")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET_SEC)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", dest="json_path", default=None, help="Write the report to this file")
+    args = parser.parse_args()
+
+    proc, rows = run_importtime(args.module)
+    if proc.returncode != 0:
+        print(f"❌ `import {args.module}` failed:\n{proc.stderr[-4000:]}")
+        sys.exit(2)
+
+    report = build_report(rows, args.module, args.budget, args.top)
+
+    print("=" * 60)
+    print(f"⏱  import {args.module}: {report['total_seconds']:.3f}s (budget {args.budget:.3f}s)")
+    print("=" * 60)
+    for r in report["slowest"]:
+        print(f"   {r['cumulative_ms']:>9.1f} ms  {r['module']}")
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    ok = True
+    if report["forbidden_imports"]:
+        print(f"\n❌ Heavy modules imported at startup: {', '.join(report['forbidden_imports'])}")
+        ok = False
+    if not report["within_budget"]:
+        print(f"\n❌ Import time {report['total_seconds']:.3f}s exceeds budget {args.budget:.3f}s")
+        ok = False
+
+    if ok:
+        print("\n✅ Startup import budget OK")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+# Must be set before config is imported: keep outputs and caches out of the tree
+os.environ.setdefault("MUSIC_OUTPUT_ROOT", tempfile.mkdtemp(prefix="aistudio_tests_"))
+os.environ.setdefault("PROMPT_CACHE_PERSIST", "0")
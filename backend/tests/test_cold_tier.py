@@ -0,0 +1,35 @@
+"""Cold-tier round trip: a re-created WAV has exactly the samples of the original."""
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from services.storage_tiers import ColdTier
+
+
+@pytest.mark.parametrize("subtype", ["PCM_16", "PCM_24", "FLOAT"])
+def test_wav_round_trip_is_bit_exact(tmp_path, subtype):
+    task_dir = tmp_path / "0123456789ab"
+    task_dir.mkdir()
+    audio = np.random.default_rng(0).uniform(-1.5, 1.5, (48000, 2)).astype(np.float32)
+    if subtype != "FLOAT":
+        audio = np.clip(audio, -1.0, 1.0)
+    sf.write(str(task_dir / "audio.wav"), audio, 48000, subtype=subtype)
+    original, _ = sf.read(str(task_dir / "audio.wav"), dtype="float32")
+
+    tier = ColdTier()
+    tier.format, tier.suffix = "flac", ".flac"
+    tier.compact(task_dir)
+    if subtype == "FLOAT":
+        # FLAC cannot hold float samples: the WAV stays hot, untouched
+        assert not (task_dir / "audio.flac").exists()
+        assert tier.tier_of(task_dir) == "cold"
+        assert tier.compact(task_dir) == 0
+    else:
+        assert not (task_dir / "audio.wav").exists()
+        assert tier.materialise(task_dir, "audio.wav") is not None
+
+    restored, sr = sf.read(str(task_dir / "audio.wav"), dtype="float32")
+    assert sr == 48000
+    assert sf.info(str(task_dir / "audio.wav")).subtype == subtype
+    np.testing.assert_array_equal(restored, original)
@@ -0,0 +1,36 @@
+"""A cancelled or overdue isolation job surfaces as such, not as a DeepFilterNet failure."""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+
+from benchmarks import tiny_models
+from services.deadlines import DeadlineExceeded
+from services.tasks import TaskCancelled
+
+
+@pytest.fixture
+def isolation(tmp_path):
+    import soundfile as sf
+
+    tiny_models.install_tiny_isolation()
+    from services import isolation
+
+    sf.write(str(tmp_path / "voice.wav"), np.zeros(48000, dtype=np.float32), 48000)
+    return isolation
+
+
+@pytest.mark.parametrize("error", [TaskCancelled(), DeadlineExceeded("deadline")])
+def test_stop_is_not_wrapped(isolation, tmp_path, monkeypatch, error):
+    def stop():
+        raise error
+
+    monkeypatch.setattr(isolation, "checkpoint", stop)
+    with pytest.raises(type(error)):
+        isolation.isolate_voice_local(str(tmp_path / "voice.wav"), str(tmp_path / "out"))
+
+
+def test_failure_is_wrapped(isolation, tmp_path):
+    with pytest.raises(RuntimeError, match="DeepFilterNet processing failed"):
+        isolation.isolate_voice_local(str(tmp_path / "missing.wav"), str(tmp_path / "out"))
@@ -0,0 +1,63 @@
+"""
+MusicGen jobs must reach checkpoint() while tokens are generated, so a
+cancelled or overdue job stops mid-render. audiocraft only calls the
+progress callback for progress=True, and so does the tiny stand-in.
+"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+
+from benchmarks import tiny_models
+from engine import musicgen_engine as mg
+from services.tasks import TaskCancelled
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    name = tiny_models.install_tiny_musicgen()
+    calls = []
+
+    def cancel_on_second_token():
+        calls.append(1)
+        if len(calls) > 1:
+            raise TaskCancelled()
+
+    monkeypatch.setattr(mg, "checkpoint", cancel_on_second_token)
+    yield mg.MusicEngine(name, "cpu", tmp_path)
+    assert len(calls) == 2, "generation did not stop at the first checkpoint after cancelling"
+
+
+PARAMS = mg.GenParams(temperature=1.0, top_k=250, top_p=0.0, seed=1)
+
+
+def test_generate_text_checks_cancellation(engine):
+    with pytest.raises(TaskCancelled):
+        engine.generate_text("rain on a tin roof", 2, PARAMS)
+
+
+def test_generate_text_batch_checks_cancellation(engine, tmp_path):
+    with pytest.raises(TaskCancelled):
+        engine.generate_text_batch(["rain", "wind"], 2, PARAMS, [tmp_path, tmp_path])
+
+
+def test_generate_with_reference_checks_cancellation(engine, tmp_path):
+    import soundfile as sf
+
+    reference = tmp_path / "reference.wav"
+    t = np.arange(32000) / 32000
+    sf.write(str(reference), (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32), 32000)
+    with pytest.raises(TaskCancelled):
+        engine.generate_with_reference("piano", reference, 2, PARAMS)
+
+
+def test_stand_in_skips_callback_without_progress():
+    model = tiny_models.TinyMusicGen()
+    calls = []
+    model.set_custom_progress_callback(lambda generated, total: calls.append(generated))
+    model.set_generation_params(duration=0.1)
+    model.generate(["rain"])
+    assert calls == []
+    model.generate(["rain"], progress=True)
+    assert calls == list(range(1, 6))
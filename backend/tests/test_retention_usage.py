@@ -0,0 +1,32 @@
+"""Storage usage counts a hard-linked (blob store) artefact once, not once per task folder."""
+
+import os
+import time
+
+from services.retention import RetentionManager
+
+
+def test_linked_artefacts_are_counted_once(tmp_path):
+    root = tmp_path / "outputs"
+    store = root / "blobs"
+    store.mkdir(parents=True)
+    (store / "shared.wav").write_bytes(b"x" * 1000)
+    for task_id, own in (("aaaaaaaaaaaa", 10), ("bbbbbbbbbbbb", 20)):
+        (root / task_id).mkdir()
+        os.link(store / "shared.wav", root / task_id / "audio.wav")
+        (root / task_id / "task.json").write_bytes(b"{" * own)
+
+    manager = RetentionManager(root, tmp_path / "retention.json")
+    manager.owner = True
+    manager.refresh()
+    assert manager.usage()["bytes"] == 1000 + 10 + 20
+
+    old = time.time() - 3600
+    for task_id in ("aaaaaaaaaaaa", "bbbbbbbbbbbb"):
+        manager._entries[task_id].update(mtime=old, last_access=old)
+    manager.max_bytes = 1030
+    assert manager.plan() == []
+
+    # Deleting the first task frees only its own bytes; the shared file goes with the last
+    manager.max_bytes = 1015
+    assert [task_id for task_id, _ in manager.plan()] == ["aaaaaaaaaaaa", "bbbbbbbbbbbb"]